@@ -3,13 +3,47 @@ import secrets
 import logging
 from dotenv import load_dotenv
 
-# Configurazione del logging
-logging.basicConfig(level=logging.WARNING)
+# Configurazione del logging (i livelli per sottosistema dipendono dal profilo, vedi LOG_PROFILES)
+logging.basicConfig(level=logging.WARNING, format="[%(levelname)s] %(name)s: %(message)s")
 logger = logging.getLogger(__name__)
 
 # Carica variabili d'ambiente da .env
 load_dotenv()
 
+# Profili di logging: livello di ogni sottosistema (logger "src.<package>")
+LOG_PROFILES = {
+    # Sviluppo: avanzamento e riepiloghi a INFO (generazioni campionate, elenchi di prodotti troncati)
+    "development": {"src": "INFO"},
+    # Produzione: solo avvisi ed errori, nessun messaggio formattato nei percorsi caldi
+    "production": {"src": "WARNING"},
+    # Diagnostica: anche le righe per generazione e per prodotto
+    "debug": {"src": "DEBUG"},
+}
+LOG_PROFILE = os.getenv("LOG_PROFILE", "development")
+# Livelli per sottosistema che sovrascrivono il profilo, es. "src.recommendation=DEBUG,src.api=WARNING"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_SAMPLE_EVERY = 10  # A livello INFO si registra una generazione del GA ogni N (tutte a DEBUG)
+LOG_MAX_ITEMS = 5  # Elementi elencati a livello INFO nei riepiloghi (prodotti, tag); l'elenco completo è a DEBUG
+
+
+def set_log_profile(profile):
+    """
+    Applica i livelli per sottosistema del profilo indicato (più le sovrascritture di LOG_LEVELS).
+    Il profilo viene esportato nell'ambiente, così vale anche per i processi figli (spawn).
+    """
+    global LOG_PROFILE
+    LOG_PROFILE = profile
+    os.environ["LOG_PROFILE"] = profile
+    levels = dict(LOG_PROFILES[profile])
+    for item in filter(None, LOG_LEVELS.split(",")):
+        name, _, level = item.partition("=")
+        levels[name.strip()] = level.strip().upper()
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+
+
+set_log_profile(LOG_PROFILE)
+
 # Configurazioni API Spotify - Serve per l'autenticazione Spotify
 SPOTIPY_CLIENT_ID = os.getenv("SPOTIPY_CLIENT_ID")
 if SPOTIPY_CLIENT_ID is None :
@@ -19,6 +53,24 @@ SPOTIPY_CLIENT_SECRET = os.getenv("SPOTIPY_CLIENT_SECRET")
 if SPOTIPY_CLIENT_SECRET is None:
     logger.warning("SPOTIPY_CLIENT_SECRET non è stato definito nell'ambiente.")
 
+# Numero massimo di thread per le chiamate concorrenti all'API di Spotify
+SPOTIFY_MAX_WORKERS = 4
+# Numero massimo di ID per chiamata all'endpoint batch degli artisti (limite imposto da Spotify)
+SPOTIFY_ARTISTS_BATCH_SIZE = 50
+# Prefisso degli endpoint dell'API Web di Spotify (es. http://127.0.0.1:8765/api.spotify.com/v1/ per tests/replay_server.py)
+SPOTIFY_API_PREFIX = os.getenv("SPOTIFY_API_PREFIX", "https://api.spotify.com/v1/")
+
+# Cache persistente dei metadati degli artisti Spotify (nome e generi), condivisa tra utenti e worker
+ARTIST_CACHE_PATH = "../data/artist_cache.sqlite3"
+ARTIST_CACHE_TTL = 7 * 24 * 3600  # Validità di una voce in secondi (i generi cambiano raramente)
+ARTIST_CACHE_NEGATIVE_TTL = 3600  # Validità in secondi di una ricerca fallita (artista non trovato)
+ARTIST_CACHE_LRU_SIZE = 10000  # Numero massimo di artisti mantenuti in memoria davanti a SQLite
+
+# Cache lato server dei profili musicali degli utenti (output di get_spotify_data)
+PROFILE_CACHE_TTL = 300  # Secondi di validità di un profilo
+PROFILE_CACHE_MAX_STALE = 3600  # Secondi oltre il TTL in cui il profilo scaduto viene servito mentre si aggiorna in background
+PROFILE_CACHE_MAX_USERS = 10000  # Numero massimo di profili mantenuti in memoria
+
 # Configurazioni API Last.fm - Serve per creare i dizionari
 LASTFM_API_KEY = os.getenv("LASTFM_API_KEY")
 if LASTFM_API_KEY is None:
@@ -30,6 +82,23 @@ if LASTFM_SHARED_SECRET is None:
 
 
 
+# Trasporto HTTP condiviso dai client Spotify e Last.fm
+HTTP_POOL_CONNECTIONS = 4  # Numero di host distinti con un pool di connessioni dedicato
+HTTP_POOL_MAXSIZE = 16  # Connessioni keep-alive per host (>= thread concorrenti che usano lo stesso host)
+HTTP_MAX_RETRIES = 4  # Tentativi aggiuntivi per errori di connessione e risposte 429/5xx
+HTTP_BACKOFF_FACTOR = 0.5  # Backoff esponenziale: 0.5s, 1s, 2s, ... (Retry-After ha la precedenza)
+HTTP_BACKOFF_MAX = 30  # Attesa massima in secondi tra due tentativi
+HTTP_DEFAULT_TIMEOUT = (3.05, 15)  # Timeout (connessione, lettura) in secondi per host non elencati
+HTTP_TIMEOUTS = {
+    "api.spotify.com": (3.05, 10),
+    "accounts.spotify.com": (3.05, 10),
+    "ws.audioscrobbler.com": (3.05, 20),
+}
+# Cartella in cui registrare le risposte HTTP come fixture per tests/replay_server.py (None = nessuna registrazione)
+HTTP_RECORD_DIR = os.getenv("HTTP_RECORD_DIR")
+
+
+
 # Percorso data prodotti musicali
 DATASET_PATH = "../data/music-products.csv"
 
@@ -37,9 +106,42 @@ DATASET_PATH = "../data/music-products.csv"
 LASTFM_ARTISTS_FILE = "../data/artists.txt"
 LASTFM_GENRES_FILE = "../data/genres.txt"
 
+# Endpoint dell'API di Last.fm (sovrascrivibile per puntare a un server locale)
+LASTFM_API_URL = os.getenv("LASTFM_API_URL", "https://ws.audioscrobbler.com/2.0/")
+# Crawl dei dizionari: thread concorrenti e rate limit (Last.fm consente in media 5 richieste al secondo)
+LASTFM_MAX_WORKERS = 8
+LASTFM_RATE_LIMIT = 5  # Richieste al secondo
+LASTFM_RATE_BURST = 5  # Richieste consentite in rapida successione
+# File con lo stato di avanzamento del crawl
+LASTFM_CRAWL_PROGRESS_FILE = "../data/lastfm_crawl_progress.json"
+# Profondità di paginazione del crawl (pagine di tag.getTopTags e di tag.getTopArtists per genere)
+LASTFM_GENRE_PAGES = 1
+LASTFM_ARTIST_PAGES = 1
+# Numero massimo di termini distinti in memoria durante la deduplicazione (oltre si usano file temporanei)
+LASTFM_DEDUP_MAX_IN_MEMORY = 200000
+# Checkpoint delle risposte di Last.fm: il crawl riprende da qui e riscarica solo le voci più vecchie di LASTFM_CRAWL_MAX_AGE
+LASTFM_CRAWL_STATE_FILE = "../data/lastfm_crawl_state.sqlite3"
+LASTFM_CRAWL_MAX_AGE = 7 * 24 * 3600  # Secondi
+# Termini aggiunti e rimossi dall'ultimo aggiornamento dei dizionari (per il re-tagging incrementale)
+LASTFM_DICTIONARY_DIFF_FILE = "../data/dictionary_diff.json"
+
 # Attivazione dell'estrazione di dati da Last.fm per creare i dizionari
 CREATE_DICTIONARY = False
 
+# Catalogo condiviso tra worker: il processo master lo esporta (EXPORT_CATALOG) e ogni worker lo collega
+# in sola lettura tramite mmap (CATALOG_ATTACH_DIR), senza ripetere il preprocessing.
+# Su Linux conviene una cartella in /dev/shm, così che i file restino in RAM.
+EXPORT_CATALOG = False
+CATALOG_EXPORT_DIR = "../data/catalog"
+CATALOG_ATTACH_DIR = os.getenv("BRANDIFY_CATALOG_DIR")  # None = ogni processo costruisce il proprio catalogo
+
+# Aggiornamento del catalogo senza riavvio: controllo periodico (secondi) di CSV e dizionari
+# (o del file CURRENT dell'export condiviso). L'aggiornamento può essere avviato anche con
+# POST /admin/catalog/reload, attivo solo se è definito ADMIN_TOKEN (header X-Admin-Token).
+CATALOG_WATCH = True
+CATALOG_WATCH_INTERVAL = 5
+ADMIN_TOKEN = os.getenv("BRANDIFY_ADMIN_TOKEN")
+
 
 
 # Configurazioni per l'Algoritmo Genetico
@@ -50,6 +152,50 @@ GA_MUTATION_PERCENT_GENES = 3  # Percentuale di geni mutati in una soluzione, 3%
 GA_CROSSOVER_PROBABILITY = 70  # Probabilità di crossover tra due genitori, 70%
 GA_KEEP_ELITISM = 2  # Numero di individui migliori da mantenere intatti a ogni generazione
 GA_STAGNATION_LIMIT = 35  # Numero di iterazioni senza miglioramenti per considerare l'algoritmo in stallo
+# Tempo massimo (ms) di una raccomandazione: scaduto, si restituisce la miglior soluzione trovata (0 = nessun limite).
+# Disattivato di default: con un budget il risultato dipende dal carico della macchina. In produzione si imposta
+# con BRANDIFY_GA_TIME_BUDGET_MS (ad es. 2000); i run interrotti sono segnalati (truncated) nel log e nelle risposte.
+GA_TIME_BUDGET_MS = int(os.getenv("BRANDIFY_GA_TIME_BUDGET_MS", "0"))
+GA_CANDIDATE_PRUNING = True  # Il genoma contiene solo i prodotti candidati (affinità non nulla o rilevanti)
+GA_EXPLORATION_SAMPLE = 0  # Prodotti non candidati aggiunti a caso al genoma come esplorazione (0 = nessuno)
+GA_GENE_CLASSES = True  # Prodotti con le stesse tag condividono un unico gene (classe)
+GA_INCREMENTAL_FITNESS = True  # Fitness dei figli calcolata dai soli geni cambiati rispetto al genitore
+GA_INCREMENTAL_MIN_GENES = 1000  # Lunghezza minima del genoma per la fitness incrementale (sotto è più rapida quella completa)
+GA_SHARDED = False  # Modalità a shard: catalogo partizionato per famiglia di generi, shard ottimizzati in parallelo
+GA_SHARDS = 8  # Numero massimo di shard
+GA_SHARD_WORKERS = None  # Processi per l'ottimizzazione degli shard (None = numero di core, 1 = nel processo corrente)
+# Warm start (opzionale): la ricerca successiva di un utente parte dalla popolazione finale della precedente.
+# Il risultato dipende allora dalle ricerche precedenti dell'utente, non solo da profilo e parametri:
+# l'ETag di /recommendations/api, calcolato da questi ultimi, può rivalidare pagine che il server ricalcolerebbe diverse.
+GA_WARM_START = False
+GA_WARM_START_FRACTION = 0.7  # Frazione della popolazione iniziale presa dal run precedente (il resto è casuale)
+GA_WARM_STAGNATION_LIMIT = 10  # Soglia di stagnazione di un run con warm start (parte già vicino all'ottimo)
+GA_WARM_START_MAX_USERS = 1000  # Utenti di cui conservare la popolazione finale (politica LRU)
+GA_WARM_START_TTL = 1800  # Secondi di validità di una popolazione conservata
+GA_AUTO_TUNE = False  # Modalità opzionale: popolazione, mutazione e stagnazione dimensionate per run dal genoma (vedi GA_AUTO_TUNE_PARAMS)
+# Coefficienti dell'auto-tuning (sovrascritti da GA_TUNED_PROFILE se presente, generato da tests/ga_tuning.py):
+# popolazione = population_per_log_gene * log2(geni + 1), più ampia per genomi con pochi geni rilevanti;
+# mutazione = mutation_genes geni invertiti in media per individuo;
+# stagnazione = stagnation_base + stagnation_scale * geni / popolazione, più lunga per genomi con pochi geni rilevanti;
+# generazioni massime = generations_per_stagnation * stagnazione.
+GA_AUTO_TUNE_PARAMS = {
+    "population_per_log_gene": 10,
+    "population_min": 16,
+    "population_max": 200,
+    "parents_ratio": 0.35,
+    "mutation_genes": 1.0,
+    "mutation_percent_min": 0.1,
+    "mutation_percent_max": 10,
+    "stagnation_base": 8,
+    "stagnation_scale": 4,
+    "stagnation_max": 100,
+    "sparsity_weight": 1.0,  # Peso della frazione di geni non rilevanti su popolazione e stagnazione
+    "generations_per_stagnation": 6,
+    "generations_max": 1000,
+}
+GA_TUNED_PROFILE = "../data/ga_tuned_profile.json"  # Coefficienti scritti da tests/ga_tuning.py (assente = GA_AUTO_TUNE_PARAMS)
+GA_TUNING_MIN_QUALITY = 0.99  # Qualità media minima (fitness rispetto all'ottimo) di una configurazione candidata
+GA_TUNING_TRIALS = 30  # Configurazioni valutate dalla ricerca casuale di tests/ga_tuning.py
 
 # Pesi per la funzione di fitness
 GA_AFFINITY_WEIGHTS = {
@@ -61,12 +207,21 @@ GA_PENALTY_MISSING_RELEVANT = 15  # Penalità per ogni prodotto "rilevante" non
 
 
 
+# API JSON delle raccomandazioni
+API_PAGE_SIZE = 20  # Prodotti per pagina di default
+API_MAX_PAGE_SIZE = 200  # Prodotti massimi per pagina
+RESULTS_PAGE_SIZE = 24  # Prodotti per pagina nei risultati HTML
+RESULT_CACHE_MAX_ENTRIES = 1000  # Risultati del GA mantenuti in memoria (per la paginazione)
+RESULT_CACHE_TTL = 900  # Secondi di validità di un risultato in cache
+
+
+
 # Flask session secret key
 FLASK_SECRET_KEY = secrets.token_hex(32)
 
 
 
-# Attivazione dei dati mock (cambiare config.PROFILE_* in recommendations.py)
+# Attivazione dei dati mock (profilo scelto per richiesta tra config.MOCK_PROFILES)
 USE_MOCK_DATA = True
 
 # Profilo 1 - Metal/Rock
@@ -93,7 +248,38 @@ PROFILE_3 = {
     "recent_genres": ['pop', 'electronic', 'dance', 'techno', 'house', 'trance', 'experimental', 'ambient', 'reggaeton', 'dance_pop', 'art_pop', 'rb']
 }
 
+# Profili mock selezionabili per richiesta con il parametro "mock_profile" (default: PROFILE_1)
+MOCK_PROFILES = {
+    "1": PROFILE_1,
+    "2": PROFILE_2,
+    "3": PROFILE_3,
+}
+
 
 
 # Attivazione dei test di benchmark
 RUN_TESTS = False
+BENCHMARK_REPETITIONS = 5  # Ripetizioni di ogni combinazione (media e intervallo di confidenza)
+BENCHMARK_WORKERS = None  # Processi paralleli (None = numero di core)
+BENCHMARK_SEED = 42  # Seed base: ogni run riceve un seed derivato, i risultati sono riproducibili
+BENCHMARK_MEMORY_PROFILE = True  # Memoria per fase (RSS e tracemalloc); tracemalloc rallenta i run
+BENCHMARK_TOP_ALLOCATIONS = 0  # Siti di allocazione per fase nel report (0 = nessun report)
+BENCHMARK_LOG_PROFILE = "production"  # Profilo di logging dei benchmark (vedi LOG_PROFILES e tests/logging_overhead.py)
+
+# Budget del tempo di import (ms) per entry point, verificato da tests/startup_benchmark.py
+STARTUP_IMPORT_BUDGET_MS = {
+    "server": 1000,
+    "dictionary": 600,
+    "benchmark": 1000,
+}
+
+# Micro-benchmark (tests/micro_benchmarks.py): campioni per funzione e criteri per segnalare un rallentamento
+MICRO_BENCHMARK_SAMPLES = 20
+MICRO_BENCHMARK_THRESHOLD = 0.10  # Aumento minimo della mediana rispetto alla baseline (10%)
+MICRO_BENCHMARK_ALPHA = 0.01  # Livello di significatività del test di Mann-Whitney
+
+# Test di carico (tests/load_test.py): client concorrenti, durata e mix delle richieste
+LOAD_TEST_CONCURRENCY = 8
+LOAD_TEST_DURATION = 30  # Durata della misura in secondi
+LOAD_TEST_WARMUP = 5  # Secondi iniziali esclusi dalle statistiche
+LOAD_TEST_MIX = {"api": 3, "html": 1, "page": 1}  # Pesi dei tipi di richiesta
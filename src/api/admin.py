@@ -0,0 +1,37 @@
+import hmac
+from flask import Blueprint, request, jsonify, current_app
+import config
+
+admin_bp = Blueprint('admin', __name__)
+
+
+def _authorized():
+    """
+    Le route di amministrazione sono attive solo se config.ADMIN_TOKEN è definito
+    e la richiesta presenta lo stesso valore nell'header X-Admin-Token.
+    """
+    token = request.headers.get("X-Admin-Token", "")
+    return bool(config.ADMIN_TOKEN) and hmac.compare_digest(token, config.ADMIN_TOKEN)
+
+
+@admin_bp.route('/catalog', methods=['GET'])
+def catalog_status():
+    if not _authorized():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify(current_app.config["CATALOG_MANAGER"].status())
+
+
+@admin_bp.route('/catalog/reload', methods=['POST'])
+def catalog_reload():
+    """
+    Avvia l'aggiornamento del catalogo in background. Con ?wait=true la risposta
+    arriva a ricostruzione completata.
+    """
+    if not _authorized():
+        return jsonify({"error": "Forbidden"}), 403
+    manager = current_app.config["CATALOG_MANAGER"]
+    future = manager.reload()
+    if request.args.get('wait', 'false').lower() == 'true':
+        future.result()
+        return jsonify(manager.status())
+    return jsonify(manager.status()), 202
@@ -0,0 +1,149 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class ArtistCache:
+    """
+    Cache persistente dei metadati degli artisti Spotify (ID -> nome e generi già normalizzati).
+    Un LRU in memoria fa da primo livello davanti a un database SQLite condiviso tra i worker.
+    Le voci scadono dopo un TTL e vengono quindi ricaricate; le ricerche fallite vengono
+    memorizzate come voci "negative" con un TTL più breve, per non ripeterle a ogni richiesta.
+    """
+
+    def __init__(self, db_path, ttl, negative_ttl, lru_size):
+        """
+        :param db_path: Percorso del file SQLite (creato al primo utilizzo).
+        :param ttl: Durata in secondi di una voce valida.
+        :param negative_ttl: Durata in secondi di una voce negativa (artista non trovato).
+        :param lru_size: Numero massimo di voci mantenute nel LRU in memoria.
+        """
+        self.db_path = db_path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.lru_size = lru_size
+
+        self._lru = OrderedDict()
+        self._lru_lock = threading.Lock()
+        # Una connessione per thread: gli oggetti sqlite3 non vanno condivisi tra thread
+        self._local = threading.local()
+
+    def _connection(self):
+        """
+        Restituisce la connessione SQLite del thread corrente, creandola se necessario.
+        La modalità WAL consente letture concorrenti da più processi durante le scritture.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            dir_db = os.path.dirname(self.db_path)
+            if dir_db and not os.path.exists(dir_db):
+                os.makedirs(dir_db, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS artists ("
+                " artist_id TEXT PRIMARY KEY,"
+                " name TEXT,"
+                " genres TEXT,"
+                " expires_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def _lru_get(self, artist_id, now):
+        with self._lru_lock:
+            item = self._lru.get(artist_id)
+            if item is None:
+                return None
+            entry, expires_at = item
+            if expires_at <= now:
+                del self._lru[artist_id]
+                return None
+            self._lru.move_to_end(artist_id)
+            return item
+
+    def _lru_put(self, artist_id, entry, expires_at):
+        with self._lru_lock:
+            self._lru[artist_id] = (entry, expires_at)
+            self._lru.move_to_end(artist_id)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def get_many(self, artist_ids):
+        """
+        Cerca più artisti nella cache (prima nel LRU, poi su SQLite).
+
+        :param artist_ids: Iterabile di ID artista Spotify.
+        :return: Tupla (hits, misses). hits è un dizionario {artist_id: voce}, dove la voce è
+                 {'name': ..., 'genres': [...]} oppure None se l'artista è in cache negativa;
+                 misses è la lista degli ID assenti o scaduti, da richiedere a Spotify.
+        """
+        now = time.time()
+        hits = {}
+        pending = []
+        for artist_id in dict.fromkeys(artist_ids):
+            item = self._lru_get(artist_id, now)
+            if item is not None:
+                hits[artist_id] = item[0]
+            else:
+                pending.append(artist_id)
+
+        if not pending:
+            return hits, []
+
+        try:
+            placeholders = ",".join("?" * len(pending))
+            rows = self._connection().execute(
+                f"SELECT artist_id, name, genres, expires_at FROM artists WHERE artist_id IN ({placeholders})",
+                pending
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning("Cache artisti non disponibile: %s", e)
+            rows = []
+
+        for artist_id, name, genres, expires_at in rows:
+            if expires_at <= now:
+                continue
+            entry = None if name is None else {"name": name, "genres": json.loads(genres)}
+            self._lru_put(artist_id, entry, expires_at)
+            hits[artist_id] = entry
+
+        misses = [artist_id for artist_id in pending if artist_id not in hits]
+        return hits, misses
+
+    def put_many(self, entries):
+        """
+        Salva più artisti nella cache. Una voce None registra una ricerca fallita (cache negativa).
+
+        :param entries: Dizionario {artist_id: {'name': ..., 'genres': [...]} oppure None}.
+        """
+        if not entries:
+            return
+        now = time.time()
+        rows = []
+        for artist_id, entry in entries.items():
+            if entry is None:
+                expires_at = now + self.negative_ttl
+                rows.append((artist_id, None, None, expires_at))
+            else:
+                expires_at = now + self.ttl
+                rows.append((artist_id, entry["name"], json.dumps(entry["genres"]), expires_at))
+            self._lru_put(artist_id, entry, expires_at)
+
+        try:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO artists (artist_id, name, genres, expires_at) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+        except sqlite3.Error as e:
+            logger.warning("Impossibile aggiornare la cache artisti: %s", e)
@@ -0,0 +1,71 @@
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+# Parametri della query esclusi dalle fixture (credenziali di Last.fm)
+REDACTED_PARAMS = frozenset(["api_key", "api_sig", "sk"])
+
+
+def fixture_key(method, url):
+    """
+    Chiave di una richiesta nelle fixture: metodo, host e path, parametri della query ordinati
+    e senza credenziali, ad es. "GET api.spotify.com/v1/artists?ids=a%2Cb".
+    Le credenziali negli header (token Spotify) non fanno parte della chiave.
+    """
+    parts = urlsplit(url)
+    params = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in REDACTED_PARAMS)
+    key = f"{method.upper()} {parts.hostname}{parts.path}"
+    return f"{key}?{urlencode(params)}" if params else key
+
+
+class FixtureRecorder:
+    """
+    Hook di risposta di requests che registra le risposte del trasporto HTTP condiviso
+    in file JSONL, uno per host (ad es. api.spotify.com.jsonl), riproducibili con tests/replay_server.py.
+    Vengono registrate solo le richieste GET: le POST (scambio dei token OAuth) contengono credenziali.
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: Cartella delle fixture (creata se non esiste).
+        """
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def __call__(self, response, *args, **kwargs):
+        if response.request.method != "GET":
+            return
+        entry = {
+            "key": fixture_key("GET", response.url),
+            "status": response.status_code,
+            "content_type": response.headers.get("Content-Type"),
+            "retry_after": response.headers.get("Retry-After"),
+            "elapsed_ms": round(response.elapsed.total_seconds() * 1000, 2),
+            "recorded_at": time.time(),
+            "body": response.text,
+        }
+        path = os.path.join(self.directory, f"{urlsplit(response.url).hostname}.jsonl")
+        with self._lock, open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+def load_fixtures(directory):
+    """
+    Carica le fixture registrate da FixtureRecorder (tutti i file .jsonl della cartella).
+    Se una richiesta è stata registrata più volte vale l'ultima registrazione.
+
+    :return: Dizionario {chiave: voce registrata}.
+    """
+    fixtures = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".jsonl"):
+            continue
+        with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    fixtures[entry["key"]] = entry
+    return fixtures
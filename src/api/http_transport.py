@@ -0,0 +1,155 @@
+import threading
+from collections import Counter
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.api.http_recording import FixtureRecorder
+import config
+
+# Codici di stato per cui una richiesta viene ritentata (rate limit ed errori transitori del server)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_stats_lock = threading.Lock()
+_request_counts = Counter()  # host -> richieste completate
+_retry_counts = Counter()  # (host, causa) -> tentativi ripetuti
+
+_session = None
+_session_lock = threading.Lock()
+
+# Rate limiter per host (vedi register_rate_limiter): consultati anche prima di ogni tentativo ripetuto
+_rate_limiters = {}
+
+
+class _CountingRetry(Retry):
+    """
+    Retry di urllib3 che registra ogni tentativo ripetuto nelle statistiche del trasporto.
+    Il backoff è esponenziale e, per le risposte 429/503, rispetta l'header Retry-After
+    (limitato anch'esso a config.HTTP_BACKOFF_MAX). Prima di ogni tentativo ripetuto verso un host
+    con un rate limiter registrato si attende un token, così i retry restano entro il rate consentito.
+    """
+
+    _host = None  # Host del tentativo in corso, impostato da increment() sul nuovo oggetto Retry
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        host = _pool.host if _pool is not None else "?"
+        cause = str(response.status) if response is not None else type(error).__name__
+        with _stats_lock:
+            _retry_counts[(host, cause)] += 1
+        new_retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        new_retry._host = host
+        return new_retry
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return min(retry_after, config.HTTP_BACKOFF_MAX) if retry_after is not None else None
+
+    def sleep(self, response=None):
+        super().sleep(response)
+        limiter = _rate_limiters.get(self._host)
+        if limiter is not None:
+            limiter.acquire()
+
+
+class TransportSession(requests.Session):
+    """
+    Sessione requests con timeout di default differenziati per host (config.HTTP_TIMEOUTS),
+    applicati solo quando il chiamante non specifica un timeout esplicito.
+    """
+
+    def request(self, method, url, *args, **kwargs):
+        if kwargs.get("timeout") is None:
+            host = urlsplit(url).hostname
+            kwargs["timeout"] = config.HTTP_TIMEOUTS.get(host, config.HTTP_DEFAULT_TIMEOUT)
+        return super().request(method, url, *args, **kwargs)
+
+
+def _count_response(response, *args, **kwargs):
+    host = urlsplit(response.url).hostname
+    with _stats_lock:
+        _request_counts[host] += 1
+
+
+def _build_session():
+    retry = _CountingRetry(
+        total=config.HTTP_MAX_RETRIES,
+        connect=config.HTTP_MAX_RETRIES,
+        read=False,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        status_forcelist=RETRY_STATUS_CODES,
+        backoff_factor=config.HTTP_BACKOFF_FACTOR,
+        backoff_max=config.HTTP_BACKOFF_MAX,
+        respect_retry_after_header=True,
+        # Esauriti i tentativi viene restituita l'ultima risposta: l'errore è gestito dal client
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=config.HTTP_POOL_CONNECTIONS,
+        pool_maxsize=config.HTTP_POOL_MAXSIZE,
+        max_retries=retry
+    )
+    session = TransportSession()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.hooks["response"].append(_count_response)
+    if config.HTTP_RECORD_DIR:
+        # Registrazione delle risposte come fixture per il replay offline (tests/replay_server.py)
+        session.hooks["response"].append(FixtureRecorder(config.HTTP_RECORD_DIR))
+    return session
+
+
+def register_rate_limiter(host, limiter):
+    """
+    Associa un rate limiter (TokenBucket) a un host: oltre alla richiesta iniziale, che il client
+    limita da sé, anche ogni tentativo ripetuto dal trasporto attende un token del limiter.
+    """
+    _rate_limiters[host] = limiter
+
+
+def get_session():
+    """
+    Restituisce la sessione HTTP condivisa (keep-alive, pool di connessioni, retry con backoff).
+    La sessione viene creata al primo utilizzo e riutilizzata da tutti i client (Spotify, Last.fm).
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def get_transport_stats():
+    """
+    Restituisce le statistiche del trasporto HTTP condiviso.
+
+    :return: Dizionario con:
+        {
+          "requests": {host: richieste completate},
+          "retries": {host: {causa: tentativi ripetuti}},
+          "pools": {host: {"connections_opened": int, "requests": int, "idle": int}},
+        }
+    """
+    with _stats_lock:
+        requests_by_host = dict(_request_counts)
+        retries_by_host = {}
+        for (host, cause), count in _retry_counts.items():
+            retries_by_host.setdefault(host, {})[cause] = count
+
+    pools = {}
+    if _session is not None:
+        adapter = _session.get_adapter("https://")
+        for key in list(adapter.poolmanager.pools.keys()):
+            pool = adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            pools[pool.host] = {
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+                # La coda del pool contiene None per gli slot mai utilizzati
+                "idle": sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool else 0,
+            }
+
+    return {"requests": requests_by_host, "retries": retries_by_host, "pools": pools}
@@ -0,0 +1,48 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class PopulationStore:
+    """
+    Cache LRU con TTL delle popolazioni finali del GA, una per utente (l'ultima ricerca eseguita).
+    La ricerca successiva dello stesso utente parte da questa popolazione (warm start) invece che
+    da individui casuali: le popolazioni sono espresse per ID prodotto, quindi restano utilizzabili
+    anche con un altro range di prezzo, un'altra modalità di preferenza o una nuova versione del catalogo.
+    """
+
+    def __init__(self, max_entries, ttl):
+        """
+        :param max_entries: Numero massimo di utenti di cui conservare la popolazione.
+        :param ttl: Secondi di validità di una popolazione.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # utente -> (popolazione, istante di inserimento)
+        self._lock = threading.Lock()
+
+    def get(self, user_key):
+        """
+        Restituisce la popolazione dell'ultimo run dell'utente, oppure None se assente o scaduta.
+        """
+        with self._lock:
+            item = self._entries.get(user_key)
+            if item is None:
+                return None
+            population, stored_at = item
+            if time.monotonic() - stored_at >= self.ttl:
+                del self._entries[user_key]
+                return None
+            self._entries.move_to_end(user_key)
+            return population
+
+    def put(self, user_key, population):
+        with self._lock:
+            self._entries[user_key] = (population, time.monotonic())
+            self._entries.move_to_end(user_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,87 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileCache:
+    """
+    Cache lato server dei profili musicali degli utenti (output di get_spotify_data),
+    indicizzata per utente Spotify.
+    Una voce è "fresca" per `ttl` secondi; scaduto il TTL viene comunque servita
+    (stale-while-revalidate) per altri `max_stale` secondi, mentre un thread in background
+    ricarica il profilo. Oltre questa finestra il profilo viene ricaricato in modo sincrono.
+    """
+
+    def __init__(self, ttl, max_stale, max_entries, refresh_workers=2):
+        """
+        :param ttl: Secondi di validità di un profilo.
+        :param max_stale: Secondi oltre il TTL durante i quali il profilo scaduto può essere servito.
+        :param max_entries: Numero massimo di profili in memoria (politica LRU).
+        :param refresh_workers: Numero di thread dedicati ai refresh in background.
+        """
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()  # key -> (profilo, istante di caricamento)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="profile-refresh")
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _refresh(self, key, loader):
+        """
+        Ricarica un profilo in background. In caso di errore il profilo scaduto resta in cache.
+        """
+        try:
+            self._store(key, loader())
+        except Exception as e:
+            logger.warning("Refresh in background del profilo fallito: %s", e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get(self, key, loader):
+        """
+        Restituisce il profilo associato a `key`, caricandolo con `loader` se assente.
+
+        :param key: Identificativo dell'utente Spotify.
+        :param loader: Funzione senza argomenti che restituisce il profilo aggiornato.
+        :return: Il profilo (dizionario con le quattro liste di get_spotify_data).
+        """
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                value, loaded_at = item
+                age = now - loaded_at
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    return value
+                if age < self.ttl + self.max_stale:
+                    # Profilo scaduto ma ancora servibile: un solo refresh in corso per utente
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        self._executor.submit(self._refresh, key, loader)
+                    return value
+
+        value = loader()
+        self._store(key, value)
+        return value
+
+    def invalidate(self, key):
+        """
+        Rimuove il profilo di un utente dalla cache (ad esempio al logout).
+        """
+        with self._lock:
+            self._entries.pop(key, None)
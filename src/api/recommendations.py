@@ -1,9 +1,47 @@
-from flask import Blueprint, request, jsonify, render_template, session, current_app
-from src.api.spotify import get_spotify_data, get_spotify_token
+from flask import Blueprint, request, jsonify, render_template, stream_template, session, current_app, redirect, url_for
+from src.api.spotify import get_cached_spotify_data, get_spotify_token
+from src.api.result_cache import ResultCache
+from src.api.population_store import PopulationStore
+import numpy as np
+import base64
+import hashlib
+import json
+import logging
 import config
 
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # orjson è opzionale: in sua assenza si usa il modulo json standard
+    orjson = None
+
 recommendations_bp = Blueprint('recommendations', __name__)
 
+# Risultati del GA già calcolati, per servire le pagine successive e le richieste ripetute
+result_cache = ResultCache(max_entries=config.RESULT_CACHE_MAX_ENTRIES, ttl=config.RESULT_CACHE_TTL)
+
+# Popolazioni finali del GA per utente, da cui ripartono le ricerche successive (warm start)
+population_store = PopulationStore(max_entries=config.GA_WARM_START_MAX_USERS, ttl=config.GA_WARM_START_TTL)
+
+PREFERENCE_MODES = ("artist", "genre", "balanced")
+
+
+def _mock_profile():
+    """
+    Profilo mock della richiesta (modalità USE_MOCK_DATA): quello indicato dal parametro "mock_profile"
+    tra config.MOCK_PROFILES, altrimenti config.PROFILE_1.
+    """
+    return config.MOCK_PROFILES.get(request.values.get('mock_profile'), config.PROFILE_1)
+
+
+def invalidate_results(old_snapshot, new_snapshot):
+    """
+    Listener del CatalogManager: alla pubblicazione di una nuova versione del catalogo
+    i risultati calcolati sulla precedente non sono più serviti e vengono scartati.
+    """
+    result_cache.clear()
+
 @recommendations_bp.route('/configure', methods=['GET'])
 def configure_search():
     use_mock = request.args.get('mock', 'false').lower() == 'true'
@@ -24,28 +62,237 @@ def recommendations_results():
     min_price = request.form.get('min_price')
     max_price = request.form.get('max_price')
     preference_mode = request.form.get('preference_mode')
-    spotify_token = get_spotify_token()
     min_price = float(min_price) if min_price and float(min_price) >= 0 else None
     max_price = float(max_price) if max_price and float(max_price) >= 0 else None
 
     if config.USE_MOCK_DATA:
-        spotify_data = config.PROFILE_1  # Cambiare il profilo a seconda della necessità (vedi config.py)
-        print("[DEBUG] Spotify Mock Data:")
-        print(f"Mock Top Artists: {spotify_data['artists']}")
-        print(f"Mock Top Genres: {spotify_data['genres']}")
-        print(f"Mock Recent Artists: {spotify_data['recent_artists']}")
-        print(f"Mock Recent Genres: {spotify_data['recent_genres']}")
+        spotify_data = _mock_profile()  # Selezionabile con il parametro mock_profile (vedi config.MOCK_PROFILES)
+        logger.debug("Spotify Mock Data: top artists %s, top genres %s, recent artists %s, recent genres %s",
+                     spotify_data['artists'], spotify_data['genres'],
+                     spotify_data['recent_artists'], spotify_data['recent_genres'])
+    else:
+        token = _request_token()
+        if not token:
+            return jsonify({"error": "Authorization token missing"}), 401
+        spotify_data = get_cached_spotify_data(token, session.get('spotify_user_id'))
+
+    # La richiesta usa la versione del catalogo pubblicata al suo arrivo
+    snapshot = current_app.config["CATALOG_MANAGER"].current()
+    result_key, result = _cached_result(snapshot, spotify_data, min_price, max_price, preference_mode)
+    return _results_page(snapshot.catalog, result_key, result, offset=0)
+
+
+@recommendations_bp.route('/results/<result_key>', methods=['GET'])
+def recommendations_results_page(result_key):
+    """
+    Pagine successive dei risultati HTML, servite dagli ID in cache senza rieseguire il GA.
+    Se il risultato non è più in cache (scaduto o catalogo aggiornato) la ricerca va ripetuta.
+    """
+    try:
+        offset = _decode_cursor(request.args.get('cursor'))
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    result = result_cache.get(result_key)
+    catalog = current_app.config["CATALOG_MANAGER"].current().catalog
+    if result is None:
+        return redirect(url_for('recommendations.configure_search'))
+    return _results_page(catalog, result_key, result, offset)
+
+
+def _results_page(catalog, result_key, result, offset):
+    """
+    Rende in streaming una pagina dei risultati: i prodotti sono già ordinati per punteggio di affinità
+    e i record sono costruiti dal catalogo uno alla volta, solo per la pagina visibile, durante il rendering.
+    """
+    product_ids, _, _, _ = result
+    total = len(product_ids)
+    end = offset + config.RESULTS_PAGE_SIZE
+    positions = catalog.positions_of(product_ids[offset:end])
+    if (positions < 0).any():
+        # Risultato calcolato su una versione del catalogo non più pubblicata
+        return redirect(url_for('recommendations.configure_search'))
+
+    def page_url(page_offset):
+        return url_for('recommendations.recommendations_results_page', result_key=result_key,
+                       cursor=_encode_cursor(page_offset))
+
+    return current_app.response_class(stream_template(
+        'results.html',
+        results=(catalog.record(pos) for pos in positions),
+        total=total,
+        first=offset + 1,
+        last=min(end, total),
+        previous_url=page_url(max(offset - config.RESULTS_PAGE_SIZE, 0)) if offset > 0 else None,
+        next_url=page_url(end) if end < total else None,
+    ))
+
+
+def _cached_result(snapshot, spotify_data, min_price, max_price, preference_mode):
+    """
+    Risultato del GA per profilo e parametri di ricerca, dalla cache o calcolato e messo in cache.
+    Il GA è inizializzato dalla chiave del risultato e, con config.GA_WARM_START, parte dalla popolazione
+    finale dell'ultima ricerca dell'utente, che viene poi sostituita da quella di questo run.
+
+    :return: Tupla (chiave del risultato, (product_ids, scores, truncated, generations)),
+             con i prodotti ordinati per punteggio di affinità decrescente.
+    """
+    result_key = _result_key(spotify_data, min_price, max_price, preference_mode, snapshot.version)
+    result = result_cache.get(result_key)
+    if result is None:
+        user_key = _user_key(spotify_data)
+        engine = snapshot.engine.for_request(
+            user_data=spotify_data,
+            min_price=min_price,
+            max_price=max_price,
+            preference_mode=preference_mode,
+            seed=int(result_key[:16], 16),
+            warm_start=population_store.get(user_key) if config.GA_WARM_START else None
+        )
+        product_ids, scores = engine.recommend_ids()
+        result = (product_ids, scores, engine.truncated, engine.generations_completed)
+        result_cache.put(result_key, result)
+        if config.GA_WARM_START and engine.final_population is not None:
+            population_store.put(user_key, engine.final_population)
+    return result_key, result
+
+
+def _user_key(spotify_data):
+    """
+    Chiave dell'utente per il warm start: l'ID Spotify della sessione, se presente,
+    altrimenti un hash del profilo musicale (client con token Bearer e dati mock).
+    """
+    user_id = session.get('spotify_user_id')
+    if user_id:
+        return f"user:{user_id}"
+    payload = json.dumps({key: list(spotify_data.get(key, [])) for key in ("artists", "genres", "recent_artists", "recent_genres")},
+                         sort_keys=True)
+    return "profile:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _result_key(spotify_data, min_price, max_price, preference_mode, catalog_version):
+    """
+    Chiave deterministica di un risultato: hash di profilo utente, parametri di ricerca
+    e versione del catalogo. È la base dell'ETag e della cache dei risultati.
+    """
+    payload = json.dumps({
+        "profile": {key: list(spotify_data.get(key, [])) for key in ("artists", "genres", "recent_artists", "recent_genres")},
+        "min_price": min_price,
+        "max_price": max_price,
+        "preference_mode": preference_mode,
+        "catalog_version": catalog_version,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _encode_cursor(offset):
+    return base64.urlsafe_b64encode(f"o:{offset}".encode("ascii")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor):
+    """
+    Decodifica un cursore di paginazione. Solleva ValueError se il cursore non è valido.
+    """
+    if not cursor:
+        return 0
+    padded = cursor + "=" * (-len(cursor) % 4)
+    prefix, _, offset = base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii").partition(":")
+    if prefix != "o" or not offset.isdigit():
+        raise ValueError("cursor non valido")
+    return int(offset)
+
+
+def _numpy_default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Tipo non serializzabile: {type(obj).__name__}")
+
+
+def _json_response(payload, status=200):
+    """
+    Serializza la risposta con orjson (array numpy inclusi, senza conversioni intermedie)
+    o, se non installato, con il modulo json standard.
+    """
+    if orjson is not None:
+        body = orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    else:
+        body = json.dumps(payload, default=_numpy_default)
+    return current_app.response_class(body, status=status, mimetype="application/json")
+
+
+def _request_token():
+    """
+    Token Spotify della richiesta: header "Authorization: Bearer ..." (client mobile e batch),
+    altrimenti quello della sessione web o della cache di spotipy.
+    """
+    auth_header = request.headers.get("Authorization", "")
+    if auth_header.startswith("Bearer "):
+        return auth_header[len("Bearer "):].strip()
+    return session.get('authorization_token') or get_spotify_token()
+
+
+@recommendations_bp.route('/api', methods=['GET'])
+def recommendations_api():
+    """
+    Raccomandazioni in formato JSON: ID dei prodotti (indice nel catalogo) e punteggi di affinità,
+    ordinati per punteggio, con paginazione a cursore, più il numero di generazioni del GA e
+    l'indicazione se il run è stato interrotto per budget di tempo (truncated).
+    Query string: min_price, max_price, preference_mode, limit, cursor.
+    L'ETag dipende da profilo, parametri, versione del catalogo e pagina: con If-None-Match
+    un client può rivalidare la risposta e ricevere 304 senza che il GA venga rieseguito
+    (il GA è deterministico a parità di questi, salvo con config.GA_WARM_START o un budget di tempo).
+    """
+    try:
+        min_price = request.args.get('min_price')
+        max_price = request.args.get('max_price')
+        min_price = float(min_price) if min_price and float(min_price) >= 0 else None
+        max_price = float(max_price) if max_price and float(max_price) >= 0 else None
+        limit = int(request.args.get('limit', config.API_PAGE_SIZE))
+        offset = _decode_cursor(request.args.get('cursor'))
+    except ValueError:
+        return jsonify({"error": "Invalid query parameters"}), 400
+    limit = max(1, min(limit, config.API_MAX_PAGE_SIZE))
+
+    preference_mode = request.args.get('preference_mode', 'balanced')
+    if preference_mode not in PREFERENCE_MODES:
+        return jsonify({"error": f"preference_mode must be one of {', '.join(PREFERENCE_MODES)}"}), 400
+
+    if config.USE_MOCK_DATA:
+        spotify_data = _mock_profile()  # Selezionabile con il parametro mock_profile (vedi config.MOCK_PROFILES)
     else:
-        spotify_data = get_spotify_data(spotify_token)
+        token = _request_token()
+        if not token:
+            return jsonify({"error": "Authorization token missing"}), 401
+        spotify_data = get_cached_spotify_data(token, session.get('spotify_user_id'))
 
-    engine = current_app.config["RECOMMENDER_ENGINE_GA"]
-    engine.min_price = min_price
-    engine.max_price = max_price
-    engine.preference_mode = preference_mode
-    engine.user_data = spotify_data
+    # La richiesta usa fino alla fine la versione del catalogo pubblicata al suo arrivo
+    snapshot = current_app.config["CATALOG_MANAGER"].current()
+    catalog_version = snapshot.version
+    result_key = _result_key(spotify_data, min_price, max_price, preference_mode, catalog_version)
+    etag = f"{result_key}-{offset}-{limit}"
 
-    df_results = engine.recommend()
+    # Rivalidazione: se il client ha già questa pagina non serve calcolare nulla
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        return response
 
-    if df_results.empty:
-        return render_template('results.html', results=[])
-    return render_template('results.html', results=df_results.to_dict(orient='records'))
+    _, result = _cached_result(snapshot, spotify_data, min_price, max_price, preference_mode)
+    product_ids, scores, truncated, generations = result
+    end = offset + limit
+    response = _json_response({
+        "catalog_version": catalog_version,
+        "total": len(product_ids),
+        "product_ids": product_ids[offset:end],
+        "scores": scores[offset:end],
+        "next_cursor": _encode_cursor(end) if end < len(product_ids) else None,
+        # truncated: GA interrotto per budget di tempo (miglior soluzione trovata entro config.GA_TIME_BUDGET_MS)
+        "truncated": truncated,
+        "generations": generations,
+    })
+    response.set_etag(etag)
+    # Il client può riusare la risposta solo dopo averla rivalidata
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
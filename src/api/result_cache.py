@@ -0,0 +1,47 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    """
+    Cache LRU con TTL dei risultati del GA (ID e punteggi dei prodotti selezionati),
+    indicizzata da una chiave derivata da profilo, parametri e versione del catalogo.
+    Permette di servire le pagine successive di uno stesso risultato senza rieseguire il GA.
+    """
+
+    def __init__(self, max_entries, ttl):
+        """
+        :param max_entries: Numero massimo di risultati mantenuti in memoria.
+        :param ttl: Secondi di validità di un risultato.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (valore, istante di inserimento)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Restituisce il risultato associato a `key`, oppure None se assente o scaduto.
+        """
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, stored_at = item
+            if time.monotonic() - stored_at >= self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -1,11 +1,18 @@
 from flask import Blueprint, request, redirect, session, url_for, jsonify
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
 import pandas as pd
 import re
 import os
+import hashlib
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from src.api.artist_cache import ArtistCache
+from src.api.profile_cache import ProfileCache
+from src.api.http_transport import get_session
 import config
 
+logger = logging.getLogger(__name__)
+
 spotify_bp = Blueprint('spotify', __name__)
 
 SPOTIPY_CLIENT_ID = config.SPOTIPY_CLIENT_ID
@@ -13,11 +20,29 @@ SPOTIPY_CLIENT_SECRET = config.SPOTIPY_CLIENT_SECRET
 SPOTIPY_REDIRECT_URI = 'http://localhost:5000/spotify/callback'
 SCOPE = 'user-library-read user-top-read user-read-recently-played'
 
-sp_oauth = SpotifyOAuth(
-    client_id=SPOTIPY_CLIENT_ID,
-    client_secret=SPOTIPY_CLIENT_SECRET,
-    redirect_uri=SPOTIPY_REDIRECT_URI,
-    scope=SCOPE
+# Gestore OAuth di Spotify, creato al primo utilizzo (vedi get_sp_oauth)
+_sp_oauth = None
+_sp_oauth_lock = threading.Lock()
+
+# Pool limitato condiviso per le chiamate concorrenti all'API di Spotify
+_spotify_executor = ThreadPoolExecutor(
+    max_workers=config.SPOTIFY_MAX_WORKERS,
+    thread_name_prefix="spotify"
+)
+
+# Cache dei metadati degli artisti (nome e generi normalizzati), condivisa tra utenti e worker
+artist_cache = ArtistCache(
+    db_path=config.ARTIST_CACHE_PATH,
+    ttl=config.ARTIST_CACHE_TTL,
+    negative_ttl=config.ARTIST_CACHE_NEGATIVE_TTL,
+    lru_size=config.ARTIST_CACHE_LRU_SIZE
+)
+
+# Cache dei profili musicali per utente, condivisa da /spotify/data e /recommendations/
+profile_cache = ProfileCache(
+    ttl=config.PROFILE_CACHE_TTL,
+    max_stale=config.PROFILE_CACHE_MAX_STALE,
+    max_entries=config.PROFILE_CACHE_MAX_USERS
 )
 
 def clean_text(text):
@@ -27,10 +52,41 @@ def clean_text(text):
     text = re.sub(r'[^a-zA-Z0-9 ]', '', text)
     return text.replace(" ", "_").lower()
 
+def get_sp_oauth():
+    """
+    Restituisce il gestore OAuth di Spotify. spotipy viene importato e il gestore creato solo
+    al primo utilizzo, così l'import del modulo (e l'avvio dei worker) resta leggero.
+    """
+    global _sp_oauth
+    if _sp_oauth is None:
+        with _sp_oauth_lock:
+            if _sp_oauth is None:
+                from spotipy.oauth2 import SpotifyOAuth
+                _sp_oauth = SpotifyOAuth(
+                    client_id=SPOTIPY_CLIENT_ID,
+                    client_secret=SPOTIPY_CLIENT_SECRET,
+                    redirect_uri=SPOTIPY_REDIRECT_URI,
+                    scope=SCOPE,
+                    requests_session=get_session()
+                )
+    return _sp_oauth
+
+def spotify_client(token):
+    """
+    Crea un client Spotify per il token indicato, appoggiato alla sessione HTTP condivisa
+    (pool di connessioni keep-alive, retry con backoff e timeout per host).
+    Gli endpoint sono quelli di config.SPOTIFY_API_PREFIX (l'API reale o un server di replay locale).
+    """
+    import spotipy
+    sp = spotipy.Spotify(auth=token, requests_session=get_session(), requests_timeout=None)
+    sp.prefix = config.SPOTIFY_API_PREFIX
+    return sp
+
 def get_spotify_token():
     """
     Recupera il token dal file di cache.
     """
+    sp_oauth = get_sp_oauth()
     token_info = sp_oauth.get_cached_token()
     if token_info and not sp_oauth.is_token_expired(token_info):
         return token_info['access_token']
@@ -40,41 +96,124 @@ def get_spotify_token():
 def login():
     if os.path.exists('.cache'):
         os.remove('.cache')
-    auth_url = sp_oauth.get_authorize_url() + "&show_dialog=true"
+    auth_url = get_sp_oauth().get_authorize_url() + "&show_dialog=true"
     return redirect(auth_url)
 
 @spotify_bp.route('/logout', methods=['GET'])
 def logout():
     if os.path.exists('.cache'):
         os.remove('.cache')
+    user_id = session.get('spotify_user_id')
+    if user_id:
+        profile_cache.invalidate(user_id)
     session.clear()
     return redirect('/')
 
 @spotify_bp.route('/callback', methods=['GET'])
 def callback():
     code = request.args.get('code')
-    token_info = sp_oauth.get_access_token(code)
+    token_info = get_sp_oauth().get_access_token(code)
     session['authorization_token'] = token_info['access_token']
+    # L'ID utente Spotify è la chiave della cache dei profili
+    session['spotify_user_id'] = spotify_client(token_info['access_token']).current_user()['id']
     return redirect(url_for('recommendations.configure_search'))
 
-def get_spotify_data(token, top_n_genres=15, top_m_artists=15):
-    sp = spotipy.Spotify(auth=token)
+def _fetch_artists(sp, artist_ids):
+    """
+    Recupera i metadati di più artisti tramite l'endpoint batch di Spotify
+    (fino a SPOTIFY_ARTISTS_BATCH_SIZE ID per chiamata), eliminando i duplicati.
+
+    :param sp: Client Spotify (spotipy.Spotify o uno stub con la stessa interfaccia).
+    :param artist_ids: Iterabile di ID artista Spotify (anche con duplicati).
+    :return: Dizionario {artist_id: dati_artista}. Gli ID non trovati sono omessi.
+    """
+    # dict.fromkeys deduplica mantenendo l'ordine di prima occorrenza
+    unique_ids = list(dict.fromkeys(artist_ids))
+    batch_size = config.SPOTIFY_ARTISTS_BATCH_SIZE
+    batches = [unique_ids[i:i + batch_size] for i in range(0, len(unique_ids), batch_size)]
+
+    artists_by_id = {}
+    for batch_ids, response in zip(batches, _spotify_executor.map(sp.artists, batches)):
+        # L'endpoint restituisce None per gli ID non validi, nello stesso ordine della richiesta
+        for artist_id, artist_data in zip(batch_ids, response.get('artists', [])):
+            if artist_data:
+                artists_by_id[artist_id] = artist_data
+    return artists_by_id
+
+def _clean_artist(artist_data):
+    """
+    Estrae nome e generi normalizzati (clean_text) dai dati di un artista Spotify.
+    """
+    return {
+        'name': clean_text(artist_data['name']),
+        'genres': [clean_text(genre) for genre in artist_data.get('genres', [])]
+    }
+
+def _resolve_artists(sp, artist_ids):
+    """
+    Restituisce nome e generi normalizzati degli artisti richiesti, interrogando Spotify
+    solo per gli ID assenti o scaduti nella cache degli artisti.
+
+    :param sp: Client Spotify.
+    :param artist_ids: Iterabile di ID artista Spotify (anche con duplicati).
+    :return: Dizionario {artist_id: {'name': ..., 'genres': [...]}} o None per gli artisti non trovati.
+    """
+    resolved, misses = artist_cache.get_many(artist_ids)
+    if misses:
+        fetched = _fetch_artists(sp, misses)
+        # Gli ID non restituiti da Spotify finiscono in cache negativa
+        entries = {
+            artist_id: _clean_artist(fetched[artist_id]) if artist_id in fetched else None
+            for artist_id in misses
+        }
+        artist_cache.put_many(entries)
+        resolved.update(entries)
+    return resolved
+
+def get_spotify_data(token, top_n_genres=15, top_m_artists=15, sp=None):
+    """
+    Costruisce il profilo musicale dell'utente (artisti e generi, top e recenti).
+    Top artists e recently played vengono richiesti in parallelo, mentre i generi
+    degli artisti ascoltati di recente sono letti dalla cache degli artisti e,
+    per quelli mancanti, ottenuti con un'unica chiamata batch.
+
+    :param token: Access token Spotify dell'utente.
+    :param top_n_genres: Numero massimo di generi da restituire per ciascuna lista.
+    :param top_m_artists: Numero massimo di artisti da restituire per ciascuna lista.
+    :param sp: Client Spotify da utilizzare (opzionale, ad es. uno stub locale per i test).
+    :return: Dizionario con le chiavi 'genres', 'artists', 'recent_genres', 'recent_artists'.
+    """
+    sp = sp or spotify_client(token)
+
+    # Le due chiamate sono indipendenti: vengono eseguite in parallelo
+    top_future = _spotify_executor.submit(sp.current_user_top_artists, limit=50, time_range='medium_term')
+    recent_future = _spotify_executor.submit(sp.current_user_recently_played, limit=50)
+    top_artists_data = top_future.result()['items']
+    recently_played_data = recent_future.result()['items']
 
-    top_artists_data = sp.current_user_top_artists(limit=50, time_range='medium_term')['items']
     top_genres = []
     top_artists = []
+    top_entries = {}
     for artist in top_artists_data:
-        top_genres.extend([clean_text(genre) for genre in artist.get('genres', [])])
-        top_artists.append(clean_text(artist['name']))
+        entry = _clean_artist(artist)
+        top_genres.extend(entry['genres'])
+        top_artists.append(entry['name'])
+        top_entries[artist['id']] = entry
+    # I top artists contengono già i generi: aggiornano la cache senza chiamate aggiuntive
+    artist_cache.put_many(top_entries)
+
+    recent_track_artists = [item['track']['artists'][0] for item in recently_played_data]
+    artists_by_id = _resolve_artists(sp, [artist['id'] for artist in recent_track_artists])
 
-    recently_played_data = sp.current_user_recently_played(limit=50)['items']
     recent_genres = []
     recent_artists = []
-    for item in recently_played_data:
-        artist = item['track']['artists'][0]
-        artist_data = sp.artist(artist['id'])
-        recent_genres.extend([clean_text(genre) for genre in artist_data.get('genres', [])])
-        recent_artists.append(clean_text(artist_data['name']))
+    for artist in recent_track_artists:
+        entry = artists_by_id.get(artist['id'])
+        if entry is None:
+            # Artista non trovato: si usa il nome presente nella traccia, senza generi
+            entry = {'name': clean_text(artist['name']), 'genres': []}
+        recent_genres.extend(entry['genres'])
+        recent_artists.append(entry['name'])
 
     # Converte ciascuna lista in una Series, conta le occorrenze, seleziona i primi N/M elementi e ottiene l'indice come lista
     top_genres = pd.Series(top_genres).value_counts().head(top_n_genres).index.tolist()
@@ -82,11 +221,8 @@ def get_spotify_data(token, top_n_genres=15, top_m_artists=15):
     recent_genres = pd.Series(recent_genres).value_counts().head(top_n_genres).index.tolist()
     recent_artists = pd.Series(recent_artists).value_counts().head(top_m_artists).index.tolist()
 
-    print("[DEBUG] Spotify User Data:")
-    print(f"User Top Artists: {top_artists}")
-    print(f"User Top Genres: {top_genres}")
-    print(f"User Recent Artists: {recent_artists}")
-    print(f"User Recent Genres: {recent_genres}")
+    logger.debug("Spotify User Data: top artists %s, top genres %s, recent artists %s, recent genres %s",
+                 top_artists, top_genres, recent_artists, recent_genres)
 
     return {
         'genres': top_genres,
@@ -95,10 +231,22 @@ def get_spotify_data(token, top_n_genres=15, top_m_artists=15):
         'recent_artists': recent_artists
     }
 
+def get_cached_spotify_data(token, user_id=None):
+    """
+    Restituisce il profilo musicale dell'utente dalla cache dei profili, chiamando
+    get_spotify_data solo se assente o troppo vecchio (vedi ProfileCache).
+
+    :param token: Access token Spotify dell'utente.
+    :param user_id: ID utente Spotify; se assente la chiave è derivata dal token.
+    :return: Dizionario con le chiavi 'genres', 'artists', 'recent_genres', 'recent_artists'.
+    """
+    key = user_id or hashlib.sha256(token.encode("utf-8")).hexdigest()
+    return profile_cache.get(key, lambda: get_spotify_data(token))
+
 @spotify_bp.route('/data', methods=['GET'])
 def spotify_data_route():
     token = session.get('authorization_token')
     if not token:
         return jsonify({"error": "Authorization token missing"}), 401
-    spotify_data = get_spotify_data(token)
+    spotify_data = get_cached_spotify_data(token, session.get('spotify_user_id'))
     return jsonify(spotify_data)
@@ -0,0 +1,28 @@
+import logging
+
+import config
+
+
+def log_items(logger, title, items, fmt=str, level=logging.INFO):
+    """
+    Registra un elenco (prodotti, tag) in forma riassunta: al livello `level` il titolo, il numero di
+    elementi e i primi config.LOG_MAX_ITEMS; a DEBUG l'elenco completo. Gli elementi vengono formattati
+    con `fmt` solo se il messaggio è effettivamente registrato, e solo quelli mostrati.
+
+    :param logger: Logger del sottosistema.
+    :param title: Descrizione dell'elenco.
+    :param items: Sequenza degli elementi.
+    :param fmt: Funzione che formatta un elemento.
+    :param level: Livello del riepilogo.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        shown = items
+    elif logger.isEnabledFor(level):
+        shown = items[:config.LOG_MAX_ITEMS]
+    else:
+        return
+    lines = "".join(f"\n  - {fmt(item)}" for item in shown)
+    hidden = len(items) - len(shown)
+    if hidden:
+        lines += f"\n  ... e altri {hidden} (elenco completo a livello DEBUG)"
+    logger.log(level, "%s (%d):%s", title, len(items), lines)
@@ -1,50 +1,79 @@
+import logging
+import threading
+
 from flask import Flask, render_template
 
 # Blueprint Flask
 from src.api.spotify import spotify_bp
-from src.api.recommendations import recommendations_bp
+from src.api.recommendations import recommendations_bp, invalidate_results
+from src.api.admin import admin_bp
 
 # Configurazioni
 import config
 
-# Preprocessing per i prodotti
-from src.preprocessing.product_preprocessor import preprocess_products
+# Catalogo e GA
+from src.recommendation.catalog_manager import CatalogManager
+
+# Last.fm extraction (dizionari) e benchmark tests sono importati solo dai rispettivi entry point,
+# così il server non carica il client Last.fm né matplotlib all'avvio.
 
-# GA
-from src.recommendation.recommendation_engine_ga import RecommendationEngineGA
+# Nome esplicito: eseguito come script il modulo si chiama "__main__", fuori dai sottosistemi "src"
+logger = logging.getLogger("src.main")
 
-# Last.fm extraction (per generare artists.txt/genres.txt - dizionari)
-from src.preprocessing.lastfm_extraction import save_lastfm_data
+def export_catalog(catalog_dir=None, watch=None):
+    """
+    Costruisce il catalogo una sola volta (processo master) e lo esporta su file,
+    così che i worker possano collegarlo con create_app(attach_catalog=...) senza rifare il preprocessing.
+    Con watch il processo resta attivo e ri-esporta ogni nuova versione (CSV o dizionari modificati):
+    i worker collegati la ricollegano quando cambia il file CURRENT dell'export.
 
-# Benchmark tests
-from tests.benchmark_tests import run_benchmark_tests
+    :param catalog_dir: Cartella dell'export (default: config.CATALOG_EXPORT_DIR).
+    :param watch: Resta attivo e ri-esporta a ogni aggiornamento (default: config.CATALOG_WATCH).
+    """
+    catalog_dir = catalog_dir or config.CATALOG_EXPORT_DIR
+    watch = config.CATALOG_WATCH if watch is None else watch
+    manager = CatalogManager(export_dir=catalog_dir)
+    manager.add_listener(lambda old, new: logger.info("Catalogo %s esportato in %s.", new.version, catalog_dir))
+    manager.load()
+    if watch and manager.poll_interval > 0:
+        logger.info("Controllo degli aggiornamenti del catalogo ogni %s s (Ctrl+C per terminare)...", manager.poll_interval)
+        manager.start_watching()
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            manager.stop_watching()
+    return catalog_dir
 
-def create_app():
+def create_app(attach_catalog=None):
     """
     Crea l'app Flask e configura tutti i componenti (GA, blueprint, ecc.).
+
+    :param attach_catalog: Cartella di un catalogo esportato con export_catalog (default: config.CATALOG_ATTACH_DIR).
+                           Se indicata, il catalogo condiviso viene collegato (mmap, zero-copy) invece di essere ricostruito.
     """
     app = Flask(__name__)
     app.secret_key = config.FLASK_SECRET_KEY
 
-    # Preprocessing del data contenente i prodotti
-    print("[INFO] Caricamento e preprocessing data...")
-    df_products = preprocess_products(config.DATASET_PATH)
-    app.config["DF_PRODUCTS"] = df_products
-
-    # Inizializza RecommendationEngineGA
-    print("[INFO] Inizializzazione RecommendationEngineGA...")
-    engine = RecommendationEngineGA(
-        df_products=df_products,
-        user_data={},  # Sarà popolato dinamicamente in recommendations.py
-        min_price=None, # Sarà popolato dinamicamente in recommendations.py
-        max_price=None, # Sarà popolato dinamicamente in recommendations.py
-        preference_mode=None # Sarà popolato dinamicamente in recommendations.py
-    )
-    app.config["RECOMMENDER_ENGINE_GA"] = engine
+    if attach_catalog is None:
+        attach_catalog = config.CATALOG_ATTACH_DIR
+
+    # Il catalogo e il motore GA sono gestiti dal CatalogManager: ogni richiesta usa la snapshot
+    # pubblicata al suo arrivo, e i file sorgente (o l'export condiviso) vengono controllati
+    # per pubblicare le nuove versioni senza riavviare l'app.
+    if attach_catalog:
+        # Worker: collega il catalogo già costruito dal processo master
+        logger.info("Collegamento del catalogo condiviso da %s...", attach_catalog)
+    manager = CatalogManager(attach_dir=attach_catalog or None)
+    manager.add_listener(invalidate_results)
+    manager.load()
+    if config.CATALOG_WATCH:
+        manager.start_watching()
+    app.config["CATALOG_MANAGER"] = manager
 
     # Registrazione blueprint
     app.register_blueprint(spotify_bp, url_prefix='/spotify')
     app.register_blueprint(recommendations_bp, url_prefix='/recommendations')
+    app.register_blueprint(admin_bp, url_prefix='/admin')
 
     @app.route('/')
     def home():
@@ -54,18 +83,21 @@ def create_app():
     return app
 
 def create_dictionary():
-    print("[INFO] Creazione dei dizionari...")
+    from src.preprocessing.lastfm_extraction import save_lastfm_data
+    logger.info("Creazione dei dizionari...")
     save_lastfm_data(genre_limit=100, limit_per_genre=100)
-    print("[INFO] Dizionari creati con successo.")
+    logger.info("Dizionari creati con successo.")
 
 def tests():
-    print("[INFO] Caricamento e preprocessing data per i tests...")
-    df_products = preprocess_products(config.DATASET_PATH)
-    run_benchmark_tests(df_products)
+    from tests.benchmark_tests import run_benchmark_tests
+    # Il preprocessing è eseguito (e misurato) dal benchmark stesso
+    run_benchmark_tests()
 
 if __name__ == "__main__":
     if config.CREATE_DICTIONARY:
         create_dictionary()
+    elif config.EXPORT_CATALOG:
+        export_catalog()
     elif config.RUN_TESTS:
         tests()
     else:
@@ -0,0 +1,68 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class CrawlStateStore:
+    """
+    Checkpoint su disco del crawl di Last.fm.
+    Ogni risposta scaricata (es. gli artisti di un genere) viene salvata subito, con il relativo
+    timestamp, in un database SQLite: un crawl interrotto riparte dalle voci già salvate e un
+    refresh incrementale riscarica solo quelle più vecchie dell'età massima configurata.
+    """
+
+    def __init__(self, db_path):
+        """
+        :param db_path: Percorso del file SQLite (creato al primo utilizzo).
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        dir_db = os.path.dirname(db_path)
+        if dir_db and not os.path.exists(dir_db):
+            os.makedirs(dir_db, exist_ok=True)
+        # La connessione è condivisa dai thread del crawl, serializzata dal lock
+        self._conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " fetched_at REAL NOT NULL,"
+                " terms TEXT NOT NULL)"
+            )
+
+    def get(self, key, max_age=None):
+        """
+        Restituisce i termini salvati per una chiave.
+
+        :param key: Chiave della risposta (es. "tag.getTopArtists:rock:100").
+        :param max_age: Età massima in secondi; le voci più vecchie sono considerate assenti.
+        :return: Lista di termini, oppure None se la voce è assente o troppo vecchia.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fetched_at, terms FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        fetched_at, terms = row
+        if max_age is not None and time.time() - fetched_at > max_age:
+            return None
+        return json.loads(terms)
+
+    def put(self, key, terms):
+        """
+        Salva (o sostituisce) i termini di una risposta con il timestamp corrente.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, fetched_at, terms) VALUES (?, ?, ?)",
+                (key, time.time(), json.dumps(terms))
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
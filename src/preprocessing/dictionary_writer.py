@@ -0,0 +1,125 @@
+import heapq
+import os
+import tempfile
+
+
+def normalize_term(term):
+    """
+    Normalizza un termine del dizionario nella forma attesa dal matcher:
+    minuscolo, senza spazi iniziali/finali e con spazi interni singoli.
+    """
+    return " ".join(term.lower().split())
+
+
+class SortedDictionaryWriter:
+    """
+    Deduplica in streaming un flusso di termini e li scrive ordinati su file, uno per riga.
+    In memoria viene mantenuto al massimo `max_in_memory` termini: oltre questa soglia il
+    buffer viene ordinato e riversato su un file temporaneo, e i file vengono poi fusi
+    (merge k-way) eliminando i duplicati. La memoria resta quindi limitata a prescindere
+    dalla dimensione del vocabolario.
+    """
+
+    def __init__(self, max_in_memory=200000, tmp_dir=None):
+        """
+        :param max_in_memory: Numero massimo di termini distinti mantenuti in memoria.
+        :param tmp_dir: Cartella per i file temporanei (default: quella di sistema).
+        """
+        self.max_in_memory = max_in_memory
+        self.tmp_dir = tmp_dir
+        self._buffer = set()
+        self._runs = []  # Percorsi dei file temporanei ordinati
+
+        # Statistiche
+        self.terms_in = 0
+        self.terms_out = 0
+
+    def add_many(self, terms):
+        """
+        Aggiunge più termini (normalizzati con normalize_term, i vuoti sono ignorati).
+        """
+        for term in terms:
+            term = normalize_term(term)
+            if not term:
+                continue
+            self.terms_in += 1
+            self._buffer.add(term)
+        if len(self._buffer) >= self.max_in_memory:
+            self._spill()
+
+    def _spill(self):
+        fd, path = tempfile.mkstemp(prefix="dictionary-run-", suffix=".txt", dir=self.tmp_dir)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for term in sorted(self._buffer):
+                f.write(term + "\n")
+        self._runs.append(path)
+        self._buffer = set()
+
+    def _iter_run(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                yield line.rstrip("\n")
+
+    def iter_sorted(self):
+        """
+        Restituisce un iteratore sui termini distinti, in ordine alfabetico.
+        """
+        runs = [self._iter_run(path) for path in self._runs]
+        runs.append(iter(sorted(self._buffer)))
+        previous = None
+        for term in heapq.merge(*runs):
+            if term != previous:
+                yield term
+                previous = term
+
+    def write(self, output_path):
+        """
+        Scrive i termini distinti e ordinati in output_path (sostituito atomicamente)
+        e rimuove i file temporanei.
+
+        :return: Numero di termini scritti.
+        """
+        tmp_path = output_path + ".tmp"
+        self.terms_out = 0
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for term in self.iter_sorted():
+                    f.write(term + "\n")
+                    self.terms_out += 1
+            os.replace(tmp_path, output_path)
+        finally:
+            self.cleanup()
+        return self.terms_out
+
+    @property
+    def duplicates(self):
+        """
+        Numero di duplicati eliminati (valido dopo write()).
+        """
+        return self.terms_in - self.terms_out
+
+    def cleanup(self):
+        """
+        Rimuove i file temporanei e svuota il buffer.
+        """
+        for path in self._runs:
+            if os.path.exists(path):
+                os.remove(path)
+        self._runs = []
+        self._buffer = set()
+
+
+def iter_sorted_dictionary(dict_path, max_in_memory=200000):
+    """
+    Restituisce i termini distinti e normalizzati di un file dizionario, in ordine alfabetico,
+    con memoria limitata (anche se il file non è ordinato). Il file può non esistere.
+    """
+    writer = SortedDictionaryWriter(max_in_memory=max_in_memory)
+    try:
+        if os.path.exists(dict_path):
+            with open(dict_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    writer.add_many([line])
+        yield from writer.iter_sorted()
+    finally:
+        writer.cleanup()
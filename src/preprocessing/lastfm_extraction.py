@@ -1,134 +1,414 @@
 import requests
 import config
 import os
+import json
+import logging
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+from src.api.http_transport import get_session, register_rate_limiter
+from src.preprocessing.rate_limiter import TokenBucket
+from src.preprocessing.crawl_state import CrawlStateStore
+from src.preprocessing.dictionary_writer import SortedDictionaryWriter, iter_sorted_dictionary, normalize_term
 
-# Legge la chiave API di Last.fm da config.py
+logger = logging.getLogger(__name__)
+
+# Legge la chiave API e l'endpoint di Last.fm da config.py
 API_KEY = config.LASTFM_API_KEY
-BASE_URL = "https://ws.audioscrobbler.com/2.0/"
+BASE_URL = config.LASTFM_API_URL
+
+# Limita le richieste di tutti i thread al rate consentito da Last.fm, compresi i retry del trasporto HTTP
+_rate_limiter = TokenBucket(rate=config.LASTFM_RATE_LIMIT, burst=config.LASTFM_RATE_BURST)
+register_rate_limiter(urlsplit(BASE_URL).hostname, _rate_limiter)
 
 
-def make_request(params):
+class LastfmRequestError(Exception):
     """
-    Effettua una richiesta GET all'API di Last.fm con i parametri specificati.
-    In caso di errore di rete o status code non 200, ritorna un dizionario vuoto.
+    Errore di una richiesta a Last.fm (rete, status code non 200 o errore restituito dall'API).
     """
+
+
+def make_request(params, raise_errors=False):
+    """
+    Effettua una richiesta GET all'API di Last.fm con i parametri specificati,
+    tramite la sessione HTTP condivisa (connessioni riutilizzate, retry su 429/5xx).
+    Ogni richiesta, e ogni suo tentativo ripetuto dal trasporto, attende il proprio turno nel token bucket
+    condiviso (LASTFM_RATE_LIMIT).
+    In caso di errore di rete o status code non 200, ritorna un dizionario vuoto,
+    oppure solleva LastfmRequestError se raise_errors è True (usato dal crawl con checkpoint,
+    che non deve salvare una risposta vuota al posto di una fallita).
+    """
+    _rate_limiter.acquire()
     try:
-        response = requests.get(BASE_URL, params=params)
+        response = get_session().get(BASE_URL, params=params)
         response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        print(f"[ERRORE] Errore nella richiesta a Last.fm: {e}")
+        data = response.json()
+    except (requests.RequestException, ValueError) as e:
+        logger.error("Errore nella richiesta a Last.fm: %s", e)
+        if raise_errors:
+            raise LastfmRequestError(str(e)) from e
         return {}
 
+    # Last.fm segnala alcuni errori (es. rate limit superato) con status 200 e un campo "error"
+    if raise_errors and "error" in data:
+        raise LastfmRequestError(f"Errore {data['error']}: {data.get('message')}")
+    return data
+
 
-def get_genres(limit=100):
+
+def get_genres(limit=100, raise_errors=False, page=1):
     """
     Ottiene una lista di generi da Last.fm (tag globali più popolari).
 
-    :param limit: Numero massimo di generi da recuperare
-    :return: Lista di stringhe, ognuna corrispondente a un genere (in minuscolo)
+    :param limit: Numero massimo di generi da recuperare (per pagina)
+    :param raise_errors: Se True, solleva LastfmRequestError invece di restituire una lista vuota
+    :param page: Pagina dei risultati da richiedere (a partire da 1)
+    :return: Lista di stringhe, ognuna corrispondente a un genere (normalizzata, in minuscolo)
     """
     params = {
         "method": "tag.getTopTags",
         "api_key": API_KEY,
         "format": "json",
-        "limit": limit
+        "limit": limit,
+        "page": page
     }
-    data = make_request(params)
+    data = make_request(params, raise_errors=raise_errors)
     tags = data.get("toptags", {}).get("tag", [])
-    # Estrarre i tag dalla struttura di Last.fm e normalizzarli (minuscolo, strip)
+    # Estrarre i tag dalla struttura di Last.fm e normalizzarli (minuscolo, spazi singoli)
     genres = []
     for tag in tags:
         name = tag.get("name")
         if name:
-            # Converti in minuscolo
-            genres.append(name.strip().lower())
+            genres.append(normalize_term(name))
     return genres
 
 
-def get_artists_by_genre(genre, limit=100):
+def get_artists_by_genre(genre, limit=100, raise_errors=False, page=1):
     """
     Ottiene gli artisti associati a un genere specifico su Last.fm.
 
     :param genre: Nome del genere (stringa)
-    :param limit: Numero massimo di artisti da recuperare
-    :return: Lista di nomi di artisti (stringhe, in minuscolo)
+    :param limit: Numero massimo di artisti da recuperare (per pagina)
+    :param raise_errors: Se True, solleva LastfmRequestError invece di restituire una lista vuota
+    :param page: Pagina dei risultati da richiedere (a partire da 1)
+    :return: Lista di nomi di artisti (stringhe normalizzate, in minuscolo)
     """
     params = {
         "method": "tag.getTopArtists",
         "api_key": API_KEY,
         "format": "json",
         "limit": limit,
+        "page": page,
         "tag": genre
     }
-    data = make_request(params)
+    data = make_request(params, raise_errors=raise_errors)
     artists = data.get("topartists", {}).get("artist", [])
     artist_list = []
     for art in artists:
         name = art.get("name")
         if name:
-            artist_list.append(name.strip().lower())
+            artist_list.append(normalize_term(name))
     return artist_list
 
 
-def get_all_artists(genre_limit=50, limit_per_genre=50):
+class CrawlStats:
+    """
+    Statistiche di un crawl (thread-safe): pagine per esito, termini ricevuti, generi incompleti.
+    """
+
+    def __init__(self):
+        self.start_time = time.monotonic()
+        self.pages = {}  # esito ("fetched", "cache", "stale", "failed") -> numero di pagine
+        self.terms = 0
+        self.completed_genres = 0
+        self.incomplete_genres = []
+        self._lock = threading.Lock()
+
+    def record_page(self, outcome, terms_count):
+        with self._lock:
+            self.pages[outcome] = self.pages.get(outcome, 0) + 1
+            self.terms += terms_count
+
+    def record_genre(self, genre, complete):
+        with self._lock:
+            self.completed_genres += 1
+            if not complete:
+                self.incomplete_genres.append(genre)
+
+    def elapsed(self):
+        return time.monotonic() - self.start_time
+
+    def summary(self):
+        elapsed = self.elapsed()
+        pages = sum(self.pages.values())
+        return {
+            "completed_genres": self.completed_genres,
+            "incomplete_genres": len(self.incomplete_genres),
+            "pages": dict(self.pages),
+            "terms": self.terms,
+            "elapsed_s": round(elapsed, 2),
+            "pages_per_s": round(pages / elapsed, 2) if elapsed > 0 else 0.0,
+            "terms_per_s": round(self.terms / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+
+def _write_progress(stats, total_genres):
+    """
+    Salva lo stato di avanzamento del crawl in config.LASTFM_CRAWL_PROGRESS_FILE.
+    Il file viene sostituito atomicamente, così da essere sempre leggibile durante il crawl.
+    """
+    progress = stats.summary()
+    progress["total_genres"] = total_genres
+    tmp_path = config.LASTFM_CRAWL_PROGRESS_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(progress, f)
+    os.replace(tmp_path, config.LASTFM_CRAWL_PROGRESS_FILE)
+
+
+def _fetch_with_checkpoint(state, key, fetch, max_age):
+    """
+    Restituisce i termini associati a `key` dal checkpoint se più recenti di max_age,
+    altrimenti li scarica con `fetch` e li salva subito nel checkpoint.
+    Se il download fallisce si ripiega sull'ultima versione salvata (anche se vecchia).
+
+    :return: Tupla (termini o None, origine: "cache", "fetched", "stale" o "failed").
+    """
+    if state is None:
+        return fetch(), "fetched"
+
+    cached = state.get(key, max_age=max_age)
+    if cached is not None:
+        return cached, "cache"
+    try:
+        terms = fetch()
+    except LastfmRequestError:
+        stale = state.get(key)
+        return stale, "stale" if stale is not None else "failed"
+    state.put(key, terms)
+    return terms, "fetched"
+
+
+def _crawl_pages(state, key_prefix, fetch_page, limit, max_pages, max_age, stats):
+    """
+    Scarica le pagine 1..max_pages di un metodo paginato, salvando ogni pagina come checkpoint.
+    Si ferma alla prima pagina incompleta (meno di `limit` termini), cioè all'ultima disponibile.
+
+    :param key_prefix: Prefisso della chiave di checkpoint (la pagina viene aggiunta in coda).
+    :param fetch_page: Funzione che riceve il numero di pagina e restituisce la lista di termini.
+    :return: Tupla (lista dei termini di tutte le pagine, True se nessuna pagina è fallita).
+    """
+    terms = []
+    for page in range(1, max_pages + 1):
+        page_terms, outcome = _fetch_with_checkpoint(
+            state, f"{key_prefix}:{page}", lambda: fetch_page(page), max_age
+        )
+        if stats is not None:
+            stats.record_page(outcome, len(page_terms or []))
+        if page_terms is None:
+            return terms, False
+        terms.extend(page_terms)
+        if len(page_terms) < limit:
+            break
+    return terms, True
+
+
+def get_all_artists(genre_limit=50, limit_per_genre=50, genres=None, state=None, max_age=None,
+                    pages_per_genre=1, writer=None, stats=None):
     """
     Recupera i generi globali (fino a genre_limit) e, per ognuno,
-    scarica fino a limit_per_genre artisti. Restituisce un set di artisti
-    complessivo (poi convertito in list) in minuscolo.
+    scarica fino a pages_per_genre pagine da limit_per_genre artisti.
+    Le richieste per genere vengono eseguite in parallelo (LASTFM_MAX_WORKERS thread),
+    nel rispetto del rate limit di Last.fm, e l'avanzamento viene salvato su disco.
+    Con uno `state` (CrawlStateStore) ogni pagina è salvata come checkpoint e vengono
+    riscaricate solo quelle il cui checkpoint è più vecchio di max_age.
+    Gli artisti vengono deduplicati in streaming da `writer` (SortedDictionaryWriter),
+    con memoria limitata anche per vocabolari molto grandi.
 
     :param genre_limit: Numero massimo di generi da considerare
-    :param limit_per_genre: Numero massimo di artisti da recuperare per ogni genere
-    :return: Lista unica di nomi di artisti (in minuscolo)
+    :param limit_per_genre: Numero di artisti per pagina da recuperare per ogni genere
+    :param genres: Lista di generi già scaricata (opzionale, evita di richiederla di nuovo)
+    :param state: Checkpoint del crawl (opzionale)
+    :param max_age: Età massima in secondi di un checkpoint prima del refresh (None = mai)
+    :param pages_per_genre: Numero massimo di pagine da scaricare per ogni genere
+    :param writer: SortedDictionaryWriter che riceve gli artisti (opzionale)
+    :param stats: CrawlStats da aggiornare (opzionale)
+    :return: Lista unica e ordinata di nomi di artisti se writer non è fornito, altrimenti il writer
     """
-    print(f"[INFO] Recupero i primi {genre_limit} generi globali da Last.fm...")
-    genres = get_genres(limit=genre_limit)
+    if genres is None:
+        logger.info("Recupero i primi %d generi globali da Last.fm...", genre_limit)
+        genres = get_genres(limit=genre_limit)
+
+    return_list = writer is None
+    if writer is None:
+        writer = SortedDictionaryWriter(max_in_memory=config.LASTFM_DEDUP_MAX_IN_MEMORY)
+    if stats is None:
+        stats = CrawlStats()
+
+    def fetch_genre(genre):
+        return _crawl_pages(
+            state,
+            f"tag.getTopArtists:{genre}:{limit_per_genre}",
+            lambda page: get_artists_by_genre(genre, limit=limit_per_genre, raise_errors=state is not None, page=page),
+            limit_per_genre,
+            pages_per_genre,
+            max_age,
+            stats
+        )
+
+    with ThreadPoolExecutor(max_workers=config.LASTFM_MAX_WORKERS, thread_name_prefix="lastfm") as executor:
+        futures = {executor.submit(fetch_genre, g): g for g in genres}
+        for future in as_completed(futures):
+            artists, complete = future.result()
+            genre = futures[future]
+            stats.record_genre(genre, complete)
+            # Avanzamento per genere: a INFO un genere ogni config.LOG_SAMPLE_EVERY, a DEBUG tutti; gli incompleti sempre
+            if not complete:
+                level = logging.WARNING
+            elif stats.completed_genres % config.LOG_SAMPLE_EVERY == 0 or stats.completed_genres == len(genres):
+                level = logging.INFO
+            else:
+                level = logging.DEBUG
+            logger.log(level, "→ [%d/%d] artisti per il genere %s: %d%s", stats.completed_genres, len(genres),
+                       genre, len(artists), "" if complete else " (incompleto)")
+            # Solo il thread principale scrive nel writer: nessuna sincronizzazione necessaria
+            writer.add_many(artists)
+            _write_progress(stats, len(genres))
 
-    all_artists = set()
-    for g in genres:
-        print(f"[INFO] → Recupero fino a {limit_per_genre} artisti per il genere: {g}")
-        artists = get_artists_by_genre(g, limit=limit_per_genre)
-        if artists:
-            all_artists.update(artists)
+    summary = stats.summary()
+    logger.info("%d generi elaborati in %ss: pagine %s, %s pagine/s, %s artisti/s.", len(genres), summary['elapsed_s'],
+                summary['pages'], summary['pages_per_s'], summary['terms_per_s'])
 
-    return list(all_artists)
+    if return_list:
+        artists = list(writer.iter_sorted())
+        writer.cleanup()
+        return artists
+    return writer
 
 
-def save_lastfm_data(genre_limit=100, limit_per_genre=100):
+def compute_dictionary_diff(dict_path, new_sorted_terms):
     """
-    Scarica i generi e gli artisti da Last.fm e li salva in formato testo,
-    uno per riga, nei file definiti in config.py (LASTFM_GENRES_FILE e LASTFM_ARTISTS_FILE).
-    I generi e gli artisti vengono convertiti in minuscolo per coerenza
-    con il dictionary lookup che si effettua successivamente.
+    Confronta il contenuto attuale di un file dizionario con i nuovi termini, in streaming.
 
-    :param genre_limit: Numero massimo di generi da recuperare
-    :param limit_per_genre: Numero massimo di artisti da recuperare per ogni genere
+    :param dict_path: Percorso del dizionario (artists.txt o genres.txt).
+    :param new_sorted_terms: Iterabile dei nuovi termini, distinti e in ordine alfabetico.
+    :return: Dizionario {"added": [...], "removed": [...]} con liste ordinate.
     """
-    print("[INFO] Inizio salvataggio dati Last.fm...")
+    added, removed = [], []
+    old_iter = iter_sorted_dictionary(dict_path, max_in_memory=config.LASTFM_DEDUP_MAX_IN_MEMORY)
+    new_iter = iter(new_sorted_terms)
+    old_term, new_term = next(old_iter, None), next(new_iter, None)
+    # Merge di due sequenze ordinate
+    while old_term is not None or new_term is not None:
+        if new_term is None or (old_term is not None and old_term < new_term):
+            removed.append(old_term)
+            old_term = next(old_iter, None)
+        elif old_term is None or new_term < old_term:
+            added.append(new_term)
+            new_term = next(new_iter, None)
+        else:
+            old_term, new_term = next(old_iter, None), next(new_iter, None)
+    return {"added": added, "removed": removed}
+
 
-    # 1) Scarica i generi (in minuscolo)
-    print(f"[INFO] Scarico fino a {genre_limit} generi...")
-    genres = get_genres(limit=genre_limit)
+def save_lastfm_data(genre_limit=100, limit_per_genre=100, max_age=None, genre_pages=None, artist_pages=None):
+    """
+    Scarica i generi e gli artisti da Last.fm e li salva in formato testo,
+    uno per riga e in ordine alfabetico, nei file definiti in config.py
+    (LASTFM_GENRES_FILE e LASTFM_ARTISTS_FILE).
+    I generi e gli artisti vengono normalizzati (minuscolo, spazi singoli) per coerenza
+    con il dictionary lookup che si effettua successivamente.
+    Ogni pagina viene salvata nel checkpoint (config.LASTFM_CRAWL_STATE_FILE): un crawl
+    interrotto riprende da dove si era fermato e vengono riscaricate solo le voci più vecchie
+    di max_age. Le differenze rispetto ai dizionari precedenti (termini aggiunti e rimossi)
+    vengono salvate in config.LASTFM_DICTIONARY_DIFF_FILE per il re-tagging incrementale.
 
-    # 2) Scarica artisti (in minuscolo)
-    print(f"[INFO] Scarico artisti basandomi sui generi...")
-    all_artists = get_all_artists(genre_limit=genre_limit, limit_per_genre=limit_per_genre)
+    :param genre_limit: Numero di generi per pagina da recuperare
+    :param limit_per_genre: Numero di artisti per pagina da recuperare per ogni genere
+    :param max_age: Età massima in secondi di un checkpoint (default: config.LASTFM_CRAWL_MAX_AGE)
+    :param genre_pages: Pagine di generi da scaricare (default: config.LASTFM_GENRE_PAGES)
+    :param artist_pages: Pagine di artisti per genere (default: config.LASTFM_ARTIST_PAGES)
+    """
+    logger.info("Inizio salvataggio dati Last.fm...")
+    if max_age is None:
+        max_age = config.LASTFM_CRAWL_MAX_AGE
+    if genre_pages is None:
+        genre_pages = config.LASTFM_GENRE_PAGES
+    if artist_pages is None:
+        artist_pages = config.LASTFM_ARTIST_PAGES
 
     # Crea la cartella "data" se non esiste
     dir_dataset = os.path.dirname(config.LASTFM_GENRES_FILE)
     if dir_dataset and not os.path.exists(dir_dataset):
         os.makedirs(dir_dataset)
 
-    # Salvataggio generi
-    print(f"[INFO] Salvataggio generi in {config.LASTFM_GENRES_FILE}")
-    with open(config.LASTFM_GENRES_FILE, "w", encoding="utf-8") as f:
-        for g in genres:
-            f.write(g.strip() + "\n")
+    stats = CrawlStats()
+    artists_writer = SortedDictionaryWriter(max_in_memory=config.LASTFM_DEDUP_MAX_IN_MEMORY)
+    state = CrawlStateStore(config.LASTFM_CRAWL_STATE_FILE)
+    try:
+        # 1) Scarica i generi (normalizzati), una sola volta
+        logger.info("Scarico fino a %d pagine da %d generi...", genre_pages, genre_limit)
+        genres, complete = _crawl_pages(
+            state,
+            f"tag.getTopTags:{genre_limit}",
+            lambda page: get_genres(limit=genre_limit, raise_errors=True, page=page),
+            genre_limit,
+            genre_pages,
+            max_age,
+            stats
+        )
+        if not complete:
+            raise LastfmRequestError("Impossibile recuperare la lista dei generi da Last.fm.")
+        # Rimuove i duplicati mantenendo l'ordine di popolarità
+        genres = list(dict.fromkeys(genres))
+
+        # 2) Scarica artisti (normalizzati) per i generi appena ottenuti
+        logger.info("Scarico artisti basandomi sui generi...")
+        get_all_artists(
+            genre_limit=genre_limit,
+            limit_per_genre=limit_per_genre,
+            genres=genres,
+            state=state,
+            max_age=max_age,
+            pages_per_genre=artist_pages,
+            writer=artists_writer,
+            stats=stats
+        )
+
+        # Se qualche genere non è stato scaricato del tutto i dizionari resterebbero incompleti:
+        # non si sovrascrivono, e una nuova esecuzione riprenderà dal checkpoint
+        if stats.incomplete_genres:
+            raise LastfmRequestError(
+                f"Crawl incompleto: {len(stats.incomplete_genres)} generi non scaricati. "
+                f"Rieseguire per riprendere dal checkpoint."
+            )
+
+        # Differenze rispetto ai dizionari attuali, da calcolare prima di sovrascriverli
+        sorted_genres = sorted(genres)
+        diff = {
+            "generated_at": time.time(),
+            "genres": compute_dictionary_diff(config.LASTFM_GENRES_FILE, sorted_genres),
+            "artists": compute_dictionary_diff(config.LASTFM_ARTISTS_FILE, artists_writer.iter_sorted()),
+        }
+        logger.info("Generi: +%d / -%d, artisti: +%d / -%d", len(diff['genres']['added']), len(diff['genres']['removed']),
+                    len(diff['artists']['added']), len(diff['artists']['removed']))
+        with open(config.LASTFM_DICTIONARY_DIFF_FILE, "w", encoding="utf-8") as f:
+            json.dump(diff, f)
+
+        # Salvataggio generi
+        logger.info("Salvataggio generi in %s", config.LASTFM_GENRES_FILE)
+        with open(config.LASTFM_GENRES_FILE, "w", encoding="utf-8") as f:
+            for g in sorted_genres:
+                f.write(g + "\n")
 
-    # Salvataggio artisti
-    print(f"[INFO] Salvataggio artisti in {config.LASTFM_ARTISTS_FILE}")
-    with open(config.LASTFM_ARTISTS_FILE, "w", encoding="utf-8") as f:
-        for art in all_artists:
-            f.write(art.strip() + "\n")
+        # Salvataggio artisti (merge in streaming dei blocchi ordinati)
+        logger.info("Salvataggio artisti in %s", config.LASTFM_ARTISTS_FILE)
+        artists_count = artists_writer.write(config.LASTFM_ARTISTS_FILE)
+    finally:
+        state.close()
+        artists_writer.cleanup()
 
-    print("[INFO] Salvataggio completato.")
+    summary = stats.summary()
+    logger.info("Salvataggio completato: %d generi, %d artisti, %d duplicati eliminati, pagine %s in %ss (%s pagine/s).",
+                len(genres), artists_count, artists_writer.duplicates, summary['pages'], summary['elapsed_s'],
+                summary['pages_per_s'])
@@ -1,7 +1,13 @@
 import pandas as pd
 import os
 import re
+import json
+import hashlib
+import logging
 import config
+from src.logging_utils import log_items
+
+logger = logging.getLogger(__name__)
 
 ########################################
 # STOPWORDS & NOISE
@@ -32,7 +38,7 @@ def load_dictionary(dict_path):
     Presuppone che i file siano già minuscolizzati in lastfm_extraction.py.
     """
     if not os.path.exists(dict_path):
-        print(f"[WARNING] Dizionario non trovato in: {dict_path}")
+        logger.warning("Dizionario non trovato in: %s", dict_path)
         return set()
 
     with open(dict_path, "r", encoding="utf-8") as f:
@@ -84,13 +90,70 @@ def clean_special_characters(tags):
     cleaned_tags = [re.sub(r'[^a-zA-Z0-9_]', '', tag) for tag in tags]
     return cleaned_tags
 
+########################################
+# TAG EXTRACTION
+########################################
+def matching_text(name, description):
+    """
+    Combina name e description, rimuove le STOPWORDS e converte in minuscolo:
+    è il testo su cui viene effettuato il dictionary lookup.
+    """
+    # Combina name e description
+    text = f"{name} {description}"
+
+    # Rimuove STOPWORDS.
+    tokens = text.split()
+    cleaned_tokens = [t for t in tokens if t.lower() not in STOPWORDS]
+    return " ".join(cleaned_tokens).lower()
+
+
+def clean_and_lookup(name, description, artists_set, genres_set):
+    """
+    Estrae le tag di un prodotto (artisti e generi) dal suo nome e dalla sua descrizione.
+
+    :param name: Nome del prodotto.
+    :param description: Descrizione del prodotto.
+    :param artists_set: Dizionario degli artisti (set di stringhe in minuscolo).
+    :param genres_set: Dizionario dei generi (set di stringhe in minuscolo).
+    :return: Lista di tag, senza tag "sottoinsieme" di altre tag.
+    """
+    cleaned_text = matching_text(name, description)
+
+    # Dizionario: cerca artisti
+    found_artists = dictionary_lookup(cleaned_text, artists_set)
+    # Dizionario: cerca generi
+    found_genres = dictionary_lookup(cleaned_text, genres_set)
+
+    # Rimuove caratteri speciali dai risultati del dizionario
+    found_artists = list(clean_special_characters(found_artists))
+    found_genres = list(clean_special_characters(found_genres))
+
+    # Unione
+    tags = list(set(found_artists).union(set(found_genres)))
+
+    # Rimuovi tag sottoinsieme:
+    # es. se "black_metal" e "metal" coesistono -> tieni solo "black_metal"
+    # ad es. "indie_rock" e "rock" coesistono -> tieni "indie_rock"
+    filtered_tags = []
+    for tag in tags:
+        """
+        Verifica che nessun altro tag nella lista contiene il tag corrente come sottostringa diverso da sé stesso. 
+        Se nessun altro tag soddisfa questa condizione, allora il tag corrente viene aggiunto a filtered_tags.
+        """
+        # (lo so, sembra uno sciogli-lingua)
+        if not any(tag in other_tag and tag != other_tag for other_tag in tags):
+            filtered_tags.append(tag)
+
+    return filtered_tags
+
 ########################################
 # PREPROCESS CORE
 ########################################
-def preprocess_products(csv_path):
+def preprocess_products(csv_path, artists_file=None, genres_file=None):
     """
     1) Carica il CSV dei prodotti (music-products.csv).
-    2) Carica i dizionari di ARTISTI e GENERI (da config.LASTFM_ARTISTS_FILE, LASTFM_GENRES_FILE).
+    2) Carica i dizionari di ARTISTI e GENERI (da config.LASTFM_ARTISTS_FILE, LASTFM_GENRES_FILE,
+       oppure dai file indicati con artists_file e genres_file).
     3) Per ogni riga:
        - Combina name + description
        - Rimuove alcune stopwords
@@ -102,63 +165,87 @@ def preprocess_products(csv_path):
        - Rimuove caratteri speciali dai tag.
     4) Salva i risultati in df["tags"] e restituisce il DataFrame.
     """
-    print("[INFO] Inizio preprocessing dei prodotti.")
+    logger.debug("Inizio preprocessing dei prodotti.")
     if not os.path.exists(csv_path):
         raise FileNotFoundError(f"[ERRORE] File dei prodotti non trovato in: {csv_path}")
 
     df = pd.read_csv(csv_path)
-    print(f"[INFO] {len(df)} prodotti caricati da {csv_path}.")
+    logger.info("%d prodotti caricati da %s.", len(df), csv_path)
 
     # Carica i dizionari di artisti e generi
-    artists_set = load_dictionary(config.LASTFM_ARTISTS_FILE)
-    genres_set = load_dictionary(config.LASTFM_GENRES_FILE)
-
-    def clean_and_lookup(name, description):
-        # Combina name e description
-        text = f"{name} {description}"
-
-        # Rimuove STOPWORDS.
-        tokens = text.split()
-        cleaned_tokens = [t for t in tokens if t.lower() not in STOPWORDS]
-        cleaned_text = " ".join(cleaned_tokens).lower()
-
-        # Dizionario: cerca artisti
-        found_artists = dictionary_lookup(cleaned_text, artists_set)
-        # Dizionario: cerca generi
-        found_genres = dictionary_lookup(cleaned_text, genres_set)
-
-        # Rimuove caratteri speciali dai risultati del dizionario
-        found_artists = list(clean_special_characters(found_artists))
-        found_genres = list(clean_special_characters(found_genres))
-
-        # Unione
-        tags = list(set(found_artists).union(set(found_genres)))
-
-        # Rimuovi tag sottoinsieme:
-        # es. se "black_metal" e "metal" coesistono -> tieni solo "black_metal"
-        # ad es. "indie_rock" e "rock" coesistono -> tieni "indie_rock"
-        filtered_tags = []
-        for tag in tags:
-            """
-            Verifica che nessun altro tag nella lista contiene il tag corrente come sottostringa diverso da sé stesso. 
-            Se nessun altro tag soddisfa questa condizione, allora il tag corrente viene aggiunto a filtered_tags.
-            """
-            # (lo so, sembra uno sciogli-lingua)
-            if not any(tag in other_tag and tag != other_tag for other_tag in tags):
-                filtered_tags.append(tag)
-
-        return filtered_tags
+    artists_set = load_dictionary(artists_file or config.LASTFM_ARTISTS_FILE)
+    genres_set = load_dictionary(genres_file or config.LASTFM_GENRES_FILE)
 
     def extract_tags_for_row(row):
-        return clean_and_lookup(row["name"], row["description"])
+        return clean_and_lookup(row["name"], row["description"], artists_set, genres_set)
 
     df["tags"] = df.apply(extract_tags_for_row, axis=1)
 
-    print("[INFO] Preprocessing completato.")
+    logger.info("Preprocessing completato.")
 
-    # Stampa tutte le tag estratte
-    print("\n[DEBUG] Tutte le tag estratte per ciascun prodotto:")
-    for i, row in df.iterrows():
-        print(f" {row['name']} -> {row['tags']}")
+    # Tag estratte per ciascun prodotto (riassunte a INFO, tutte a DEBUG)
+    names, tags = df["name"].values, df["tags"].values
+    log_items(logger, "Tag estratte per prodotto", range(len(df)), fmt=lambda i: f"{names[i]} -> {tags[i]}")
 
     return df
+
+def compute_catalog_version(csv_path):
+    """
+    Calcola la versione del catalogo come hash del CSV dei prodotti e dei dizionari
+    usati per il tagging: cambia se e solo se cambia uno dei file da cui dipendono le tag.
+
+    :param csv_path: Percorso del CSV dei prodotti.
+    :return: Stringa esadecimale di 16 caratteri.
+    """
+    digest = hashlib.sha256()
+    for path in (csv_path, config.LASTFM_ARTISTS_FILE, config.LASTFM_GENRES_FILE):
+        digest.update(path.encode("utf-8"))
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+########################################
+# RE-TAGGING INCREMENTALE
+########################################
+def load_dictionary_diff(diff_path):
+    """
+    Carica il file delle differenze prodotto da lastfm_extraction.save_lastfm_data
+    (termini aggiunti e rimossi dai dizionari). Restituisce None se il file non esiste.
+    """
+    if not os.path.exists(diff_path):
+        return None
+    with open(diff_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def retag_affected_products(df, diff):
+    """
+    Aggiorna le tag dei soli prodotti interessati da un aggiornamento dei dizionari.
+    Un prodotto è interessato se il suo testo contiene almeno un termine aggiunto o rimosso:
+    solo in quel caso il dictionary lookup può dare un risultato diverso.
+
+    :param df: DataFrame già preprocessato (colonna "tags"), aggiornato in-place.
+    :param diff: Differenze dei dizionari, come restituite da load_dictionary_diff.
+    :return: Lista degli indici (del DataFrame) dei prodotti ri-taggati.
+    """
+    changed_terms = set()
+    for kind in ("artists", "genres"):
+        changed_terms.update(diff.get(kind, {}).get("added", []))
+        changed_terms.update(diff.get(kind, {}).get("removed", []))
+    if not changed_terms:
+        return []
+
+    artists_set = load_dictionary(config.LASTFM_ARTISTS_FILE)
+    genres_set = load_dictionary(config.LASTFM_GENRES_FILE)
+
+    affected = []
+    for idx, name, description in zip(df.index, df["name"], df["description"]):
+        text = matching_text(name, description)
+        if any(term in text for term in changed_terms):
+            df.at[idx, "tags"] = clean_and_lookup(name, description, artists_set, genres_set)
+            affected.append(idx)
+
+    logger.info("Re-tagging incrementale: %d prodotti aggiornati su %d.", len(affected), len(df))
+    return affected
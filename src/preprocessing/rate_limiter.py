@@ -0,0 +1,51 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Rate limiter a token bucket, thread-safe.
+    I token si ricaricano a `rate` al secondo fino a un massimo di `burst`:
+    ogni richiesta consuma un token e, se non ce ne sono, attende il successivo.
+    """
+
+    def __init__(self, rate, burst=1):
+        """
+        :param rate: Numero medio di richieste consentite al secondo.
+        :param burst: Numero massimo di richieste consentite in rapida successione.
+        """
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Consuma un token, bloccando il thread chiamante finché non è disponibile.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def try_acquire(self):
+        """
+        Consuma un token se disponibile, senza attendere.
+
+        :return: True se il token è stato consumato, False altrimenti.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
@@ -0,0 +1,258 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# Colonne testuali del catalogo (oltre a prezzo e tag), salvate nella tabella delle stringhe
+TEXT_COLUMNS = ("name", "description", "image_url", "product_url")
+
+# Array che compongono un catalogo esportato (un file .npy ciascuno)
+ARRAY_NAMES = (
+    "product_ids", "prices",
+    "tag_indptr", "tag_indices",
+    "inv_indptr", "inv_indices",
+    "tag_vocab",
+    "string_offsets", "string_data",
+) + tuple(f"{column}_ids" for column in TEXT_COLUMNS)
+
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+
+
+class ProductCatalog:
+    """
+    Catalogo dei prodotti in forma di array numpy, pensato per essere costruito una sola volta
+    ed esportato su file: i worker lo collegano con np.load(mmap_mode="r"), condividendo le stesse
+    pagine di memoria del sistema operativo (zero-copy) invece di rifare il preprocessing.
+
+    Struttura (n prodotti, T tag distinte):
+    - product_ids [n], prices [n]: ID (indice del DataFrame originale) e prezzo di ogni prodotto.
+    - tag_indptr [n+1], tag_indices: tag di ogni prodotto in formato CSR (ID di tag 0..T-1).
+    - inv_indptr [T+1], inv_indices: indice invertito tag -> posizioni dei prodotti (CSR).
+    - tag_vocab [T]: ID nella tabella delle stringhe del nome di ogni tag.
+    - string_offsets, string_data: tabella delle stringhe (UTF-8 concatenato + offset).
+    - <colonna>_ids [n]: ID nella tabella delle stringhe di name, description, image_url, product_url.
+    """
+
+    def __init__(self, arrays, version=None):
+        """
+        :param arrays: Dizionario {nome: array numpy} con tutti gli array di ARRAY_NAMES.
+        :param version: Versione del catalogo (vedi compute_catalog_version).
+        """
+        for name in ARRAY_NAMES:
+            setattr(self, name, arrays[name])
+        self.version = version
+        self._tag_names = None
+        self._tag_index = None
+        self._id_order = None
+
+    ########################################
+    # COSTRUZIONE, EXPORT E ATTACH
+    ########################################
+    @classmethod
+    def from_dataframe(cls, df_products, version=None):
+        """
+        Costruisce il catalogo da un DataFrame preprocessato (colonne "price", "tags" e TEXT_COLUMNS).
+        """
+        strings = {}
+
+        def string_id(value):
+            value = "" if value is None or (isinstance(value, float) and np.isnan(value)) else str(value)
+            if value not in strings:
+                strings[value] = len(strings)
+            return strings[value]
+
+        tag_ids = {}
+        tag_indptr = np.zeros(len(df_products) + 1, dtype=np.int64)
+        tag_indices = []
+        for pos, tags in enumerate(df_products["tags"]):
+            if isinstance(tags, str):
+                tags = tags.split(",")
+            for tag in dict.fromkeys(tags):
+                tag_indices.append(tag_ids.setdefault(tag, len(tag_ids)))
+            tag_indptr[pos + 1] = len(tag_indices)
+        tag_indices = np.asarray(tag_indices, dtype=np.int32)
+
+        # Indice invertito: per ogni tag le posizioni dei prodotti, ordinate
+        product_of_entry = np.repeat(np.arange(len(df_products), dtype=np.int32), np.diff(tag_indptr))
+        order = np.argsort(tag_indices, kind="stable")
+        inv_indices = product_of_entry[order]
+        inv_indptr = np.zeros(len(tag_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tag_indices, minlength=len(tag_ids)), out=inv_indptr[1:])
+
+        arrays = {
+            "product_ids": df_products.index.to_numpy(dtype=np.int64),
+            "prices": df_products["price"].to_numpy(dtype=np.float64),
+            "tag_indptr": tag_indptr,
+            "tag_indices": tag_indices,
+            "inv_indptr": inv_indptr,
+            "inv_indices": inv_indices,
+            "tag_vocab": np.array([string_id(tag) for tag in tag_ids], dtype=np.int32),
+        }
+        for column in TEXT_COLUMNS:
+            values = df_products[column] if column in df_products else [""] * len(df_products)
+            arrays[f"{column}_ids"] = np.array([string_id(v) for v in values], dtype=np.int32)
+
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        arrays["string_offsets"] = offsets
+        arrays["string_data"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(arrays, version=version)
+
+    def export(self, catalog_dir):
+        """
+        Esporta il catalogo in catalog_dir/<versione>/ (un file .npy per array) e aggiorna
+        il puntatore CURRENT in modo atomico: i worker che si collegano dopo vedono la nuova
+        versione, quelli già collegati continuano a usare i file della precedente.
+
+        :param catalog_dir: Cartella di export (ad es. su /dev/shm per restare in RAM).
+        :return: Percorso della cartella della versione esportata.
+        """
+        version = self.version or "unversioned"
+        target = os.path.join(catalog_dir, version)
+        tmp_target = f"{target}.tmp-{os.getpid()}"
+        if os.path.exists(tmp_target):
+            shutil.rmtree(tmp_target)
+        os.makedirs(tmp_target)
+
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(tmp_target, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+        with open(os.path.join(tmp_target, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "products": len(self), "tags": len(self.tag_vocab)}, f)
+
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        os.replace(tmp_target, target)
+
+        tmp_current = os.path.join(catalog_dir, f"{CURRENT_FILE}.tmp-{os.getpid()}")
+        with open(tmp_current, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(tmp_current, os.path.join(catalog_dir, CURRENT_FILE))
+        return target
+
+    @classmethod
+    def attach(cls, catalog_dir, version=None):
+        """
+        Collega un catalogo esportato, mappando gli array in memoria in sola lettura (zero-copy).
+
+        :param catalog_dir: Cartella di export usata da export().
+        :param version: Versione da collegare (default: quella indicata da CURRENT).
+        """
+        if version is None:
+            with open(os.path.join(catalog_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+                version = f.read().strip()
+        path = os.path.join(catalog_dir, version)
+        with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ARRAY_NAMES}
+        return cls(arrays, version=manifest["version"])
+
+    ########################################
+    # ACCESSO
+    ########################################
+    def __len__(self):
+        return len(self.product_ids)
+
+    def string(self, string_id):
+        """
+        Restituisce la stringa con l'ID indicato dalla tabella delle stringhe.
+        """
+        start, end = self.string_offsets[string_id], self.string_offsets[string_id + 1]
+        return bytes(self.string_data[start:end]).decode("utf-8")
+
+    @property
+    def tag_names(self):
+        """
+        Nomi delle tag, indicizzati per ID di tag (decodificati al primo accesso).
+        """
+        if self._tag_names is None:
+            self._tag_names = [self.string(string_id) for string_id in self.tag_vocab]
+        return self._tag_names
+
+    @property
+    def tag_index(self):
+        """
+        Dizionario {nome tag: ID di tag}.
+        """
+        if self._tag_index is None:
+            self._tag_index = {name: tag_id for tag_id, name in enumerate(self.tag_names)}
+        return self._tag_index
+
+    def product_tags(self, pos):
+        """
+        Tag (nomi) del prodotto in posizione pos.
+        """
+        tag_names = self.tag_names
+        return [tag_names[t] for t in self.tag_indices[self.tag_indptr[pos]:self.tag_indptr[pos + 1]]]
+
+    def signature_classes(self, positions):
+        """
+        Raggruppa i prodotti in positions per insieme di tag (firma): prodotti con le stesse tag
+        ricevono la stessa classe, numerata da 0 in ordine di prima occorrenza.
+
+        :return: Tupla (array [len(positions)] con la classe di ogni prodotto, numero di classi).
+        """
+        classes = np.empty(len(positions), dtype=np.int64)
+        signatures = {}
+        for i, pos in enumerate(np.asarray(positions).tolist()):
+            signature = np.sort(self.tag_indices[self.tag_indptr[pos]:self.tag_indptr[pos + 1]]).tobytes()
+            classes[i] = signatures.setdefault(signature, len(signatures))
+        return classes, len(signatures)
+
+    def tag_mask(self, tags):
+        """
+        Maschera booleana [n] dei prodotti che hanno almeno una delle tag indicate
+        (calcolata tramite l'indice invertito, senza scorrere tutti i prodotti).
+        """
+        mask = np.zeros(len(self), dtype=bool)
+        for tag in tags:
+            tag_id = self.tag_index.get(tag)
+            if tag_id is not None:
+                mask[self.inv_indices[self.inv_indptr[tag_id]:self.inv_indptr[tag_id + 1]]] = True
+        return mask
+
+    def positions_of(self, product_ids):
+        """
+        Posizioni nel catalogo dei prodotti con gli ID indicati (-1 per gli ID non presenti,
+        ad esempio se appartengono a una versione precedente del catalogo).
+        """
+        if self._id_order is None:
+            self._id_order = np.argsort(self.product_ids, kind="stable")
+        product_ids = np.asarray(product_ids, dtype=np.int64)
+        if len(self) == 0:
+            return np.full(len(product_ids), -1, dtype=np.int64)
+        sorted_ids = self.product_ids[self._id_order]
+        idx = np.minimum(np.searchsorted(sorted_ids, product_ids), len(self) - 1)
+        return np.where(sorted_ids[idx] == product_ids, self._id_order[idx], -1)
+
+    def record(self, pos):
+        """
+        Dizionario con i campi del prodotto in posizione pos (come una riga di to_dataframe),
+        costruito senza materializzare un DataFrame.
+        """
+        record = {column: self.string(getattr(self, f"{column}_ids")[pos]) for column in TEXT_COLUMNS}
+        record["id"] = int(self.product_ids[pos])
+        record["price"] = float(self.prices[pos])
+        record["tags"] = self.product_tags(pos)
+        return record
+
+    def to_dataframe(self, positions=None):
+        """
+        Materializza un DataFrame (indice = ID prodotto) per le sole posizioni indicate,
+        con le colonne price, tags e TEXT_COLUMNS. Senza positions converte l'intero catalogo.
+        """
+        if positions is None:
+            positions = np.arange(len(self))
+        positions = np.asarray(positions, dtype=np.int64)
+        data = {}
+        for column in TEXT_COLUMNS:
+            column_ids = getattr(self, f"{column}_ids")
+            data[column] = [self.string(column_ids[pos]) for pos in positions]
+        data["price"] = np.asarray(self.prices[positions], dtype=np.float64)
+        data["tags"] = [self.product_tags(pos) for pos in positions]
+        # Stesso ordine di colonne del CSV preprocessato
+        data = {column: data[column] for column in ("name", "price", "description", "image_url", "product_url", "tags")}
+        return pd.DataFrame(data, index=pd.Index(np.asarray(self.product_ids[positions]), dtype=np.int64))
@@ -0,0 +1,241 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from src.preprocessing.product_preprocessor import (
+    preprocess_products, compute_catalog_version, load_dictionary_diff, retag_affected_products
+)
+from src.recommendation.catalog import ProductCatalog, CURRENT_FILE
+from src.recommendation.recommendation_engine_ga import RecommendationEngineGA
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogSnapshot:
+    """
+    Versione pubblicata del catalogo: catalogo, motore GA e (se costruito localmente) il DataFrame
+    preprocessato. Una snapshot non viene mai modificata dopo la pubblicazione.
+    """
+
+    def __init__(self, number, catalog, engine, df_products=None, fingerprints=None):
+        """
+        :param number: Numero progressivo della pubblicazione (1, 2, ...).
+        :param catalog: ProductCatalog della versione.
+        :param engine: RecommendationEngineGA costruito sul catalogo.
+        :param df_products: DataFrame preprocessato (None se il catalogo è collegato da un export).
+        :param fingerprints: Stato (mtime, dimensione) dei file sorgente al momento della costruzione.
+        """
+        self.number = number
+        self.catalog = catalog
+        self.engine = engine
+        self.df_products = df_products
+        self.fingerprints = fingerprints or {}
+        self.published_at = time.time()
+
+    @property
+    def version(self):
+        return self.catalog.version
+
+
+class CatalogManager:
+    """
+    Gestisce il catalogo servito dall'app e lo aggiorna senza riavvii.
+
+    - Le richieste leggono la snapshot corrente con current() e la usano fino alla fine:
+      le richieste in corso completano sulla versione precedente anche durante un aggiornamento.
+    - Un aggiornamento (reload(), innescato dal watcher sui file o da un amministratore) ricostruisce
+      il catalogo in un thread in background e pubblica la nuova snapshot con uno scambio atomico
+      del riferimento; i listener registrati (es. cache dei risultati) vengono poi notificati.
+    - Se è cambiato solo il contenuto dei dizionari e il file delle differenze di Last.fm è
+      aggiornato, vengono ri-taggati solo i prodotti interessati (retag_affected_products).
+    - In modalità attach (attach_dir) il catalogo viene invece ricollegato dall'export condiviso
+      quando il processo master pubblica una nuova versione (file CURRENT).
+    """
+
+    def __init__(self, csv_path=None, attach_dir=None, export_dir=None, poll_interval=None):
+        """
+        :param csv_path: CSV dei prodotti (default: config.DATASET_PATH). Ignorato in modalità attach.
+        :param attach_dir: Cartella di un catalogo esportato da collegare invece di costruirlo.
+        :param export_dir: Se indicata, ogni versione costruita viene anche esportata per i worker.
+        :param poll_interval: Intervallo in secondi del controllo dei file (default: config.CATALOG_WATCH_INTERVAL).
+        """
+        self.csv_path = csv_path or config.DATASET_PATH
+        self.attach_dir = attach_dir
+        self.export_dir = export_dir
+        self.poll_interval = poll_interval if poll_interval is not None else config.CATALOG_WATCH_INTERVAL
+
+        self._current = None
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog-reload")
+        self._pending = None  # Ricostruzione in corso (single-flight)
+        self._watcher = None
+        self._stop = threading.Event()
+        self.last_error = None
+
+    ########################################
+    # SNAPSHOT CORRENTE
+    ########################################
+    def current(self):
+        """
+        Restituisce la snapshot pubblicata. Va letta una sola volta per richiesta.
+        """
+        return self._current
+
+    def add_listener(self, callback):
+        """
+        Registra una funzione callback(old_snapshot, new_snapshot) chiamata dopo ogni pubblicazione,
+        ad esempio per invalidare le cache legate alla versione precedente.
+        """
+        self._listeners.append(callback)
+
+    def _watched_files(self):
+        if self.attach_dir:
+            return [os.path.join(self.attach_dir, CURRENT_FILE)]
+        return [self.csv_path, config.LASTFM_ARTISTS_FILE, config.LASTFM_GENRES_FILE, config.LASTFM_DICTIONARY_DIFF_FILE]
+
+    def _fingerprints(self):
+        fingerprints = {}
+        for path in self._watched_files():
+            try:
+                stat = os.stat(path)
+                fingerprints[path] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                fingerprints[path] = None
+        return fingerprints
+
+    ########################################
+    # COSTRUZIONE E PUBBLICAZIONE
+    ########################################
+    def load(self):
+        """
+        Costruisce (o collega) e pubblica la prima versione del catalogo, in modo sincrono.
+        """
+        self._publish(self._build(self._current))
+        return self._current
+
+    def _build(self, previous):
+        fingerprints = self._fingerprints()
+        df_products = None
+
+        if self.attach_dir:
+            catalog = ProductCatalog.attach(self.attach_dir)
+            if previous is not None and catalog.version == previous.version:
+                return None
+        else:
+            version = compute_catalog_version(self.csv_path)
+            if previous is not None and version == previous.version:
+                return None
+
+            diff_path = config.LASTFM_DICTIONARY_DIFF_FILE
+            incremental = (
+                previous is not None
+                and previous.df_products is not None
+                and fingerprints.get(self.csv_path) == previous.fingerprints.get(self.csv_path)
+                and fingerprints.get(diff_path) is not None
+                and fingerprints.get(diff_path) != previous.fingerprints.get(diff_path)
+            )
+            diff = load_dictionary_diff(diff_path) if incremental else None
+            if diff is not None:
+                # Solo i dizionari sono cambiati: si ri-taggano i prodotti interessati su una copia
+                logger.info("Aggiornamento incrementale del catalogo (dizionari modificati)...")
+                df_products = previous.df_products.copy()
+                df_products["tags"] = df_products["tags"].map(list)
+                retag_affected_products(df_products, diff)
+            else:
+                logger.info("Ricostruzione completa del catalogo...")
+                df_products = preprocess_products(self.csv_path)
+            catalog = ProductCatalog.from_dataframe(df_products, version=version)
+            if self.export_dir:
+                catalog.export(self.export_dir)
+
+        engine = RecommendationEngineGA(
+            catalog=catalog,
+            user_data={},  # Popolato per ogni richiesta con for_request()
+            min_price=None,
+            max_price=None,
+            preference_mode=None
+        )
+        number = previous.number + 1 if previous is not None else 1
+        return CatalogSnapshot(number, catalog, engine, df_products=df_products, fingerprints=fingerprints)
+
+    def _publish(self, snapshot):
+        if snapshot is None:
+            return
+        with self._lock:
+            old, self._current = self._current, snapshot
+        logger.info("Catalogo pubblicato: versione %s (#%d, %d prodotti).", snapshot.version, snapshot.number, len(snapshot.catalog))
+        for callback in self._listeners:
+            try:
+                callback(old, snapshot)
+            except Exception as e:
+                logger.warning("Listener del catalogo fallito: %s", e)
+
+    def _reload(self):
+        try:
+            self._publish(self._build(self._current))
+            self.last_error = None
+        except Exception as e:
+            # La versione corrente resta pubblicata: l'errore viene solo registrato
+            self.last_error = str(e)
+            logger.error("Aggiornamento del catalogo fallito: %s", e)
+        finally:
+            with self._lock:
+                self._pending = None
+        return self._current
+
+    def reload(self):
+        """
+        Avvia in background la ricostruzione del catalogo. Se una ricostruzione è già in corso
+        non ne viene avviata un'altra.
+
+        :return: Future che si completa con la snapshot corrente al termine della ricostruzione.
+        """
+        with self._lock:
+            if self._pending is None:
+                self._pending = self._executor.submit(self._reload)
+            return self._pending
+
+    ########################################
+    # WATCHER
+    ########################################
+    def start_watching(self):
+        """
+        Avvia un thread daemon che controlla periodicamente i file sorgente (o il file CURRENT
+        dell'export) e avvia reload() quando cambiano.
+        """
+        if self._watcher is not None or self.poll_interval <= 0:
+            return
+        self._watcher = threading.Thread(target=self._watch, name="catalog-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+
+    def _watch(self):
+        last_seen = self._current.fingerprints if self._current is not None else self._fingerprints()
+        while not self._stop.wait(self.poll_interval):
+            fingerprints = self._fingerprints()
+            # Con una ricostruzione già in corso si riprova al controllo successivo
+            if fingerprints != last_seen and self._pending is None:
+                self.reload().result()
+                # Una ricostruzione fallita (ad es. file scritti a metà) viene ripetuta al controllo successivo
+                if self.last_error is None:
+                    last_seen = fingerprints
+
+    def status(self):
+        """
+        Stato del catalogo servito (per l'endpoint di amministrazione).
+        """
+        snapshot = self._current
+        return {
+            "version": snapshot.version if snapshot else None,
+            "number": snapshot.number if snapshot else None,
+            "products": len(snapshot.catalog) if snapshot else 0,
+            "published_at": snapshot.published_at if snapshot else None,
+            "reloading": self._pending is not None,
+            "last_error": self.last_error,
+        }
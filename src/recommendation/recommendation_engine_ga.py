@@ -1,8 +1,85 @@
+import copy
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import numpy as np
 import pandas as pd
-import pygad
 import config
 from src.recommendation.evaluate_ga import evaluate_recommendations
+from src.recommendation.catalog import ProductCatalog
+from src.recommendation.sharding import CatalogShards
+from src.preprocessing.product_preprocessor import load_dictionary
+from src.logging_utils import log_items
+
+logger = logging.getLogger(__name__)
+
+# Pool di processi condiviso per l'ottimizzazione degli shard, creato al primo run in modalità a shard
+_shard_executor = None
+_shard_executor_lock = threading.Lock()
+
+
+def _get_shard_executor():
+    """
+    Restituisce il pool di processi degli shard (spawn: sicuro anche con i thread del server attivi).
+    """
+    global _shard_executor
+    if _shard_executor is None:
+        with _shard_executor_lock:
+            if _shard_executor is None:
+                _shard_executor = ProcessPoolExecutor(
+                    max_workers=config.GA_SHARD_WORKERS or os.cpu_count(),
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+    return _shard_executor
+
+
+def shutdown_shard_executor():
+    """
+    Chiude il pool degli shard, se creato. All'uscita dell'interprete avviene da sé; va chiamata
+    esplicitamente in un processo figlio di multiprocessing, che altrimenti resta in attesa dei worker del pool.
+    """
+    global _shard_executor
+    with _shard_executor_lock:
+        executor, _shard_executor = _shard_executor, None
+    if executor is not None:
+        executor.shutdown()
+
+
+def load_tuning_params(path=None):
+    """
+    Coefficienti dell'auto-tuning del GA: config.GA_AUTO_TUNE_PARAMS, sovrascritti da quelli del
+    profilo generato da tests/ga_tuning.py (chiave "params"), se il file esiste.
+
+    :param path: Percorso del profilo (default: config.GA_TUNED_PROFILE).
+    :return: Dizionario dei coefficienti.
+    """
+    path = config.GA_TUNED_PROFILE if path is None else path
+    params = dict(config.GA_AUTO_TUNE_PARAMS)
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            params.update(json.load(f)["params"])
+        logger.info("Profilo di auto-tuning del GA caricato da %s.", path)
+    return params
+
+
+def _optimize_shard(engine, time_budget_ms):
+    """
+    Esegue il GA su un solo shard (anche in un processo del pool).
+
+    :param engine: Copia del motore ridotta al genoma dello shard (vedi RecommendationEngineGA._shard_engine).
+    :param time_budget_ms: Budget residuo del run in ms (0 = nessun limite).
+    :return: Tupla (indici dei geni selezionati, miglior fitness, generazioni, troncato).
+    """
+    engine._reset_stagnation_params()
+    engine._start_time_budget(time_budget_ms)
+    selected_genes = engine._run_ga()
+    return selected_genes, engine.last_best_fitness, engine.generations_completed, engine.truncated
+
 
 class RecommendationEngineGA:
     """
@@ -13,29 +90,46 @@ class RecommendationEngineGA:
 
     def __init__(
         self,
-        df_products,
-        user_data,
+        df_products=None,
+        user_data=None,
         min_price=None,
         max_price=None,
-        preference_mode=None  # 'artist', 'genre', o 'balanced'
+        preference_mode=None,  # 'artist', 'genre', o 'balanced'
+        catalog=None,
+        seed=None,
+        shards=None
     ):
         """
         Inizializza il motore di raccomandazione GA.
 
-        :param df_products: DataFrame Pandas con i prodotti (colonna "tags").
+        :param df_products: DataFrame Pandas con i prodotti (colonna "tags"). Ignorato se è fornito catalog.
         :param user_data: Dizionario con i dati dell'utente da Spotify (top e recent).
         :param min_price: Prezzo minimo impostato dall'utente (opzionale).
         :param max_price: Prezzo massimo impostato dall'utente (opzionale).
         :param preference_mode: Modalità di preferenza ("artist", "genre", "balanced").
+        :param catalog: ProductCatalog già costruito o collegato da un export condiviso (opzionale).
+        :param seed: Seed del generatore casuale del GA (None = non deterministico).
+        :param shards: CatalogShards del catalogo (opzionale; con config.GA_SHARDED viene calcolato qui).
         """
-        # Clona il DataFrame originale per evitare modifiche in-place
-        self.df_products = df_products.copy()
-        self.user_data = user_data
+        # Il catalogo (array numpy, eventualmente mappati in memoria) non viene mai modificato:
+        # ogni run lavora sulle posizioni dei prodotti nel range di prezzo (self.positions)
+        self.catalog = catalog if catalog is not None else ProductCatalog.from_dataframe(df_products)
+        self.positions = np.arange(len(self.catalog))
+
+        # Modalità a shard: il catalogo è partizionato per famiglia di generi una sola volta, qui
+        if shards is None and config.GA_SHARDED:
+            shards = CatalogShards.from_catalog(self.catalog, load_dictionary(config.LASTFM_GENRES_FILE), config.GA_SHARDS)
+        self.shards = shards
+
+        self.user_data = user_data if user_data is not None else {}
         self.min_price = min_price
         self.max_price = max_price
         self.preference_mode = preference_mode
 
-        # DataFrame originale per il benchmark
+        # Generatore casuale proprio del motore: run riproducibili e nessuno stato globale condiviso
+        self.rng = np.random.default_rng(seed)
+
+        # DataFrame dei prodotti pertinenti ai gusti dell'utente (anche fuori prezzo), per la valutazione
         self.df_all_products = None
 
         # Parametri GA importati da config.py
@@ -47,6 +141,10 @@ class RecommendationEngineGA:
         self.stagnation_limit = config.GA_STAGNATION_LIMIT
         self.keep_elitism = config.GA_KEEP_ELITISM
 
+        # Auto-tuning: i parametri sopra sono ricalcolati a ogni run dal genoma (vedi _tune_parameters)
+        self.auto_tune = config.GA_AUTO_TUNE
+        self.tuning_params = load_tuning_params() if self.auto_tune else dict(config.GA_AUTO_TUNE_PARAMS)
+
         # Traccia del progresso in ottica "stagnazione"
         self.no_improvement_generations = 0
         self.last_best_fitness = None
@@ -54,54 +152,136 @@ class RecommendationEngineGA:
         # Traccia le generazioni completate
         self.generations_completed = 0
 
+        # Budget di tempo per raccomandazione (ms): superato, il GA si ferma con la miglior soluzione trovata
+        self.time_budget_ms = config.GA_TIME_BUDGET_MS
+        self.truncated = False  # True se l'ultimo run è stato interrotto per budget di tempo esaurito
+        self._deadline = None
+        self._ga_start = None
+
+        # Riduzione del genoma: solo prodotti candidati, raggruppati in classi di geni per insieme di tag
+        self.candidate_pruning = config.GA_CANDIDATE_PRUNING
+        self.exploration_sample = config.GA_EXPLORATION_SAMPLE
+        self.gene_classes = config.GA_GENE_CLASSES
+
         # Pesi di affinità e penalità prelevati dalla config
         self.affinity_weights = config.GA_AFFINITY_WEIGHTS
         self.penalty_weight_non_match = config.GA_PENALTY_WEIGHT_NON_MATCH
         self.penalty_missing_relevant = config.GA_PENALTY_MISSING_RELEVANT
 
-        # Memorizza tutti i tag associati ai prodotti
-        self.products_tags = self.df_products["tags"].tolist()
+        # Punteggio di affinità e maschera di rilevanza dei prodotti in self.positions (calcolati in recommend())
+        self.product_scores = np.zeros(0, dtype=np.int64)
+        self.relevant_mask = np.zeros(0, dtype=bool)
 
         # Inizializza un set vuoto per gli indici "rilevanti" (calcolati in recommend())
         self.relevant_indices = set()
 
+        # Genoma (calcolato in recommend()): classe di gene di ogni prodotto in self.positions e, per gene,
+        # affinità totale, prodotti senza affinità e prodotti rilevanti della classe
+        self.gene_of_product = np.zeros(0, dtype=np.int64)
+        self.gene_affinity = np.zeros(0, dtype=np.int64)
+        self.gene_non_match = np.zeros(0, dtype=np.int64)
+        self.gene_relevant = np.zeros(0, dtype=np.int64)
+
+        # Fitness incrementale: componenti (affinità totale, prodotti senza affinità selezionati,
+        # prodotti rilevanti mancanti) di ogni individuo, indicizzate per contenuto del cromosoma.
+        # I figli sono valutati applicando ai componenti del genitore solo i geni cambiati.
+        # Conviene solo su genomi lunghi: sui genomi corti prevale il costo della contabilità per figlio.
+        self.incremental_fitness = config.GA_INCREMENTAL_FITNESS
+        self.incremental_min_genes = config.GA_INCREMENTAL_MIN_GENES
+        self._incremental = False  # Attiva per il genoma corrente (deciso in _build_genome)
+        self._components = {}
+
+        # Warm start: popolazione finale di un run precedente dello stesso utente (vedi _final_population),
+        # da cui parte la popolazione iniziale; dopo il run, la popolazione finale di questo run
+        self.warm_start = None
+        self.warm_start_fraction = config.GA_WARM_START_FRACTION
+        self.warm_stagnation_limit = config.GA_WARM_STAGNATION_LIMIT
+        self.final_population = None
+        self._warm_started = False  # True se la popolazione iniziale del run corrente viene da un warm start
+
+    def for_request(self, user_data, min_price=None, max_price=None, preference_mode=None, seed=None, warm_start=None):
+        """
+        Restituisce una copia leggera del motore configurata per una singola richiesta.
+        Il catalogo è condiviso in sola lettura, quindi richieste concorrenti
+        possono usare ciascuna la propria copia senza duplicarlo.
+
+        :param user_data: Dizionario con i dati dell'utente da Spotify (top e recent).
+        :param min_price: Prezzo minimo impostato dall'utente (opzionale).
+        :param max_price: Prezzo massimo impostato dall'utente (opzionale).
+        :param preference_mode: Modalità di preferenza ("artist", "genre", "balanced").
+        :param seed: Seed del generatore casuale della copia (None = non deterministico).
+        :param warm_start: Popolazione finale (final_population) di un run precedente dell'utente (opzionale).
+        :return: Nuova istanza di RecommendationEngineGA.
+        """
+        engine = copy.copy(self)
+        engine.user_data = user_data
+        engine.min_price = min_price
+        engine.max_price = max_price
+        engine.preference_mode = preference_mode
+        engine.rng = np.random.default_rng(seed)
+        engine.positions = np.arange(len(self.catalog))
+        engine.relevant_indices = set()
+        engine.warm_start = warm_start
+        engine.final_population = None
+        return engine
+
     def _reset_stagnation_params(self):
         """
         Reimposta i contatori di stagnazione prima di un nuovo ciclo GA.
         """
         self.no_improvement_generations = 0
         self.last_best_fitness = None
+        self.generations_completed = 0
+        self.truncated = False
 
-    def _evaluate_product_score(self, product_idx):
+    def _start_time_budget(self, time_budget_ms):
         """
-        Calcola il punteggio di affinità di un singolo prodotto
-        basandosi sul match con i gusti dell'utente (artist/genre).
+        Fissa la scadenza del run corrente.
+
+        :param time_budget_ms: Budget in millisecondi (None = config.GA_TIME_BUDGET_MS, 0 = nessun limite).
+        """
+        budget = self.time_budget_ms if time_budget_ms is None else time_budget_ms
+        self._deadline = time.perf_counter() + budget / 1000.0 if budget else None
 
-        :param product_idx: Indice del prodotto nel DataFrame.
-        :return: Valore (float o int) che rappresenta il punteggio di affinità.
+    def _compute_product_scores(self):
         """
-        # Ricava i tag del prodotto
-        p_tags = set(self.products_tags[product_idx])
+        Calcola in forma vettoriale il punteggio di affinità di ogni prodotto in self.positions
+        basandosi sul match con i gusti dell'utente (artist/genre), usando l'indice invertito del catalogo.
 
+        :return: Tupla (punteggi int64, maschera dei prodotti rilevanti), entrambi allineati a self.positions.
+        """
         # Unisce i set di top e recent per artisti e generi
         user_artists = set(self.user_data.get("artists", [])) | set(self.user_data.get("recent_artists", []))
         user_genres = set(self.user_data.get("genres", [])) | set(self.user_data.get("recent_genres", []))
 
+        artist_match = self.catalog.tag_mask(user_artists)[self.positions]
+        genre_match = self.catalog.tag_mask(user_genres)[self.positions]
+
         # Calcola l'affinità in base alla modalità di preferenza
-        affinity_score = 0
+        scores = np.zeros(len(self.positions), dtype=np.int64)
+        relevant = np.zeros(len(self.positions), dtype=bool)
         if self.preference_mode == "artist":
-            if p_tags & user_artists:
-                affinity_score = self.affinity_weights["artists"]
+            scores[artist_match] = self.affinity_weights["artists"]
+            relevant = artist_match
         elif self.preference_mode == "genre":
-            if p_tags & user_genres:
-                affinity_score = self.affinity_weights["genres"]
+            scores[genre_match] = self.affinity_weights["genres"]
+            relevant = genre_match
         elif self.preference_mode == "balanced":
-            if p_tags & user_artists:
-                affinity_score += self.affinity_weights["artists"]
-            if p_tags & user_genres:
-                affinity_score += self.affinity_weights["genres"]
+            scores[artist_match] += self.affinity_weights["artists"]
+            scores[genre_match] += self.affinity_weights["genres"]
+            relevant = artist_match | genre_match
+
+        return scores, relevant
+
+    def _evaluate_product_score(self, product_idx):
+        """
+        Restituisce il punteggio di affinità di un singolo prodotto
+        basandosi sul match con i gusti dell'utente (artist/genre).
 
-        return affinity_score
+        :param product_idx: Indice del prodotto tra quelli nel range di prezzo (self.positions).
+        :return: Valore (int) che rappresenta il punteggio di affinità.
+        """
+        return int(self.product_scores[product_idx])
 
     def _fitness_func(self, ga_instance, solution, solution_idx):
         """
@@ -109,39 +289,133 @@ class RecommendationEngineGA:
         Tiene conto dell'affinità totale, della copertura e della precisione.
 
         :param ga_instance: Istanza GA in esecuzione.
-        :param solution: Array binario che rappresenta una soluzione (1=prodotto selezionato).
+        :param solution: Array binario che rappresenta una soluzione (1=classe di prodotti selezionata).
         :param solution_idx: Indice della soluzione nella popolazione.
         :return: Punteggio di fitness complessivo (total_affinity - coverage_penalty - precision_penalty).
         """
-        selected_indices = np.where(solution == 1)[0]
-
-        # Calcola il punteggio totale di affinità per i prodotti selezionati
-        total_affinity = sum(self._evaluate_product_score(idx) for idx in selected_indices)
+        if self._incremental:
+            total_affinity, non_match_products, missing_relevant_products = self._components_of(solution)
+        else:
+            total_affinity, non_match_products, missing_relevant_products = self._fitness_components(solution)
 
-        # Calcola la penalità di precisione (prodotti selezionati senza affinità)
-        precision_penalty = self.penalty_weight_non_match * sum(
-            1 for idx in selected_indices if self._evaluate_product_score(idx) == 0
-        )
+        # Penalità di precisione (prodotti selezionati senza affinità)
+        precision_penalty = self.penalty_weight_non_match * non_match_products
 
-        # Calcola la penalità di copertura (prodotti rilevanti non inclusi)
-        selected_set = set(selected_indices)
-        missing_relevant_products = self.relevant_indices - selected_set
-        coverage_penalty = self.penalty_missing_relevant * len(missing_relevant_products)
+        # Penalità di copertura (prodotti rilevanti non inclusi)
+        coverage_penalty = self.penalty_missing_relevant * missing_relevant_products
 
         # Restituisce il punteggio netto finale
         return total_affinity - precision_penalty - coverage_penalty
 
+    def _fitness_components(self, solution):
+        """
+        Calcola da zero le componenti della fitness di una soluzione, scorrendo tutto il cromosoma.
+        Ogni gene rappresenta una classe di prodotti: i contributi sono già pesati per numero di prodotti.
+
+        :param solution: Array binario che rappresenta una soluzione.
+        :return: Tupla (affinità totale, prodotti selezionati senza affinità, prodotti rilevanti non inclusi).
+        """
+        selected = solution == 1
+        return (
+            int(self.gene_affinity[selected].sum()),
+            int(self.gene_non_match[selected].sum()),
+            int(self.gene_relevant[~selected].sum()),
+        )
+
+    def _components_of(self, solution):
+        """
+        Restituisce le componenti della fitness di una soluzione: quelle già note (calcolate in modo
+        incrementale da crossover e mutazione) oppure, per individui nuovi, calcolate da zero.
+        """
+        key = solution.tobytes()
+        components = self._components.get(key)
+        if components is None:
+            components = self._fitness_components(solution)
+            self._components[key] = components
+        return components
+
+    def _apply_delta(self, components, solution, changed):
+        """
+        Aggiorna le componenti della fitness dopo la modifica di alcuni geni, in O(geni cambiati).
+
+        :param components: Componenti della soluzione prima della modifica.
+        :param solution: Soluzione dopo la modifica.
+        :param changed: Indici dei geni cambiati.
+        :return: Componenti della soluzione modificata.
+        """
+        if len(changed) == 0:
+            return components
+        # +1 per i geni selezionati dalla modifica, -1 per quelli deselezionati
+        sign = 2 * solution[changed].astype(np.int64) - 1
+        total_affinity, non_match_products, missing_relevant_products = components
+        return (
+            total_affinity + int(sign @ self.gene_affinity[changed]),
+            non_match_products + int(sign @ self.gene_non_match[changed]),
+            missing_relevant_products - int(sign @ self.gene_relevant[changed]),
+        )
+
     def _generate_initial_population(self):
         """
         Genera una popolazione iniziale di soluzioni binarie in modo casuale.
-        Restituisce un array numpy (matrice) di shape (sol_per_pop, num_prodotti).
+        Con un warm start, una parte della popolazione (self.warm_start_fraction) è presa dai migliori
+        individui del run precedente dell'utente, riproiettati sul genoma corrente; il resto resta casuale.
+        Restituisce un array numpy (matrice) di shape (sol_per_pop, num_geni).
         """
-        initial_population = []
-        while len(initial_population) < self.sol_per_pop:
-            individual = np.random.randint(0, 2, size=len(self.df_products))
-            initial_population.append(individual)
-
-        return np.array(initial_population)
+        population = self.rng.integers(0, 2, size=(self.sol_per_pop, len(self.gene_affinity)))
+        self._warm_started = False
+        if self.warm_start is not None:
+            warm, n_known = self._project_population(self.warm_start)
+            n_warm = min(len(warm), round(self.sol_per_pop * self.warm_start_fraction))
+            population[:n_warm] = warm[:n_warm]
+            self._warm_started = n_warm > 0
+            if n_warm:
+                logger.info("Warm start: %d individui dal run precedente (%d geni su %d noti).",
+                            n_warm, n_known, population.shape[1])
+        return population
+
+    def _project_population(self, warm_start):
+        """
+        Riproietta la popolazione finale di un run precedente sul genoma corrente, passando dagli ID
+        dei prodotti: ogni gene corrente prende il valore del gene che, nel run precedente, conteneva
+        i suoi prodotti (le classi dipendono solo dalle tag, quindi prodotti della stessa classe
+        corrente erano nella stessa classe precedente). I geni senza prodotti in comune con il run
+        precedente (ad es. entrati con un range di prezzo più ampio) restano casuali.
+
+        :param warm_start: Dizionario prodotto da _final_population.
+        :return: Tupla (matrice individui x geni ordinata dal migliore, numero di geni noti);
+                 la matrice è vuota se i genomi non hanno prodotti in comune.
+        """
+        n_genes = len(self.gene_affinity)
+        old_ids = warm_start["product_ids"]
+        order = np.argsort(old_ids, kind="stable")
+        ids = np.asarray(self.catalog.product_ids[self.positions])
+        idx = np.minimum(np.searchsorted(old_ids, ids, sorter=order), len(old_ids) - 1)
+        found = old_ids[order[idx]] == ids
+
+        gene_source = np.full(n_genes, -1, dtype=np.int64)
+        gene_source[self.gene_of_product[found]] = warm_start["gene_of_product"][order[idx[found]]]
+        known = np.flatnonzero(gene_source >= 0)
+        if len(known) == 0:
+            return np.empty((0, n_genes), dtype=np.int64), 0
+
+        old_population = np.unpackbits(warm_start["population"], axis=1, count=warm_start["n_genes"])
+        population = self.rng.integers(0, 2, size=(len(old_population), n_genes))
+        population[:, known] = old_population[:, gene_source[known]]
+        return population, len(known)
+
+    def _final_population(self, population, fitness):
+        """
+        Popolazione finale del run in forma compatta, per il warm start del run successivo dell'utente:
+        i migliori individui (bit impacchettati) con, per ogni prodotto candidato, ID e gene.
+        """
+        n_keep = max(1, round(self.sol_per_pop * self.warm_start_fraction))
+        best = np.argsort(-np.asarray(fitness), kind="stable")[:n_keep]
+        return {
+            "product_ids": np.asarray(self.catalog.product_ids[self.positions]),
+            "gene_of_product": self.gene_of_product,
+            "n_genes": len(self.gene_affinity),
+            "population": np.packbits(population[best].astype(bool), axis=1),
+        }
 
     def _crossover_func(self, parents, offspring_size, ga_instance):
         """
@@ -159,13 +433,21 @@ class RecommendationEngineGA:
             parent2 = parents[(k + 1) % parents.shape[0]]
 
             # Esegue crossover bit a bit con maschera casuale
-            mask = np.random.rand(*parent1.shape) < 0.5
+            mask = self.rng.random(parent1.shape) < 0.5
             offspring[k] = np.where(mask, parent1, parent2)
 
             # Esegue il "salto" del crossover con prob. 1 - (crossover_probability/100)
-            if np.random.rand() > (self.crossover_probability / 100.0):
+            skipped = self.rng.random() > (self.crossover_probability / 100.0)
+            if skipped:
                 offspring[k] = parent1.copy()
 
+            # Componenti del figlio: quelle di parent1 più i geni presi da parent2 e diversi da parent1
+            if self._incremental:
+                changed = np.empty(0, dtype=np.int64) if skipped else np.flatnonzero(~mask & (parent1 != parent2))
+                self._components[offspring[k].tobytes()] = self._apply_delta(
+                    self._components_of(parent1), offspring[k], changed
+                )
+
         return offspring
 
     def _mutation_func(self, offspring, ga_instance):
@@ -176,21 +458,40 @@ class RecommendationEngineGA:
         :param ga_instance: Istanza GA attuale.
         :return: Array numpy dei figli dopo la mutazione.
         """
-        mutation_indices = np.random.rand(*offspring.shape) < (self.mutation_percent_genes / 100.0)
+        mutation_indices = self.rng.random(offspring.shape) < (self.mutation_percent_genes / 100.0)
+        if self._incremental:
+            before = [self._components_of(solution) for solution in offspring]
         offspring[mutation_indices] = 1 - offspring[mutation_indices]
+
+        # Componenti dei figli mutati: si applicano solo i geni invertiti
+        if self._incremental:
+            for k, solution in enumerate(offspring):
+                self._components[solution.tobytes()] = self._apply_delta(
+                    before[k], solution, np.flatnonzero(mutation_indices[k])
+                )
         return offspring
 
     def _on_generation(self, ga_instance):
         """
-        Callback eseguito alla fine di ogni generazione. Mostra il miglior fitness
-        e controlla la stagnazione, consentendo un'eventuale uscita anticipata.
+        Callback eseguito alla fine di ogni generazione. Registra il miglior fitness (a INFO una
+        generazione ogni config.LOG_SAMPLE_EVERY, a DEBUG tutte) e controlla la stagnazione,
+        consentendo un'eventuale uscita anticipata.
         """
-        best_solution, best_fitness, _ = ga_instance.best_solution()
-        print(f"[INFO] Generazione {ga_instance.generations_completed}: Miglior fitness = {best_fitness}")
+        # La fitness della generazione è già calcolata da PyGAD prima del callback:
+        # best_solution() senza argomenti la ricalcolerebbe per l'intera popolazione
+        best_fitness = np.max(ga_instance.last_generation_fitness)
+        generation = ga_instance.generations_completed
+        logger.log(logging.INFO if generation % config.LOG_SAMPLE_EVERY == 0 else logging.DEBUG,
+                   "Generazione %d: Miglior fitness = %s", generation, best_fitness)
 
         # Salva per il benchmark
         self.generations_completed = ga_instance.generations_completed
 
+        # Conserva solo le componenti degli individui ancora in popolazione (i futuri genitori)
+        if self._incremental:
+            population_keys = {solution.tobytes() for solution in ga_instance.population}
+            self._components = {key: value for key, value in self._components.items() if key in population_keys}
+
         # Verifica se non c'è stato miglioramento rispetto alla generazione precedente
         if self.last_best_fitness is not None and best_fitness <= self.last_best_fitness:
             self.no_improvement_generations += 1
@@ -199,70 +500,153 @@ class RecommendationEngineGA:
             self.last_best_fitness = best_fitness
 
         # Effettua lo stop anticipato se si supera la soglia di stagnazione
-        if self.no_improvement_generations >= self.stagnation_limit:
-            print(f"[INFO] Arresto anticipato: Nessun miglioramento per {self.stagnation_limit} generazioni consecutive.")
+        # (più bassa per un warm start, che parte dai migliori individui della ricerca precedente)
+        stagnation_limit = self.warm_stagnation_limit if self._warm_started else self.stagnation_limit
+        if self.no_improvement_generations >= stagnation_limit:
+            logger.info("Arresto anticipato: Nessun miglioramento per %d generazioni consecutive (generazione %d).",
+                        stagnation_limit, generation)
             return "stop"
 
-    def recommend(self):
-        """
-        Avvia il processo GA e restituisce un DataFrame con i prodotti selezionati (geni=1).
-        Stampa a schermo le metriche di precisione e copertura finali.
+        # Effettua lo stop se il budget di tempo residuo non basta per un'altra generazione
+        # (durata stimata come media delle generazioni già completate)
+        if self._deadline is not None:
+            now = time.perf_counter()
+            mean_generation_time = (now - self._ga_start) / generation
+            if now + mean_generation_time > self._deadline:
+                self.truncated = True
+                logger.warning("Arresto per budget di tempo esaurito dopo %d generazioni: soluzione non a convergenza.", generation)
+                return "stop"
+
+    def _filter_products(self):
         """
-        if self.df_products.empty:
-            print("[WARNING] Nessun prodotto disponibile nel DataFrame.")
-            return pd.DataFrame()
-
-        # Reimposta i parametri di stagnazione per un nuovo run
-        self._reset_stagnation_params()
+        Filtra il catalogo per prezzo e calcola punteggi di affinità e prodotti rilevanti.
+        Ogni run riparte dal catalogo completo, indipendentemente dai run precedenti.
 
-        # Crea una copia del DataFrame originale per il benchmark
-        self.df_all_products = self.df_products.copy()
+        :return: True se ci sono prodotti da valutare, False altrimenti.
+        """
+        if len(self.catalog) == 0:
+            logger.warning("Nessun prodotto disponibile nel DataFrame.")
+            return False
 
         # Filtra i prodotti fuori dal range di prezzo prima del processo GA
+        in_range = np.ones(len(self.catalog), dtype=bool)
         if self.min_price is not None:
-            self.df_products = self.df_products[self.df_products['price'] >= self.min_price]
+            in_range &= self.catalog.prices >= self.min_price
         if self.max_price is not None:
-            self.df_products = self.df_products[self.df_products['price'] <= self.max_price]
+            in_range &= self.catalog.prices <= self.max_price
+
+        # Modalità a shard: esclude gli shard senza tag in comune con l'utente
+        if self.shards is not None:
+            user_tags = (set(self.user_data.get("artists", [])) | set(self.user_data.get("recent_artists", []))
+                         | set(self.user_data.get("genres", [])) | set(self.user_data.get("recent_genres", [])))
+            tag_index = self.catalog.tag_index
+            overlapping = self.shards.overlapping(tag_index[tag] for tag in user_tags if tag in tag_index)
+            in_range &= np.isin(self.shards.shard_of, overlapping)
+            logger.info("Shard con tag in comune con l'utente: %d su %d.", len(overlapping), len(self.shards))
+        self.positions = np.flatnonzero(in_range)
+
+        if len(self.positions) == 0:
+            logger.warning("Nessun prodotto disponibile dopo il filtro sul prezzo.")
+            return False
 
-        if self.df_products.empty:
-            print("[WARNING] Nessun prodotto disponibile dopo il filtro sul prezzo.")
-            return pd.DataFrame()
+        # Identifica gli indici "rilevanti" da coprire in base alla modalità di preferenza
+        logger.debug("Calcola gli indici dei prodotti rilevanti ai gusti dell'utente...")
+        self.product_scores, self.relevant_mask = self._compute_product_scores()
+        in_range_count = len(self.positions)
+        if self.candidate_pruning:
+            self._prune_candidates()
+        self._build_genome(collapse=self.gene_classes)
+        self.relevant_indices = set(np.flatnonzero(self.relevant_mask).tolist())
+        logger.info("Genoma: %d geni per %d prodotti candidati (su %d nel range di prezzo).",
+                    len(self.gene_affinity), len(self.positions), in_range_count)
+
+        log_items(logger, "Tag dei prodotti rilevanti per l'utente", sorted(self.relevant_indices),
+                  fmt=lambda idx: self.catalog.product_tags(self.positions[idx]))
+        return True
+
+    def _prune_candidates(self):
+        """
+        Riduce self.positions (e punteggi e rilevanza allineati) ai prodotti candidati: quelli con
+        affinità non nulla o rilevanti, più un campione casuale opzionale di altri prodotti nel range
+        (self.exploration_sample). Un prodotto senza affinità e non rilevante può solo abbassare
+        la fitness, quindi escluderlo non cambia l'ottimo ma riduce il costo di ogni generazione.
+        """
+        candidates = (self.product_scores != 0) | self.relevant_mask
+        others = np.flatnonzero(~candidates)
+        n_exploration = min(self.exploration_sample, len(others))
+        if n_exploration:
+            candidates[self.rng.choice(others, size=n_exploration, replace=False)] = True
+
+        keep = np.flatnonzero(candidates)
+        self.positions = self.positions[keep]
+        self.product_scores = self.product_scores[keep]
+        self.relevant_mask = self.relevant_mask[keep]
+
+    def _build_genome(self, collapse=True):
+        """
+        Costruisce il genoma del GA sui prodotti in self.positions. Con collapse=True i prodotti con lo
+        stesso insieme di tag (stessa affinità e rilevanza) formano un'unica classe, rappresentata da
+        un solo gene: selezionare il gene seleziona tutti i prodotti della classe. Poiché la fitness
+        è la somma dei contributi dei singoli prodotti, l'ottimo non cambia.
+
+        :param collapse: Se False, un gene per prodotto.
+        """
+        if collapse:
+            self.gene_of_product, n_genes = self.catalog.signature_classes(self.positions)
+        else:
+            self.gene_of_product, n_genes = np.arange(len(self.positions)), len(self.positions)
 
-        # Aggiorna products_tags dopo il filtraggio
-        if self.min_price is not None or self.max_price is not None:
-            self.df_products['tags'] = self.df_products['tags'].apply(lambda x: x.split(',') if isinstance(x, str) else x)
-            self.products_tags = self.df_products["tags"].tolist()
+        counts = np.bincount(self.gene_of_product, minlength=n_genes)
+        gene_scores = np.zeros(n_genes, dtype=np.int64)
+        gene_scores[self.gene_of_product] = self.product_scores
+        gene_is_relevant = np.zeros(n_genes, dtype=bool)
+        gene_is_relevant[self.gene_of_product] = self.relevant_mask
 
-        # Identifica gli indici "rilevanti" da coprire in base alla modalità di preferenza
-        print("[INFO] Calcola gli indici dei prodotti rilevanti ai gusti dell'utente...")
-        user_artists = set(self.user_data.get("artists", [])) | set(self.user_data.get("recent_artists", []))
-        user_genres  = set(self.user_data.get("genres", []))  | set(self.user_data.get("recent_genres", []))
+        self.gene_affinity = gene_scores * counts
+        self.gene_non_match = np.where(gene_scores == 0, counts, 0)
+        self.gene_relevant = np.where(gene_is_relevant, counts, 0)
+        self._incremental = self.incremental_fitness and n_genes >= self.incremental_min_genes
 
-        self.relevant_indices = set()
-        relevant_tags = []  # Lista per memorizzare le tag rilevanti
-        for idx, tags in enumerate(self.products_tags):
-            p_tags = set(tags)
-
-            if self.preference_mode == "artist":
-                if p_tags & user_artists:
-                    self.relevant_indices.add(idx)
-                    relevant_tags.append(tags)
-            elif self.preference_mode == "genre":
-                if p_tags & user_genres:
-                    self.relevant_indices.add(idx)
-                    relevant_tags.append(tags)
-            elif self.preference_mode == "balanced":
-                if (p_tags & user_artists) or (p_tags & user_genres):
-                    self.relevant_indices.add(idx)
-                    relevant_tags.append(tags)
-
-        print("[INFO] Le tag rilevanti trovate per l'utente sono:", relevant_tags)
+    def _select_products(self, time_budget_ms=None):
+        """
+        Filtra il catalogo per prezzo, calcola gli indici rilevanti ed esegue il GA.
+
+        :param time_budget_ms: Budget di tempo del run (None = config.GA_TIME_BUDGET_MS, 0 = nessun limite).
+
+        :return: Array con gli indici (in self.positions, cioè tra i prodotti nel range di prezzo)
+                 dei prodotti selezionati, oppure None se non ci sono prodotti da valutare.
+        """
+        # Reimposta i parametri di stagnazione per un nuovo run e avvia il budget di tempo
+        self._reset_stagnation_params()
+        self._start_time_budget(time_budget_ms)
+
+        if not self._filter_products():
+            return None
+        return self._run_ga()
+
+    def _run_ga(self):
+        """
+        Esegue il GA sui prodotti filtrati da _filter_products.
+
+        :return: Array con gli indici (in self.positions) dei prodotti selezionati.
+        """
+        if len(self.gene_affinity) == 0:
+            logger.info("Nessun prodotto candidato: GA non necessario.")
+            return np.empty(0, dtype=np.int64)
+
+        if self.shards is not None:
+            return self._run_sharded()
 
+        if self.auto_tune:
+            self._tune_parameters()
 
         # Crea la popolazione iniziale
         initial_population = self._generate_initial_population()
+        self._components = {}
 
         # Imposta e avvia l'algoritmo genetico
+        # pygad viene importato solo alla prima ottimizzazione (avvio del server più rapido)
+        import pygad
         ga_instance = pygad.GA(
             num_generations       = self.num_generations,
             num_parents_mating    = self.num_parents_mating,
@@ -270,15 +654,19 @@ class RecommendationEngineGA:
             initial_population    = initial_population,
             crossover_type        = self._crossover_func,
             mutation_type         = self._mutation_func,
+            # Non usato da _mutation_func (che applica self.mutation_percent_genes): esplicito perché PyGAD,
+            # altrimenti, lo ricava dal 10% di default e avvisa sui genomi con meno di 10 geni
+            mutation_num_genes    = 1,
             on_generation         = self._on_generation,
             gene_type             = int,
             parent_selection_type = "sss",  # steady state selection
             keep_elitism          = self.keep_elitism
         )
 
-        print("[INFO] Avvio dell'algoritmo genetico...")
+        logger.debug("Avvio dell'algoritmo genetico...")
+        self._ga_start = time.perf_counter()
         ga_instance.run()
-        print("[INFO] GA terminato.")
+        logger.debug("GA terminato.")
 
         # Recupera la miglior soluzione e la fitness associata
         all_fitness = ga_instance.last_generation_fitness
@@ -286,19 +674,165 @@ class RecommendationEngineGA:
         best_solution = ga_instance.population[best_index]
         best_fitness = all_fitness[best_index]
 
-        print(f"[INFO] Miglior fitness ottenuta: {best_fitness}")
+        logger.info("Miglior fitness ottenuta: %s (%d generazioni)", best_fitness, ga_instance.generations_completed)
+        if self.catalog is not None:
+            self.final_population = self._final_population(ga_instance.population, all_fitness)
+
+        # Riporta i geni selezionati (classi) ai singoli prodotti
+        return np.flatnonzero((best_solution == 1)[self.gene_of_product])
+
+    def _tune_parameters(self):
+        """
+        Dimensiona i parametri del GA sul genoma del run corrente (coefficienti in self.tuning_params):
+        - popolazione proporzionale a log2 della lunghezza del genoma, così i genomi di pochi geni
+          (piccoli range di prezzo) non pagano una popolazione pensata per cataloghi grandi;
+        - mutazione pari in media a un numero fisso di geni per individuo, indipendente dalla lunghezza;
+        - stagnazione proporzionale alle generazioni necessarie perché le mutazioni dell'intera
+          popolazione tocchino ogni gene (geni / popolazione).
+        Popolazione e stagnazione crescono con la frazione di geni senza prodotti rilevanti, nei quali
+        i miglioramenti sono più piccoli e più rari.
+        """
+        params = self.tuning_params
+        n_genes = len(self.gene_affinity)
+        sparsity = 1 + params["sparsity_weight"] * float(np.mean(self.gene_relevant == 0))
+
+        population = params["population_per_log_gene"] * np.log2(n_genes + 1) * sparsity
+        self.sol_per_pop = int(np.clip(round(population), max(params["population_min"], self.keep_elitism + 2),
+                                       params["population_max"]))
+        self.num_parents_mating = max(2, round(params["parents_ratio"] * self.sol_per_pop))
+        self.mutation_percent_genes = float(np.clip(100 * params["mutation_genes"] / n_genes,
+                                                    params["mutation_percent_min"], params["mutation_percent_max"]))
+        stagnation = (params["stagnation_base"] + params["stagnation_scale"] * n_genes / self.sol_per_pop) * sparsity
+        self.stagnation_limit = int(min(round(stagnation), params["stagnation_max"]))
+        self.warm_stagnation_limit = min(config.GA_WARM_STAGNATION_LIMIT, self.stagnation_limit)
+        self.num_generations = int(min(params["generations_per_stagnation"] * self.stagnation_limit,
+                                       params["generations_max"]))
+        logger.info("Auto-tuning: popolazione %d, genitori %d, mutazione %.2f%%, stagnazione %d, generazioni max %d.",
+                    self.sol_per_pop, self.num_parents_mating, self.mutation_percent_genes,
+                    self.stagnation_limit, self.num_generations)
+
+    def _shard_engine(self, genes, seed):
+        """
+        Copia leggera del motore ridotta ai geni di uno shard, senza catalogo (da inviare a un processo).
+        I geni della copia sono numerati da 0: _run_ga restituisce direttamente gli indici in genes.
+
+        :param genes: Indici dei geni (del genoma globale) dello shard.
+        :param seed: Seed del generatore casuale dello shard.
+        """
+        engine = copy.copy(self)
+        engine.catalog = None
+        engine.shards = None
+        engine.df_all_products = None
+        engine.positions = np.arange(len(genes))
+        engine.product_scores = np.zeros(0, dtype=np.int64)
+        engine.relevant_mask = np.zeros(0, dtype=bool)
+        engine.relevant_indices = set()
+        engine.gene_of_product = np.arange(len(genes))
+        engine.gene_affinity = self.gene_affinity[genes]
+        engine.gene_non_match = self.gene_non_match[genes]
+        engine.gene_relevant = self.gene_relevant[genes]
+        engine._incremental = self.incremental_fitness and len(genes) >= self.incremental_min_genes
+        engine._components = {}
+        # Il warm start riproietta la popolazione tramite gli ID del catalogo, assente nella copia:
+        # gli shard partono sempre da una popolazione casuale
+        engine.warm_start = None
+        engine.final_population = None
+        engine.rng = np.random.default_rng(seed)
+        return engine
+
+    def _run_sharded(self):
+        """
+        Ottimizza separatamente il genoma di ogni shard (in parallelo nel pool di processi) e unisce le
+        selezioni. La fitness è una somma di contributi per prodotto, quindi la soluzione unita ha per
+        fitness la somma delle fitness degli shard.
+
+        :return: Array con gli indici (in self.positions) dei prodotti selezionati.
+        """
+        # Shard di ogni gene (prodotti con le stesse tag, cioè dello stesso gene, sono nello stesso shard)
+        gene_shard = np.empty(len(self.gene_affinity), dtype=np.int64)
+        gene_shard[self.gene_of_product] = self.shards.shard_of[self.positions]
+        shard_genes = [np.flatnonzero(gene_shard == shard) for shard in np.unique(gene_shard)]
+        seeds = self.rng.integers(0, 2 ** 32, size=len(shard_genes))
+        engines = [self._shard_engine(genes, int(seed)) for genes, seed in zip(shard_genes, seeds)]
+
+        # Budget residuo, passato in ms perché la scadenza non è confrontabile tra processi
+        budget_ms = 0
+        if self._deadline is not None:
+            budget_ms = max((self._deadline - time.perf_counter()) * 1000.0, 1.0)
+
+        logger.info("Ottimizzazione di %d shard (%d geni)...", len(engines), len(self.gene_affinity))
+        if len(engines) == 1 or config.GA_SHARD_WORKERS == 1:
+            results = [_optimize_shard(engine, budget_ms) for engine in engines]
+        else:
+            results = list(_get_shard_executor().map(_optimize_shard, engines, repeat(budget_ms)))
+
+        selected_genes = np.zeros(len(self.gene_affinity), dtype=bool)
+        for genes, (selected, _, _, _) in zip(shard_genes, results):
+            selected_genes[genes[selected]] = True
+        self.last_best_fitness = sum(result[1] for result in results)
+        self.generations_completed = max(result[2] for result in results)
+        self.truncated = any(result[3] for result in results)
+        logger.info("Shard uniti: miglior fitness complessiva %s.", self.last_best_fitness)
+
+        return np.flatnonzero(selected_genes[self.gene_of_product])
+
+    def recommend_ids(self, time_budget_ms=None):
+        """
+        Avvia il processo GA e restituisce gli ID (indice del catalogo) e i punteggi di affinità
+        dei prodotti selezionati, ordinati per punteggio decrescente, senza costruire DataFrame
+        né calcolare le metriche di valutazione.
+        Dopo la chiamata, self.truncated indica se il run è stato interrotto per budget di tempo
+        e self.generations_completed il numero di generazioni eseguite.
+
+        :param time_budget_ms: Budget di tempo in ms (None = config.GA_TIME_BUDGET_MS, 0 = nessun limite).
+        :return: Tupla (product_ids, scores) di array numpy, eventualmente vuoti.
+        """
+        selected_indices = self._select_products(time_budget_ms)
+        if selected_indices is None or len(selected_indices) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        product_ids = np.asarray(self.catalog.product_ids[self.positions[selected_indices]])
+        scores = self.product_scores[selected_indices]
+        # Ordinamento stabile: a parità di punteggio resta l'ordine del catalogo
+        order = np.argsort(-scores, kind="stable")
+        return product_ids[order], scores[order]
+
+    def recommend(self, time_budget_ms=None):
+        """
+        Avvia il processo GA e restituisce un DataFrame con i prodotti selezionati (geni=1).
+        Registra nel log (INFO) le metriche di precisione e copertura finali.
+        Se il budget di tempo si esaurisce, restituisce la miglior soluzione trovata fino a quel momento
+        (self.truncated = True; self.generations_completed riporta le generazioni eseguite).
+
+        :param time_budget_ms: Budget di tempo in ms (None = config.GA_TIME_BUDGET_MS, 0 = nessun limite).
+        """
+        selected_indices = self._select_products(time_budget_ms)
+        if selected_indices is None:
+            return pd.DataFrame()
+        return self._build_recommendations(selected_indices)
+
+    def _build_recommendations(self, selected_indices):
+        """
+        Costruisce il DataFrame dei prodotti selezionati dal GA e ne valuta precisione e copertura.
+
+        :param selected_indices: Indici (in self.positions) dei prodotti selezionati.
+        """
+        # Costruisce il DataFrame dei soli prodotti selezionati
+        recommended_df = self.catalog.to_dataframe(self.positions[selected_indices])
 
-        # Costruisce il DataFrame dei prodotti selezionati
-        selected_indices = np.where(best_solution == 1)[0]
-        recommended_df = self.df_products.iloc[selected_indices].copy()
+        # Per la valutazione bastano i prodotti con almeno una tag in comune con l'utente
+        # (anche fuori prezzo): gli altri non possono essere rilevanti in nessuna modalità
+        user_tags = (set(self.user_data.get("artists", [])) | set(self.user_data.get("recent_artists", []))
+                     | set(self.user_data.get("genres", [])) | set(self.user_data.get("recent_genres", [])))
+        self.df_all_products = self.catalog.to_dataframe(np.flatnonzero(self.catalog.tag_mask(user_tags)))
 
-        # Mostra i prodotti raccomandati
+        # Mostra i prodotti raccomandati (riassunti a INFO, tutti a DEBUG)
         if not recommended_df.empty:
-            print("[INFO] Prodotti suggeriti:")
-            for _, row in recommended_df.iterrows():
-                print(f" - {row['name']} ({row['price']} €)\n   Tags: {row['tags']}")
+            names, prices, tags = recommended_df["name"].values, recommended_df["price"].values, recommended_df["tags"].values
+            log_items(logger, "Prodotti suggeriti", range(len(recommended_df)),
+                      fmt=lambda i: f"{names[i]} ({prices[i]} €)\n    Tags: {tags[i]}")
         else:
-            print("[INFO] Nessun prodotto selezionato dal GA.")
+            logger.info("Nessun prodotto selezionato dal GA.")
 
         # Valuta la precisione e la copertura finale
         precision_cov_metrics = evaluate_recommendations(
@@ -317,34 +851,26 @@ class RecommendationEngineGA:
         artist_mismatched = precision_cov_metrics["artist_mismatched"]
         genre_mismatched = precision_cov_metrics["genre_mismatched"]
 
-        print(f"[INFO] Precisione: {precision_value:.2f}%")
-        print(f"[INFO] Copertura: {coverage_value:.2f}%")
+        logger.info("Precisione: %.2f%%, Copertura: %.2f%%", precision_value, coverage_value)
 
         # Elenca i prodotti mancanti se la copertura non è completa
         if coverage_value < 100.0:
             in_range_set = set(missing_relevant) - set(missing_relevant_out_of_price)
             if in_range_set:
-                print("\n[INFO] Prodotti pertinenti ai gusti dell'utente ma non raccomandati:")
-                for prod in in_range_set:
-                    print("  -", prod)
+                log_items(logger, "Prodotti pertinenti ai gusti dell'utente ma non raccomandati", sorted(in_range_set))
 
         # Elenca i prodotti mancanti fuori prezzo
         if missing_relevant_out_of_price:
-            print("\n[INFO] [RANGE PRICE MODE] Prodotti pertinenti ai gusti dell'utente ma non raccomandati perché fuori prezzo:")
-            for prod in missing_relevant_out_of_price:
-                print("  -", prod)
+            log_items(logger, "[RANGE PRICE MODE] Prodotti pertinenti ai gusti dell'utente ma non raccomandati perché fuori prezzo",
+                      missing_relevant_out_of_price)
 
         # Elenca prodotti mancanti in base alla modalità di preferenza
         if self.preference_mode == "artist" and genre_mismatched:
-            print(
-                "\n[INFO] [ARTIST MODE] Prodotti pertinenti ai gusti dell'utente ma non raccomandati perché di genere:")
-            for prod in genre_mismatched:
-                print("  -", prod)
+            log_items(logger, "[ARTIST MODE] Prodotti pertinenti ai gusti dell'utente ma non raccomandati perché di genere",
+                      genre_mismatched)
 
         if self.preference_mode == "genre" and artist_mismatched:
-            print(
-                "\n[INFO] [GENRE MODE] Prodotti pertinenti ai gusti dell'utente ma non raccomandati perché di artisti:")
-            for prod in artist_mismatched:
-                print("  -", prod)
+            log_items(logger, "[GENRE MODE] Prodotti pertinenti ai gusti dell'utente ma non raccomandati perché di artisti",
+                      artist_mismatched)
 
         return recommended_df
\ No newline at end of file
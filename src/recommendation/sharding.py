@@ -0,0 +1,94 @@
+import heapq
+
+import numpy as np
+
+from src.preprocessing.product_preprocessor import clean_special_characters
+
+
+def genre_family(tag, genres):
+    """
+    Famiglia di una tag: il genere più corto del dizionario con cui la tag termina
+    (ad es. "black_metal" -> "metal", "indie_rock" -> "rock"), oppure None se la tag non è un genere.
+
+    :param tag: Tag normalizzata (minuscola, con underscore).
+    :param genres: Set dei generi normalizzati come le tag.
+    """
+    tokens = tag.split("_")
+    for i in range(len(tokens) - 1, -1, -1):
+        suffix = "_".join(tokens[i:])
+        if suffix in genres:
+            return suffix
+    return None
+
+
+class CatalogShards:
+    """
+    Partizione del catalogo in shard per famiglia di tag, calcolata una volta alla costruzione del motore.
+    Ogni prodotto appartiene alla famiglia della sua prima tag di genere (o, se non ne ha, della sua
+    prima tag, cioè dell'artista), con le tag ordinate per ID come nella firma delle classi di geni
+    (ProductCatalog.signature_classes); le famiglie sono distribuite sugli shard bilanciando il numero
+    di prodotti. Prodotti con le stesse tag (quindi della stessa classe) finiscono sempre nello stesso shard.
+
+    Struttura (n prodotti, S shard, T tag distinte):
+    - shard_of [n]: shard di ogni prodotto (-1 per i prodotti senza tag, che non possono essere rilevanti).
+    - shard_tags [S, T]: maschera delle tag presenti in ogni shard.
+    """
+
+    def __init__(self, shard_of, shard_tags):
+        self.shard_of = shard_of
+        self.shard_tags = shard_tags
+
+    @classmethod
+    def from_catalog(cls, catalog, genres, n_shards):
+        """
+        :param catalog: ProductCatalog da partizionare.
+        :param genres: Generi del dizionario (come in genres.txt) che definiscono le famiglie.
+        :param n_shards: Numero massimo di shard.
+        """
+        genres = set(clean_special_characters(genre.replace(" ", "_") for genre in genres))
+        tag_names = catalog.tag_names
+        tag_families = [genre_family(tag, genres) for tag in tag_names]
+
+        # Famiglia di ogni prodotto
+        families = {}
+        product_family = np.full(len(catalog), -1, dtype=np.int64)
+        for pos in range(len(catalog)):
+            # Ordine delle tag per ID: quello memorizzato deriva da un set e può variare tra prodotti
+            tags = np.sort(catalog.tag_indices[catalog.tag_indptr[pos]:catalog.tag_indptr[pos + 1]])
+            if len(tags) == 0:
+                continue
+            family = next((tag_families[t] for t in tags if tag_families[t] is not None), tag_names[tags[0]])
+            product_family[pos] = families.setdefault(family, len(families))
+
+        # Assegna le famiglie (dalla più numerosa) allo shard con meno prodotti
+        counts = np.bincount(product_family[product_family >= 0], minlength=len(families))
+        n_shards = max(1, min(n_shards, len(families)))
+        heap = [(0, shard) for shard in range(n_shards)]
+        family_shard = np.zeros(len(families), dtype=np.int64)
+        for family in np.argsort(-counts, kind="stable"):
+            size, shard = heapq.heappop(heap)
+            family_shard[family] = shard
+            heapq.heappush(heap, (size + int(counts[family]), shard))
+
+        shard_of = np.where(product_family >= 0, family_shard[np.maximum(product_family, 0)], -1)
+
+        # Tag presenti in ogni shard (per saltare gli shard senza sovrapposizione con l'utente)
+        shard_tags = np.zeros((n_shards, len(tag_names)), dtype=bool)
+        product_of_entry = np.repeat(np.arange(len(catalog)), np.diff(catalog.tag_indptr))
+        shard_tags[shard_of[product_of_entry], catalog.tag_indices] = True
+        return cls(shard_of, shard_tags)
+
+    def __len__(self):
+        return len(self.shard_tags)
+
+    def overlapping(self, tag_ids):
+        """
+        Shard che contengono almeno una delle tag indicate.
+
+        :param tag_ids: ID delle tag (nel vocabolario del catalogo).
+        :return: Array con gli indici degli shard.
+        """
+        tag_ids = np.asarray(list(tag_ids), dtype=np.int64)
+        if len(tag_ids) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self.shard_tags[:, tag_ids].any(axis=1))
@@ -1,12 +1,193 @@
 import pandas as pd
-import matplotlib.pyplot as plt
+import numpy as np
 from src.recommendation.recommendation_engine_ga import RecommendationEngineGA
 from src.recommendation.evaluate_ga import evaluate_recommendations
 import config
+import contextlib
 import time
 import os
+from concurrent.futures import ProcessPoolExecutor
+from src.preprocessing.product_preprocessor import preprocess_products
+from tests.memory_profile import PhaseProfiler, PHASES, MEMORY_METRICS, write_allocation_report
+
+try:
+    from scipy import stats
+except ImportError:  # scipy è opzionale: in sua assenza l'intervallo di confidenza usa l'approssimazione normale
+    stats = None
+
+# Metriche aggregate per combinazione (media, deviazione standard e intervallo di confidenza al 95%)
+METRICS = ["Precision", "Coverage", "Best Fitness", "Generations", "Duration (s)"]
+
+# Stato dei processi worker, inizializzato una volta per processo da _init_worker
+_worker_df_products = None
+_worker_memory = False
+_worker_top_allocations = 0
+
+
+def _init_worker(df_products, memory=False, top_allocations=0):
+    global _worker_df_products, _worker_memory, _worker_top_allocations
+    _worker_df_products = df_products
+    _worker_memory = memory
+    _worker_top_allocations = top_allocations
+
+
+def _run_task(task):
+    """
+    Esegue una singola combinazione (profilo, range di prezzo, modalità, ripetizione) con il proprio seed.
+    I log del GA seguono config.BENCHMARK_LOG_PROFILE (silenzioso): con più processi si mescolerebbero.
+    Con il profilo di memoria attivo misura separatamente le fasi del run (costruzione del motore,
+    filtro per prezzo, GA, valutazione); tracemalloc rallenta l'esecuzione, quindi in quel caso
+    le durate sono confrontabili solo con altri run profilati.
+    """
+    profile_name, user_data, min_price, max_price, mode, repetition, seed = task
+
+    profiler = PhaseProfiler(top_n=_worker_top_allocations) if _worker_memory else None
+
+    def phase(name):
+        return profiler.phase(name) if profiler is not None else contextlib.nullcontext()
+
+    if profiler is not None:
+        profiler.start()
+
+    # Motore con generatore casuale dedicato al task
+    with phase("Engine Construction"):
+        engine = RecommendationEngineGA(
+            df_products=_worker_df_products,
+            user_data=user_data,
+            min_price=min_price,
+            max_price=max_price,
+            preference_mode=mode,
+            seed=seed
+        )
+
+    # Misura il tempo di esecuzione (stesse fasi di engine.recommend())
+    start_time = time.perf_counter()
+    engine._reset_stagnation_params()
+    engine._start_time_budget(None)
+    with phase("Price Filtering"):
+        has_products = engine._filter_products()
+    with phase("GA Run"):
+        selected_indices = engine._run_ga() if has_products else None
+
+    with phase("Evaluation"):
+        if selected_indices is not None:
+            recommended_products = engine._build_recommendations(selected_indices)
+        else:
+            recommended_products = pd.DataFrame()
+
+        # Valutazione con evaluate_ga
+        metrics = evaluate_recommendations(
+            recommended_products=recommended_products,
+            df_all_products=_worker_df_products,  # Usare tutti i prodotti originali
+            user_data=user_data,
+            min_price=min_price,
+            max_price=max_price,
+            preference_mode=mode,
+        )
+    duration = time.perf_counter() - start_time
+
+    if profiler is not None:
+        profiler.stop()
+
+    result = {
+        "Profile": profile_name,
+        "Price Range": f"({min_price}, {max_price})",
+        "Mode": mode,
+        "Repetition": repetition,
+        "Seed": seed,
+        "Precision": metrics["precision"],
+        "Coverage": metrics["coverage"],
+        "Missing Relevant": len(metrics["missing_relevant"]),
+        "Missing Relevant bcs Out of Price": len(metrics["missing_relevant_out_of_price"]),
+        "Genre Mismatched": len(metrics["genre_mismatched"]),
+        "Artist Mismatched": len(metrics["artist_mismatched"]),
+        "Best Fitness": engine.last_best_fitness,
+        "Generations": engine.generations_completed,
+        "Truncated": engine.truncated,
+        "Duration (s)": duration,
+    }
+    if profiler is not None:
+        result.update(profiler.as_columns())
+    return result, (profiler.top_allocations if profiler is not None else None)
+
+
+def _confidence_interval(values, confidence=0.95):
+    """
+    Semiampiezza dell'intervallo di confidenza della media (t di Student, o normale senza scipy).
+    """
+    n = len(values)
+    if n < 2:
+        return 0.0
+    std_err = np.std(values, ddof=1) / np.sqrt(n)
+    quantile = stats.t.ppf((1 + confidence) / 2, n - 1) if stats is not None else 1.96
+    return float(quantile * std_err)
+
+
+def _aggregate(runs_df):
+    """
+    Aggrega le ripetizioni di ogni combinazione: per ogni metrica la media (stesso nome di colonna),
+    la deviazione standard ("<metrica> Std") e la semiampiezza dell'IC al 95% ("<metrica> CI95").
+    """
+    keys = ["Profile", "Price Range", "Mode"]
+    rows = []
+    for key_values, group in runs_df.groupby(keys, sort=False):
+        row = dict(zip(keys, key_values))
+        row["Repetitions"] = len(group)
+        for column in runs_df.columns:
+            if column in keys or column in ("Repetition", "Seed"):
+                continue
+            values = group[column].astype(float).to_numpy()
+            row[column] = values.mean()
+            if column in METRICS or column.endswith(tuple(MEMORY_METRICS)):
+                row[f"{column} Std"] = values.std(ddof=1) if len(values) > 1 else 0.0
+                row[f"{column} CI95"] = _confidence_interval(values)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def run_benchmark_tests(df_products=None, repetitions=None, workers=None, seed=None, memory=None, top_allocations=None):
+    """
+    Esegue la matrice di benchmark (3 profili x 3 range di prezzo x 3 modalità) con più ripetizioni,
+    distribuendo i run su un pool di processi. Ogni run ha un seed proprio, derivato dal seed base,
+    quindi i risultati sono riproducibili e indipendenti dall'ordine di esecuzione.
+
+    Con il profilo di memoria attivo registra, per ogni fase, picco di RSS, picco tracemalloc e
+    allocazioni (test_results.csv) e genera i grafici di memoria per profilo.
+
+    :param df_products: DataFrame dei prodotti preprocessati (None = preprocessing di config.DATASET_PATH,
+                        misurato come fase "Preprocessing").
+    :param repetitions: Ripetizioni per combinazione (default: config.BENCHMARK_REPETITIONS).
+    :param workers: Numero di processi (default: config.BENCHMARK_WORKERS, None = numero di core).
+    :param seed: Seed base (default: config.BENCHMARK_SEED).
+    :param memory: Attiva il profilo di memoria per fase (default: config.BENCHMARK_MEMORY_PROFILE).
+    :param top_allocations: Siti di allocazione per fase nel report allocation_report.txt
+                            (default: config.BENCHMARK_TOP_ALLOCATIONS, 0 = nessun report).
+    """
+    # Log silenziosi (config.BENCHMARK_LOG_PROFILE), anche nei processi figli
+    config.set_log_profile(config.BENCHMARK_LOG_PROFILE)
+    repetitions = repetitions or config.BENCHMARK_REPETITIONS
+    workers = workers or config.BENCHMARK_WORKERS or os.cpu_count()
+    seed = config.BENCHMARK_SEED if seed is None else seed
+    memory = config.BENCHMARK_MEMORY_PROFILE if memory is None else memory
+    top_allocations = config.BENCHMARK_TOP_ALLOCATIONS if top_allocations is None else top_allocations
+    top_allocations = top_allocations if memory else 0
+
+    # Il preprocessing è eseguito (e misurato) una sola volta: le sue colonne valgono per tutti i run
+    preprocessing_columns = {}
+    preprocessing_allocations = {}
+    if df_products is None:
+        print("[INFO] Caricamento e preprocessing data per i tests...")
+        profiler = PhaseProfiler(top_n=top_allocations) if memory else None
+        if profiler is not None:
+            profiler.start()
+            with profiler.phase("Preprocessing"):
+                df_products = preprocess_products(config.DATASET_PATH)
+            profiler.stop()
+            preprocessing_columns = profiler.as_columns()
+            preprocessing_allocations = profiler.top_allocations
+        else:
+            df_products = preprocess_products(config.DATASET_PATH)
 
-def run_benchmark_tests(df_products):
     # Profili utente
     profiles = {
         "Metal/Rock": config.PROFILE_1,
@@ -18,52 +199,37 @@ def run_benchmark_tests(df_products):
     price_ranges = [(22, 37), (12, 51), (None, None)]
     search_modes = ["artist", "genre", "balanced"]
 
-    results = []  # Risultati finali
+    combinations = [
+        (profile_name, user_data, min_price, max_price, mode)
+        for profile_name, user_data in profiles.items()
+        for min_price, max_price in price_ranges
+        for mode in search_modes
+    ]
+    # Un seed indipendente per ogni task (SeedSequence garantisce flussi casuali non correlati)
+    task_seeds = np.random.SeedSequence(seed).generate_state(len(combinations) * repetitions)
+    tasks = [
+        combination + (repetition, int(task_seeds[i * repetitions + repetition]))
+        for i, combination in enumerate(combinations)
+        for repetition in range(repetitions)
+    ]
 
-    for profile_name, user_data in profiles.items():
-        for min_price, max_price in price_ranges:
-            for mode in search_modes:
-                print(f"\nEseguendo test: Profilo={profile_name}, Range=({min_price}, {max_price}), Modalità={mode}")
+    print(f"[INFO] Benchmark: {len(combinations)} combinazioni x {repetitions} ripetizioni su {workers} processi (seed {seed}).")
+    start_time = time.perf_counter()
+    runs = []
+    allocations = [preprocessing_allocations] if preprocessing_allocations else []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(df_products, memory, top_allocations)) as executor:
+        for result, top in executor.map(_run_task, tasks):
+            result.update(preprocessing_columns)
+            runs.append(result)
+            if top:
+                allocations.append(top)
+            if result["Repetition"] == repetitions - 1:
+                print(f"Completato: Profilo={result['Profile']}, Range={result['Price Range']}, Modalità={result['Mode']}")
+    print(f"[INFO] Benchmark completato in {time.perf_counter() - start_time:.1f} s.")
 
-                # Inizializza il motore di raccomandazione
-                engine = RecommendationEngineGA(
-                    df_products=df_products,
-                    user_data=user_data,
-                    min_price=min_price,
-                    max_price=max_price,
-                    preference_mode=mode,
-                )
-
-                # Misura il tempo di esecuzione
-                start_time = time.time()
-                recommended_products = engine.recommend()
-                duration = time.time() - start_time
-
-                # Valutazione con evaluate_ga
-                metrics = evaluate_recommendations(
-                    recommended_products=recommended_products,
-                    df_all_products=df_products,  # Usare tutti i prodotti originali
-                    user_data=user_data,
-                    min_price=min_price,
-                    max_price=max_price,
-                    preference_mode=mode,
-                )
-
-                # Salva i risultati
-                results.append({
-                    "Profile": profile_name,
-                    "Price Range": f"({min_price}, {max_price})",
-                    "Mode": mode,
-                    "Precision": metrics["precision"],
-                    "Coverage": metrics["coverage"],
-                    "Missing Relevant": len(metrics["missing_relevant"]),
-                    "Missing Relevant bcs Out of Price": len(metrics["missing_relevant_out_of_price"]),
-                    "Genre Mismatched": len(metrics["genre_mismatched"]),
-                    "Artist Mismatched": len(metrics["artist_mismatched"]),
-                    "Best Fitness": engine.last_best_fitness,
-                    "Generations": engine.generations_completed,
-                    "Duration (s)": duration,
-                })
+    runs_df = pd.DataFrame(runs)
+    results = _aggregate(runs_df)
 
     # Creazione del DataFrame e salvataggio in CSV
     results_df = pd.DataFrame(results)
@@ -72,6 +238,15 @@ def run_benchmark_tests(df_products):
     os.makedirs(results_dir, exist_ok=True)
     results_csv_path = os.path.join(results_dir, "test_results.csv")
     results_df.to_csv(results_csv_path, index=False)
+    # Singoli run (con il seed di ognuno, per riprodurli)
+    runs_df.to_csv(os.path.join(results_dir, "test_results_runs.csv"), index=False)
+    if allocations:
+        report_path = os.path.join(results_dir, "allocation_report.txt")
+        write_allocation_report(allocations, report_path, top_allocations)
+        print(f"[INFO] Report dei siti di allocazione salvato in {report_path}")
+
+    # matplotlib viene caricato solo qui, al momento di generare i grafici
+    import matplotlib.pyplot as plt
 
     # Genera grafici di Precisione e Copertura per ciascun profilo
     for i, profile in enumerate(["Metal/Rock", "Hip-Hop/Trap", "Pop/Electronic"], start=1):
@@ -90,6 +265,8 @@ def run_benchmark_tests(df_products):
             precision_values,
             bar_width,
             label="Precisione",
+            yerr=profile_df["Precision CI95"],  # Intervallo di confidenza al 95%
+            capsize=3,
             color="blue"
         )
 
@@ -99,6 +276,8 @@ def run_benchmark_tests(df_products):
             coverage_values,
             bar_width,
             label="Copertura",
+            yerr=profile_df["Coverage CI95"],  # Intervallo di confidenza al 95%
+            capsize=3,
             color="orange"
         )
 
@@ -135,6 +314,8 @@ def run_benchmark_tests(df_products):
             fitness_values,
             bar_width,
             label="Max Fitness",
+            yerr=profile_df["Best Fitness CI95"],  # Intervallo di confidenza al 95%
+            capsize=3,
             color="blue"
         )
 
@@ -144,6 +325,8 @@ def run_benchmark_tests(df_products):
             generation_values,
             bar_width,
             label="Generazioni",
+            yerr=profile_df["Generations CI95"],  # Intervallo di confidenza al 95%
+            capsize=3,
             color="orange"
         )
 
@@ -153,6 +336,8 @@ def run_benchmark_tests(df_products):
             duration_values,
             bar_width,
             label="Durata (s)",
+            yerr=profile_df["Duration (s) CI95"],  # Intervallo di confidenza al 95%
+            capsize=3,
             color="green"
         )
 
@@ -199,4 +384,42 @@ def run_benchmark_tests(df_products):
 
         plt.savefig(os.path.join(results_dir, f"Profile{i}_ga_performance.png"))
 
+    # Genera grafici di memoria per fase per ciascun profilo
+    if memory:
+        phases = [phase for phase in PHASES if f"{phase} Peak RSS (MB)" in results_df.columns]
+        for i, profile in enumerate(["Metal/Rock", "Hip-Hop/Trap", "Pop/Electronic"], start=1):
+            profile_df = results_df[results_df["Profile"] == profile]
+
+            fig, axes = plt.subplots(2, 1, figsize=(12, 10))
+            x = np.arange(len(profile_df))  # Indici x
+            bar_width = 0.8 / len(phases)
+
+            for ax, metric, title in zip(
+                axes,
+                MEMORY_METRICS,
+                ["Picco RSS per fase (MB)", "Picco memoria Python per fase (tracemalloc, MB)"]
+            ):
+                for j, phase in enumerate(phases):
+                    column = f"{phase} {metric}"
+                    ax.bar(
+                        x + (j - (len(phases) - 1) / 2) * bar_width,
+                        profile_df[column],
+                        bar_width,
+                        label=phase,
+                        yerr=profile_df[f"{column} CI95"],  # Intervallo di confidenza al 95%
+                        capsize=2
+                    )
+                ax.set_xticks(x)
+                ax.set_xticklabels(
+                    [f"{mode}\n{price}" for mode, price in zip(profile_df["Mode"], profile_df["Price Range"])],
+                    rotation=45, ha="right"
+                )
+                ax.set_title(f"{title} - Profilo {i}: {profile}")
+                ax.set_ylabel("MB")
+                ax.legend()
+            plt.tight_layout()
+
+            plt.savefig(os.path.join(results_dir, f"Profile{i}_memory.png"))
+            plt.close(fig)
+
     print(f"Test completati. Grafici e risultati in CSV generati e salvati correttamente in {results_dir}.")
@@ -0,0 +1,222 @@
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import config
+from src.preprocessing.product_preprocessor import preprocess_products
+from src.recommendation.recommendation_engine_ga import RecommendationEngineGA, load_tuning_params
+from tests.synthetic_data import load_terms, generate_catalog, generate_profile, write_dictionaries, PROFILE_BREADTHS
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Matrice di benchmark (come tests/benchmark_tests.py) sul catalogo demo, più cataloghi sintetici più grandi
+DEMO_PROFILES = {"Metal/Rock": config.PROFILE_1, "Hip-Hop/Trap": config.PROFILE_2, "Pop/Electronic": config.PROFILE_3}
+DEMO_PRICE_RANGES = [(22, 37), (12, 51), (None, None)]
+SEARCH_MODES = ["artist", "genre", "balanced"]
+DEFAULT_SIZES = [3000]
+
+# Intervalli di ricerca dei coefficienti di config.GA_AUTO_TUNE_PARAMS (gli altri restano fissi)
+SEARCH_SPACE = {
+    "population_per_log_gene": (4.0, 20.0),
+    "parents_ratio": (0.2, 0.5),
+    "mutation_genes": (0.5, 3.0),
+    "stagnation_base": (3, 20),
+    "stagnation_scale": (1.0, 10.0),
+    "sparsity_weight": (0.0, 2.0),
+}
+
+# Motori dei cataloghi, costruiti una volta per processo da _init_worker
+_worker_engines = None
+
+
+def _init_worker(catalogs):
+    global _worker_engines
+    _worker_engines = {name: RecommendationEngineGA(df_products=df) for name, df in catalogs.items()}
+
+
+def _optimum(run):
+    """
+    Fitness della selezione vuota e fitness ottima del genoma di un run. La fitness è una somma di
+    contributi per gene, quindi l'ottimo seleziona esattamente i geni con contributo positivo.
+    """
+    missing_all = run.penalty_missing_relevant * int(run.gene_relevant.sum())
+    gain = run.gene_affinity - run.penalty_weight_non_match * run.gene_non_match \
+        + run.penalty_missing_relevant * run.gene_relevant
+    return -missing_all, int(np.maximum(gain, 0).sum()) - missing_all
+
+
+def _evaluate(task):
+    """
+    Valuta una configurazione su tutti i casi della matrice (senza limite di tempo: il run termina
+    per stagnazione). La qualità di un run è la sua fitness rispetto all'ottimo esatto, normalizzata
+    tra selezione vuota (0) e ottimo (1).
+
+    :param task: Tupla (coefficienti, None = parametri fissi di config.py), casi, seed.
+    :return: Dizionario con qualità media, minima, durata media e generazioni medie.
+    """
+    params, cases, seeds = task
+    qualities, durations, generations = [], [], []
+    for catalog, user_data, min_price, max_price, mode in cases:
+        for seed in seeds:
+            run = _worker_engines[catalog].for_request(user_data=user_data, min_price=min_price, max_price=max_price,
+                                                       preference_mode=mode, seed=int(seed))
+            run.auto_tune = params is not None
+            if params is not None:
+                run.tuning_params = dict(config.GA_AUTO_TUNE_PARAMS, **params)
+            start = time.perf_counter()
+            run.recommend_ids(time_budget_ms=0)
+            durations.append((time.perf_counter() - start) * 1000)
+            if len(run.gene_affinity) == 0:
+                continue  # Nessun GA (nessun candidato): la qualità non dipende dalla configurazione
+            empty, optimum = _optimum(run)
+            qualities.append(1.0 if optimum == empty else (run.last_best_fitness - empty) / (optimum - empty))
+            generations.append(run.generations_completed)
+    quality = float(np.mean(qualities))
+    ms = float(np.mean(durations))
+    return {
+        "params": params,
+        "quality": round(quality, 5),
+        "min_quality": round(float(np.min(qualities)), 5),
+        "ms": round(ms, 3),
+        "generations": round(float(np.mean(generations)), 2),
+        "quality_per_ms": round(quality / ms, 6),
+    }
+
+
+def _sample_params(rng):
+    params = {}
+    for name, (low, high) in SEARCH_SPACE.items():
+        if isinstance(low, int):
+            params[name] = int(rng.integers(low, high + 1))
+        else:
+            params[name] = round(float(rng.uniform(low, high)), 3)
+    return params
+
+
+def _build_catalogs(sizes, seed):
+    """
+    Catalogo demo (config.DATASET_PATH) e cataloghi sintetici preprocessati, con i casi della matrice.
+
+    :return: Tupla (catalogo -> DataFrame preprocessato, lista dei casi).
+    """
+    catalogs = {"demo": preprocess_products(config.DATASET_PATH)}
+    cases = [("demo", user_data, min_price, max_price, mode)
+             for user_data in DEMO_PROFILES.values()
+             for min_price, max_price in DEMO_PRICE_RANGES
+             for mode in SEARCH_MODES]
+
+    artists, genres = load_terms()
+    for n_products in sizes:
+        name = f"synthetic-{n_products}"
+        with tempfile.TemporaryDirectory(prefix="brandify-tuning-") as tmp_dir:
+            csv_path = os.path.join(tmp_dir, "products.csv")
+            generate_catalog(n_products, artists, genres, seed=seed).to_csv(csv_path, index=False)
+            artists_file, genres_file = write_dictionaries(tmp_dir, artists, genres)
+            catalogs[name] = preprocess_products(csv_path, artists_file=artists_file, genres_file=genres_file)
+        cases += [(name, generate_profile(artists, genres, breadth=breadth, seed=seed + i), None, None, mode)
+                  for i, breadth in enumerate(PROFILE_BREADTHS)
+                  for mode in SEARCH_MODES]
+    return catalogs, cases
+
+
+def run_ga_tuning(sizes=None, trials=None, repetitions=2, workers=None, seed=None, min_quality=None,
+                  output=None, output_dir=RESULTS_DIR):
+    """
+    Ricerca offline dei coefficienti dell'auto-tuning del GA (config.GA_AUTO_TUNE_PARAMS) sulla matrice
+    di benchmark: catalogo demo (profili x range di prezzo x modalità) e cataloghi sintetici (ampiezze
+    di profilo x modalità). Valuta i coefficienti correnti e `trials` configurazioni casuali di
+    SEARCH_SPACE e sceglie, tra quelle con qualità media almeno `min_quality`, quella con la miglior
+    qualità per millisecondo. Scrive il profilo scelto in `output` (letto dal motore all'avvio) e
+    tutte le configurazioni valutate, insieme ai parametri fissi di config.py, in ga_tuning.json.
+
+    :param sizes: Numero di prodotti dei cataloghi sintetici.
+    :param trials: Configurazioni casuali da valutare (default: config.GA_TUNING_TRIALS).
+    :param repetitions: Seed per caso.
+    :param workers: Processi paralleli (default: config.BENCHMARK_WORKERS, None = numero di core).
+    :param seed: Seed di cataloghi, profili e ricerca (default: config.BENCHMARK_SEED).
+    :param min_quality: Qualità media minima (default: config.GA_TUNING_MIN_QUALITY).
+    :param output: Percorso del profilo (default: config.GA_TUNED_PROFILE).
+    :return: Dizionario del profilo scritto.
+    """
+    # Log silenziosi (config.BENCHMARK_LOG_PROFILE), anche nei processi figli
+    config.set_log_profile(config.BENCHMARK_LOG_PROFILE)
+    sizes = DEFAULT_SIZES if sizes is None else sizes
+    trials = config.GA_TUNING_TRIALS if trials is None else trials
+    workers = workers or config.BENCHMARK_WORKERS or os.cpu_count()
+    seed = config.BENCHMARK_SEED if seed is None else seed
+    min_quality = config.GA_TUNING_MIN_QUALITY if min_quality is None else min_quality
+    output = output or config.GA_TUNED_PROFILE
+
+    print("[INFO] Preprocessing dei cataloghi della matrice...")
+    catalogs, cases = _build_catalogs(sizes, seed)
+    rng = np.random.default_rng(seed)
+    run_seeds = np.random.SeedSequence(seed).generate_state(repetitions)
+
+    current = load_tuning_params()
+    candidates = [None, {name: current[name] for name in SEARCH_SPACE}]
+    candidates += [_sample_params(rng) for _ in range(trials)]
+    tasks = [(params, cases, run_seeds) for params in candidates]
+
+    print(f"[INFO] Tuning: {len(candidates)} configurazioni x {len(cases)} casi x {repetitions} seed su {workers} processi.")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(catalogs,)) as executor:
+        evaluations = list(executor.map(_evaluate, tasks))
+    print(f"[INFO] Tuning completato in {time.perf_counter() - start:.1f} s.")
+
+    fixed, current_eval, searched = evaluations[0], evaluations[1], evaluations[1:]
+    eligible = [e for e in searched if e["quality"] >= min_quality]
+    if eligible:
+        best = max(eligible, key=lambda e: e["quality_per_ms"])
+    else:
+        print(f"[AVVISO] Nessuna configurazione raggiunge la qualità {min_quality}: scelta quella di qualità massima.")
+        best = max(searched, key=lambda e: e["quality"])
+
+    for label, e in (("Parametri fissi", fixed), ("Coefficienti correnti", current_eval), ("Profilo scelto", best)):
+        print(f"  - {label}: qualità {e['quality']:.4f} (min {e['min_quality']:.4f}), {e['ms']:.2f} ms, "
+              f"{e['generations']:.1f} generazioni")
+
+    profile = {
+        "params": best["params"],
+        "metadata": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "sizes": sizes,
+            "cases": len(cases),
+            "repetitions": repetitions,
+            "min_quality": min_quality,
+            "quality": best["quality"],
+            "ms": best["ms"],
+            "fixed_params": {"quality": fixed["quality"], "ms": fixed["ms"]},
+        },
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "ga_tuning.json"), "w", encoding="utf-8") as f:
+        json.dump({"fixed": fixed, "evaluations": searched}, f, indent=2)
+    print(f"[INFO] Profilo di auto-tuning salvato in {output}")
+    return profile
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ricerca offline dei coefficienti dell'auto-tuning del GA.")
+    parser.add_argument("--sizes", type=int, nargs="*", default=DEFAULT_SIZES,
+                        help="Numero di prodotti dei cataloghi sintetici (nessuno = solo catalogo demo)")
+    parser.add_argument("--trials", type=int, help="Configurazioni casuali da valutare")
+    parser.add_argument("--repetitions", type=int, default=2, help="Seed per caso")
+    parser.add_argument("--workers", type=int, help="Processi paralleli")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--min-quality", type=float, help="Qualità media minima (fitness rispetto all'ottimo)")
+    parser.add_argument("--output", help="Percorso del profilo (default: config.GA_TUNED_PROFILE)")
+    args = parser.parse_args()
+
+    run_ga_tuning(args.sizes, args.trials, args.repetitions, args.workers, args.seed, args.min_quality, args.output)
@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import config
+from tests.replay_server import DEFAULT_FIXTURES_DIR, ReplayServer
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Carichi di I/O misurati: costruzione del profilo Spotify e crawl dei dizionari Last.fm
+WORKLOADS = ("profile", "crawl")
+
+
+def _profile_workload(token, tmp_dir):
+    """
+    Costruisce il profilo dell'utente con get_spotify_data partendo da una cache degli artisti vuota,
+    così ogni ripetizione esegue tutte le chiamate (top artists, recently played, artisti in batch).
+    """
+    from src.api import spotify
+    from src.api.artist_cache import ArtistCache
+
+    def run():
+        spotify.artist_cache = ArtistCache(
+            db_path=os.path.join(tempfile.mkdtemp(dir=tmp_dir), "artist_cache.sqlite3"),
+            ttl=config.ARTIST_CACHE_TTL,
+            negative_ttl=config.ARTIST_CACHE_NEGATIVE_TTL,
+            lru_size=config.ARTIST_CACHE_LRU_SIZE
+        )
+        return spotify.get_spotify_data(token)
+    return run
+
+
+def _crawl_workload(genre_limit, limit_per_genre, pages_per_genre, tmp_dir):
+    """
+    Crawl dei generi e degli artisti per genere di Last.fm, senza checkpoint e senza scrivere i dizionari.
+    """
+    from src.preprocessing import lastfm_extraction
+
+    config.LASTFM_CRAWL_PROGRESS_FILE = os.path.join(tmp_dir, "lastfm_crawl_progress.json")
+
+    def run():
+        return lastfm_extraction.get_all_artists(
+            genre_limit=genre_limit, limit_per_genre=limit_per_genre, pages_per_genre=pages_per_genre
+        )
+    return run
+
+
+def _workloads(names, token, genre_limit, limit_per_genre, pages_per_genre, tmp_dir):
+    workloads = {}
+    if "profile" in names:
+        workloads["profile"] = _profile_workload(token, tmp_dir)
+    if "crawl" in names:
+        workloads["crawl"] = _crawl_workload(genre_limit, limit_per_genre, pages_per_genre, tmp_dir)
+    return workloads
+
+
+def _load_fixtures(fixtures_dir):
+    """
+    Carica le fixture registrate, con un errore esplicito se la cartella non esiste.
+    """
+    from src.api.http_recording import load_fixtures
+
+    if not os.path.isdir(fixtures_dir):
+        raise RuntimeError(f"[ERRORE] Nessuna fixture in {fixtures_dir}: eseguire prima il comando record.")
+    return load_fixtures(fixtures_dir)
+
+
+def record(fixtures_dir=DEFAULT_FIXTURES_DIR, workloads=WORKLOADS, token=None, genre_limit=100, limit_per_genre=100,
+           pages_per_genre=None):
+    """
+    Esegue i carichi una volta contro le API reali registrando le risposte in fixtures_dir.
+    Richiede le credenziali di Last.fm e un token Spotify (argomento, variabile SPOTIFY_TOKEN
+    o token in cache dal login dell'app).
+    """
+    # La registrazione va attivata prima che la sessione HTTP condivisa venga creata
+    config.HTTP_RECORD_DIR = fixtures_dir
+    from src.api import spotify
+
+    if "profile" in workloads:
+        token = token or os.getenv("SPOTIFY_TOKEN") or spotify.get_spotify_token()
+        if not token:
+            raise RuntimeError("[ERRORE] Token Spotify non disponibile: effettuare il login o impostare SPOTIFY_TOKEN.")
+    pages_per_genre = pages_per_genre or config.LASTFM_ARTIST_PAGES
+
+    with tempfile.TemporaryDirectory(prefix="brandify-io-") as tmp_dir:
+        for name, run in _workloads(workloads, token, genre_limit, limit_per_genre, pages_per_genre, tmp_dir).items():
+            print(f"[INFO] Registrazione del carico {name}...")
+            run()
+    print(f"[INFO] Fixture salvate in {fixtures_dir}")
+
+
+def replay(fixtures_dir=DEFAULT_FIXTURES_DIR, workloads=WORKLOADS, repetitions=5, genre_limit=100, limit_per_genre=100,
+           pages_per_genre=None, latency_ms=0.0, jitter_ms=0.0, recorded_latency=False, rate_limit=None, burst=None,
+           error_rate=0.0, seed=0, lastfm_rate=None, lastfm_workers=None, output_dir=RESULTS_DIR):
+    """
+    Misura i carichi di I/O contro il server di replay locale (nessuna chiamata di rete esterna):
+    tempo per ripetizione (mediana, p95, minimo), richieste e retry del trasporto, esiti del server.
+    I risultati sono salvati in io_benchmark.json.
+
+    :param latency_ms, jitter_ms, recorded_latency, rate_limit, burst, error_rate, seed: Vedi ReplayServer.
+    :param lastfm_rate: Rate limit lato client verso Last.fm (default: config.LASTFM_RATE_LIMIT).
+    :param lastfm_workers: Thread del crawl (default: config.LASTFM_MAX_WORKERS).
+    :return: Dizionario dei risultati.
+    """
+    from src.api import http_transport
+    from src.preprocessing import lastfm_extraction
+    from src.preprocessing.rate_limiter import TokenBucket
+
+    # Log silenziosi (config.BENCHMARK_LOG_PROFILE)
+    config.set_log_profile(config.BENCHMARK_LOG_PROFILE)
+    server = ReplayServer(_load_fixtures(fixtures_dir), latency_ms, jitter_ms, recorded_latency,
+                          rate_limit, burst, error_rate, seed)
+    url = server.start()
+
+    # Entrambi i client puntano al server di replay
+    config.SPOTIFY_API_PREFIX = f"{url}/api.spotify.com/v1/"
+    lastfm_extraction.BASE_URL = f"{url}/ws.audioscrobbler.com/2.0/"
+    if lastfm_rate is not None:
+        lastfm_extraction._rate_limiter = TokenBucket(rate=lastfm_rate, burst=max(lastfm_rate, 1))
+    if lastfm_workers is not None:
+        config.LASTFM_MAX_WORKERS = lastfm_workers
+    pages_per_genre = pages_per_genre or config.LASTFM_ARTIST_PAGES
+
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory(prefix="brandify-io-") as tmp_dir:
+            runs = _workloads(workloads, "replay-token", genre_limit, limit_per_genre, pages_per_genre, tmp_dir)
+            for name, run in runs.items():
+                before = http_transport.get_transport_stats()
+                stats_before = dict(server.stats)
+                times_ms = []
+                for _ in range(repetitions):
+                    start = time.perf_counter()
+                    run()
+                    times_ms.append((time.perf_counter() - start) * 1000)
+                after = http_transport.get_transport_stats()
+                host = "127.0.0.1"
+                retries = sum(after["retries"].get(host, {}).values()) - sum(before["retries"].get(host, {}).values())
+                results[name] = {
+                    "repetitions": repetitions,
+                    "median_ms": round(float(np.median(times_ms)), 2),
+                    "p95_ms": round(float(np.percentile(times_ms, 95)), 2),
+                    "min_ms": round(float(np.min(times_ms)), 2),
+                    "requests_per_run": (after["requests"].get(host, 0) - before["requests"].get(host, 0)) / repetitions,
+                    "retries_per_run": retries / repetitions,
+                    "server": {k: server.stats[k] - stats_before[k] for k in server.stats},
+                }
+                print(f"[INFO] {name}: mediana {results[name]['median_ms']} ms, p95 {results[name]['p95_ms']} ms, "
+                      f"{results[name]['requests_per_run']:.0f} richieste e {results[name]['retries_per_run']:.1f} retry per run")
+    finally:
+        server.stop()
+
+    output = {
+        "metadata": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "fixtures": fixtures_dir,
+            "latency_ms": latency_ms,
+            "jitter_ms": jitter_ms,
+            "recorded_latency": recorded_latency,
+            "rate_limit": rate_limit,
+            "error_rate": error_rate,
+            "seed": seed,
+            "spotify_max_workers": config.SPOTIFY_MAX_WORKERS,
+            "lastfm_max_workers": config.LASTFM_MAX_WORKERS,
+            "lastfm_rate_limit": lastfm_extraction._rate_limiter.rate,
+        },
+        "workloads": results,
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "io_benchmark.json"), "w", encoding="utf-8") as f:
+        json.dump(output, f, indent=2)
+    print(f"[INFO] Risultati salvati in {os.path.join(output_dir, 'io_benchmark.json')}")
+    return output
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark delle chiamate a Spotify e Last.fm con registrazione e replay.")
+    parser.add_argument("command", choices=["record", "replay"],
+                        help="record: registra le risposte delle API reali; replay: misura contro il server di replay")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES_DIR, help="Cartella delle fixture")
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument("--token", help="Token Spotify per la registrazione (default: SPOTIFY_TOKEN o token in cache)")
+    parser.add_argument("--genre-limit", type=int, default=100)
+    parser.add_argument("--limit-per-genre", type=int, default=100)
+    parser.add_argument("--pages-per-genre", type=int)
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--recorded-latency", action="store_true")
+    parser.add_argument("--rate-limit", type=float, help="Rate limit del server di replay (richieste/s)")
+    parser.add_argument("--burst", type=float)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--lastfm-rate", type=float, help="Rate limit lato client verso Last.fm (richieste/s)")
+    parser.add_argument("--lastfm-workers", type=int, help="Thread del crawl di Last.fm")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.fixtures, args.workloads, args.token, args.genre_limit, args.limit_per_genre, args.pages_per_genre)
+    else:
+        replay(args.fixtures, args.workloads, args.repetitions, args.genre_limit, args.limit_per_genre,
+               args.pages_per_genre, args.latency_ms, args.jitter_ms, args.recorded_latency, args.rate_limit,
+               args.burst, args.error_rate, args.seed, args.lastfm_rate, args.lastfm_workers)
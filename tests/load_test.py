@@ -0,0 +1,398 @@
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import requests
+
+import config
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# Range di prezzo e modalità di ricerca (gli stessi di benchmark_tests)
+PRICE_RANGES = [(22, 37), (12, 51), (None, None)]
+SEARCH_MODES = ["artist", "genre", "balanced"]
+
+# Tipi di richiesta del traffico:
+# - api: GET /recommendations/api (JSON);
+# - html: POST /recommendations/ (prima pagina dei risultati HTML, in streaming);
+# - page: GET di una pagina successiva dei risultati HTML (link "Next" di una risposta html precedente).
+REQUEST_KINDS = ("api", "html", "page")
+
+
+########################################
+# SERVER
+########################################
+def _stub_profiles(n_profiles, tmp_dir):
+    """
+    Costruisce n profili utente passando da get_spotify_data con un client Spotify finto
+    (tests/stub_spotify.py), quindi con la stessa pipeline dei profili reali ma senza rete.
+    La cache degli artisti è temporanea, per non scrivere artisti finti in quella reale.
+    """
+    from src.api import spotify
+    from src.api.artist_cache import ArtistCache
+    from src.preprocessing.product_preprocessor import load_dictionary
+    from tests.stub_spotify import StubSpotifyClient
+
+    spotify.artist_cache = ArtistCache(
+        db_path=os.path.join(tmp_dir, "artist_cache.sqlite3"),
+        ttl=config.ARTIST_CACHE_TTL,
+        negative_ttl=config.ARTIST_CACHE_NEGATIVE_TTL,
+        lru_size=config.ARTIST_CACHE_LRU_SIZE
+    )
+    artists = sorted(load_dictionary(config.LASTFM_ARTISTS_FILE))
+    genres = sorted(load_dictionary(config.LASTFM_GENRES_FILE))
+    clients = {f"stub-{i}": StubSpotifyClient(artists, genres, seed=i) for i in range(n_profiles)}
+
+    # Qualsiasi chiamata a Spotify del server è servita dal client finto (mai dalla rete)
+    spotify.spotify_client = lambda token: clients.get(token, clients["stub-0"])
+    return {token: spotify.get_spotify_data(token, sp=client) for token, client in clients.items()}
+
+
+def serve(port, stub_profiles):
+    """
+    Avvia l'app in modalità USE_MOCK_DATA (senza watcher del catalogo) sulla porta indicata.
+    Ai profili di config.MOCK_PROFILES si aggiungono i profili costruiti dal client Spotify finto.
+    """
+    config.USE_MOCK_DATA = True
+    config.CATALOG_WATCH = False
+    from src.main import create_app
+
+    with tempfile.TemporaryDirectory(prefix="brandify-load-") as tmp_dir:
+        config.MOCK_PROFILES.update(_stub_profiles(stub_profiles, tmp_dir))
+        app = create_app()
+        print(f"[INFO] Profili mock disponibili: {', '.join(config.MOCK_PROFILES)}", flush=True)
+        app.run(host="127.0.0.1", port=port, threaded=True, use_reloader=False)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(stub_profiles, log_path, log_profile, timeout=120):
+    """
+    Avvia il server in un processo separato (stdout e stderr nel file di log) e attende che risponda.
+    Il profilo di logging (config.LOG_PROFILES) è passato al server tramite LOG_PROFILE.
+
+    :return: Tupla (processo, URL base).
+    """
+    port = _free_port()
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(SRC_DIR), LOG_PROFILE=log_profile)
+    log = open(log_path, "w", encoding="utf-8")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "tests.load_test", "serve", "--port", str(port), "--stub-profiles", str(stub_profiles)],
+        cwd=SRC_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"[ERRORE] Il server è terminato durante l'avvio (vedi {log_path}).")
+        try:
+            if requests.get(f"{url}/", timeout=1).status_code == 200:
+                return process, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"[ERRORE] Il server non risponde dopo {timeout} s (vedi {log_path}).")
+
+
+########################################
+# RISORSE DEL SERVER
+########################################
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _process_usage(pid):
+    """
+    Tempo di CPU (s, utente + sistema) e RSS (MB) di un processo, da /proc (solo Linux).
+    """
+    with open(f"/proc/{pid}/stat", "r") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    cpu_s = (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+    with open(f"/proc/{pid}/statm", "r") as f:
+        rss_mb = int(f.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+    return cpu_s, rss_mb
+
+
+class _ServerSampler(threading.Thread):
+    """
+    Campiona CPU e RSS del processo server durante la misura.
+    """
+
+    def __init__(self, pid, interval=0.25):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.rss = []
+        self._stop_event = threading.Event()
+        self._start = None
+
+    def run(self):
+        self._start = (time.perf_counter(), _process_usage(self.pid)[0])
+        while not self._stop_event.wait(self.interval):
+            self.rss.append(_process_usage(self.pid)[1])
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        wall_s = time.perf_counter() - self._start[0]
+        cpu_s, rss_mb = _process_usage(self.pid)
+        self.rss.append(rss_mb)
+        return {
+            "cpu_percent": round(100.0 * (cpu_s - self._start[1]) / wall_s, 1),
+            "rss_mean_mb": round(float(np.mean(self.rss)), 1),
+            "rss_peak_mb": round(float(np.max(self.rss)), 1),
+        }
+
+
+########################################
+# GENERATORE DI TRAFFICO
+########################################
+class _Traffic:
+    """
+    Stato condiviso dai worker: richieste completate e link alle pagine successive da visitare.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records = []  # (tipo, istante di inizio, latenza in s, status HTTP o None se errore di rete)
+        self.next_pages = []
+
+
+def _build_request(kind, rng, profiles, unique, traffic):
+    """
+    Costruisce una richiesta (metodo, path, parametri) del tipo indicato con profilo,
+    range di prezzo e modalità estratti a caso.
+    """
+    if kind == "page":
+        with traffic.lock:
+            if traffic.next_pages:
+                return "GET", traffic.next_pages[rng.integers(len(traffic.next_pages))], None
+        kind = "html"  # Ancora nessuna pagina successiva nota: si genera una prima pagina
+
+    min_price, max_price = PRICE_RANGES[rng.integers(len(PRICE_RANGES))]
+    if unique:
+        # Prezzo minimo leggermente diverso a ogni richiesta: la cache dei risultati non viene mai colpita
+        min_price = (min_price or 0) + float(rng.random()) / 1000
+    params = {
+        "mock_profile": profiles[rng.integers(len(profiles))],
+        "preference_mode": SEARCH_MODES[rng.integers(len(SEARCH_MODES))],
+        "min_price": "" if min_price is None else min_price,
+        "max_price": "" if max_price is None else max_price,
+    }
+    if kind == "api":
+        return "GET", "/recommendations/api", params
+    return "POST", "/recommendations/", params
+
+
+def _worker(url, kinds, weights, profiles, unique, seed, stop_at, traffic):
+    rng = np.random.default_rng(seed)
+    session = requests.Session()
+    while time.perf_counter() < stop_at:
+        kind = kinds[rng.choice(len(kinds), p=weights)]
+        method, path, params = _build_request(kind, rng, profiles, unique, traffic)
+        start = time.perf_counter()
+        try:
+            if method == "GET":
+                response = session.get(url + path, params=params, timeout=60)
+            else:
+                response = session.post(url + path, data=params, timeout=60)
+            status = response.status_code
+            body = response.text
+        except requests.RequestException:
+            status, body = None, ""
+        latency = time.perf_counter() - start
+
+        if status == 200 and method == "POST":
+            marker = body.find('/recommendations/results/')
+            if marker >= 0:
+                link = body[marker:body.find('"', marker)].replace("&amp;", "&")
+                with traffic.lock:
+                    if len(traffic.next_pages) < 1000:
+                        traffic.next_pages.append(link)
+        with traffic.lock:
+            traffic.records.append((kind, start, latency, status))
+
+
+def _summary(records, wall_s):
+    """
+    Statistiche di un insieme di richieste: throughput, percentili di latenza ed error rate.
+    """
+    if not records:
+        return {"requests": 0}
+    latencies_ms = np.array([r[2] for r in records]) * 1000
+    errors = sum(1 for r in records if r[3] is None or r[3] >= 400)
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {
+        "requests": len(records),
+        "rps": round(len(records) / wall_s, 2),
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "mean_ms": round(float(latencies_ms.mean()), 2),
+        "max_ms": round(float(latencies_ms.max()), 2),
+        "errors": errors,
+        "error_rate": round(errors / len(records), 4),
+    }
+
+
+def run_load_test(url=None, server_pid=None, concurrency=None, duration=None, warmup=None, mix=None,
+                  profiles=None, stub_profiles=3, unique=False, seed=42, log_profile=None, output_dir=RESULTS_DIR):
+    """
+    Genera traffico concorrente verso gli endpoint delle raccomandazioni e misura throughput,
+    latenza (p50/p95/p99), error rate e risorse del server. Senza url avvia l'app in un processo
+    separato in modalità USE_MOCK_DATA, con profili mock e profili costruiti da un client Spotify finto.
+    Scrive load_test.json e aggiunge il run a load_test_history.jsonl.
+
+    :param url: URL di un server già avviato (ad es. gunicorn); None = server locale avviato qui.
+    :param server_pid: PID del server da misurare se url è indicato (None = risorse non misurate).
+    :param concurrency: Client concorrenti (default: config.LOAD_TEST_CONCURRENCY).
+    :param duration: Durata della misura in secondi (default: config.LOAD_TEST_DURATION).
+    :param warmup: Secondi iniziali esclusi dalle statistiche (default: config.LOAD_TEST_WARMUP).
+    :param mix: Pesi dei tipi di richiesta, ad es. {"api": 3, "html": 1, "page": 1} (default: config.LOAD_TEST_MIX).
+    :param profiles: Chiavi dei profili mock da usare (default: tutti quelli del server).
+    :param stub_profiles: Profili costruiti dal client Spotify finto (solo con server locale).
+    :param unique: Parametri diversi a ogni richiesta, per misurare il GA senza cache dei risultati.
+    :param seed: Seed del traffico (riproducibile a parità di concorrenza).
+    :param log_profile: Profilo di logging del server locale (default: config.BENCHMARK_LOG_PROFILE).
+    :return: Dizionario dei risultati.
+    """
+    concurrency = concurrency or config.LOAD_TEST_CONCURRENCY
+    duration = duration or config.LOAD_TEST_DURATION
+    warmup = config.LOAD_TEST_WARMUP if warmup is None else warmup
+    mix = mix or config.LOAD_TEST_MIX
+    log_profile = log_profile or config.BENCHMARK_LOG_PROFILE
+    kinds = [kind for kind in REQUEST_KINDS if mix.get(kind)]
+    weights = np.array([mix[kind] for kind in kinds], dtype=float)
+    weights /= weights.sum()
+
+    os.makedirs(output_dir, exist_ok=True)
+    process = None
+    if url is None:
+        print("[INFO] Avvio del server in modalità mock...")
+        process, url = _start_server(stub_profiles, os.path.join(output_dir, "load_test_server.log"), log_profile)
+        server_pid = process.pid
+        profiles = profiles or list(config.MOCK_PROFILES) + [f"stub-{i}" for i in range(stub_profiles)]
+    profiles = profiles or list(config.MOCK_PROFILES)
+
+    try:
+        print(f"[INFO] Carico: {concurrency} client per {warmup + duration} s ({warmup} s di riscaldamento) su {url}.")
+        traffic = _Traffic()
+        start = time.perf_counter()
+        measure_from = start + warmup
+        stop_at = measure_from + duration
+        seeds = np.random.SeedSequence(seed).generate_state(concurrency)
+        threads = [
+            threading.Thread(target=_worker, args=(url, kinds, weights, profiles, unique, int(s), stop_at, traffic), daemon=True)
+            for s in seeds
+        ]
+        for thread in threads:
+            thread.start()
+
+        # Le risorse del server sono misurate solo dopo il riscaldamento
+        time.sleep(max(measure_from - time.perf_counter(), 0))
+        sampler = _ServerSampler(server_pid) if server_pid else None
+        if sampler is not None:
+            sampler.start()
+        for thread in threads:
+            thread.join()
+        server = sampler.stop() if sampler is not None else None
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    # Solo le richieste iniziate dopo il riscaldamento
+    measured = [r for r in traffic.records if r[1] >= measure_from]
+    wall_s = max(max((r[1] + r[2] for r in measured), default=stop_at) - measure_from, 1e-9)
+    results = {
+        "metadata": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "url": url,
+            "log_profile": log_profile if process is not None else None,
+            "concurrency": concurrency,
+            "duration_s": duration,
+            "warmup_s": warmup,
+            "mix": {kind: mix[kind] for kind in kinds},
+            "profiles": profiles,
+            "unique": unique,
+            "seed": seed,
+            "ga_time_budget_ms": config.GA_TIME_BUDGET_MS,
+        },
+        "overall": _summary(measured, wall_s),
+        "by_kind": {kind: _summary([r for r in measured if r[0] == kind], wall_s) for kind in kinds},
+        "server": server,
+    }
+
+    with open(os.path.join(output_dir, "load_test.json"), "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    with open(os.path.join(output_dir, "load_test_history.jsonl"), "a", encoding="utf-8") as f:
+        f.write(json.dumps(results) + "\n")
+
+    overall = results["overall"]
+    print(f"[INFO] {overall['requests']} richieste, {overall.get('rps', 0)} req/s, "
+          f"p50 {overall.get('p50_ms')} ms, p95 {overall.get('p95_ms')} ms, p99 {overall.get('p99_ms')} ms, "
+          f"error rate {overall.get('error_rate', 0):.2%}")
+    if server is not None:
+        print(f"[INFO] Server: CPU {server['cpu_percent']}%, RSS medio {server['rss_mean_mb']} MB, "
+              f"picco {server['rss_peak_mb']} MB")
+    print(f"[INFO] Risultati salvati in {os.path.join(output_dir, 'load_test.json')}")
+    return results
+
+
+def _parse_mix(value):
+    """
+    Converte "api=3,html=1,page=1" nel dizionario dei pesi.
+    """
+    mix = {}
+    for item in value.split(","):
+        kind, _, weight = item.partition("=")
+        if kind not in REQUEST_KINDS:
+            raise argparse.ArgumentTypeError(f"tipo di richiesta sconosciuto: {kind}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Test di carico degli endpoint delle raccomandazioni.")
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "serve"],
+                        help="run: genera il carico (avviando il server se --url non è indicato); "
+                             "serve: avvia solo il server mock")
+    parser.add_argument("--url", help="URL di un server già avviato")
+    parser.add_argument("--server-pid", type=int, help="PID del server indicato con --url (per CPU e RSS)")
+    parser.add_argument("--port", type=int, default=5000, help="Porta del server (serve)")
+    parser.add_argument("--concurrency", type=int, help="Client concorrenti")
+    parser.add_argument("--duration", type=float, help="Durata della misura in secondi")
+    parser.add_argument("--warmup", type=float, help="Secondi di riscaldamento esclusi dalle statistiche")
+    parser.add_argument("--mix", type=_parse_mix, help="Pesi dei tipi di richiesta, ad es. api=3,html=1,page=1")
+    parser.add_argument("--profiles", nargs="+", help="Profili mock da usare (chiavi di config.MOCK_PROFILES o stub-N)")
+    parser.add_argument("--stub-profiles", type=int, default=3, help="Profili costruiti dal client Spotify finto")
+    parser.add_argument("--unique", action="store_true", help="Parametri diversi a ogni richiesta (nessun hit di cache)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--log-profile", choices=list(config.LOG_PROFILES),
+                        help="Profilo di logging del server locale (default: config.BENCHMARK_LOG_PROFILE)")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.port, args.stub_profiles)
+    else:
+        results = run_load_test(args.url, args.server_pid, args.concurrency, args.duration, args.warmup, args.mix,
+                                args.profiles, args.stub_profiles, args.unique, args.seed, args.log_profile)
+        # Codice di uscita 1 se qualche richiesta è fallita
+        sys.exit(1 if results["overall"].get("errors") else 0)
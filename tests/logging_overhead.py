@@ -0,0 +1,116 @@
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import config
+from src.preprocessing.product_preprocessor import preprocess_products
+from src.recommendation.recommendation_engine_ga import RecommendationEngineGA
+from tests.synthetic_data import load_terms, generate_catalog, generate_profile, write_dictionaries
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def _measure(profile, csv_path, artists_file, genres_file, profiles, repetitions, seed):
+    """
+    Misura preprocessing e GA con il profilo di logging indicato.
+
+    :return: Dizionario con i tempi mediani e il numero di righe di log prodotte.
+    """
+    config.set_log_profile(profile)
+    counter = _LineCounter()
+    logging.getLogger().addHandler(counter)
+    try:
+        preprocessing = []
+        for _ in range(repetitions):
+            start = time.perf_counter()
+            df_products = preprocess_products(csv_path, artists_file=artists_file, genres_file=genres_file)
+            preprocessing.append(time.perf_counter() - start)
+        engine = RecommendationEngineGA(df_products=df_products)
+
+        ga = []
+        for rep in range(repetitions):
+            for i, user_profile in enumerate(profiles):
+                run = engine.for_request(user_data=user_profile, preference_mode="balanced", seed=seed + i)
+                start = time.perf_counter()
+                run.recommend(time_budget_ms=0)
+                ga.append(time.perf_counter() - start)
+    finally:
+        logging.getLogger().removeHandler(counter)
+    return {
+        "profile": profile,
+        "preprocessing_ms": round(float(np.median(preprocessing)) * 1000, 2),
+        "ga_ms": round(float(np.median(ga)) * 1000, 2),
+        "log_lines": counter.count // repetitions,
+    }
+
+
+class _LineCounter(logging.Handler):
+    """Conta i record effettivamente emessi (dopo il filtro dei livelli)."""
+
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+def run_logging_overhead(n_products=3000, n_profiles=3, repetitions=5, seed=42, output_dir=RESULTS_DIR):
+    """
+    Misura il costo del logging per ciascun profilo di config.LOG_PROFILES (preprocessing del catalogo
+    e ricerche del GA senza limite di tempo, su dati sintetici) rispetto al profilo di
+    config.BENCHMARK_LOG_PROFILE. I log sono scritti su os.devnull, così si misura la formattazione
+    e non la velocità della console. I risultati sono salvati in logging_overhead.json.
+
+    :return: Lista di risultati, uno per profilo.
+    """
+    artists, genres = load_terms()
+    profiles = [generate_profile(artists, genres, seed=seed + i) for i in range(n_profiles)]
+    handlers = [h for h in logging.getLogger().handlers if isinstance(h, logging.StreamHandler)]
+    previous_profile = config.LOG_PROFILE
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="brandify-logging-") as tmp_dir, open(os.devnull, "w") as devnull:
+        csv_path = os.path.join(tmp_dir, "products.csv")
+        generate_catalog(n_products, artists, genres, seed=seed).to_csv(csv_path, index=False)
+        artists_file, genres_file = write_dictionaries(tmp_dir, artists, genres)
+
+        streams = [h.setStream(devnull) for h in handlers]
+        try:
+            for profile in config.LOG_PROFILES:
+                results.append(_measure(profile, csv_path, artists_file, genres_file, profiles, repetitions, seed))
+        finally:
+            for handler, stream in zip(handlers, streams):
+                handler.setStream(stream)
+            config.set_log_profile(previous_profile)
+
+    baseline = next(r for r in results if r["profile"] == config.BENCHMARK_LOG_PROFILE)
+    for r in results:
+        r["preprocessing_overhead"] = round(r["preprocessing_ms"] / baseline["preprocessing_ms"] - 1, 4)
+        r["ga_overhead"] = round(r["ga_ms"] / baseline["ga_ms"] - 1, 4)
+        print(f"[INFO] {r['profile']}: preprocessing {r['preprocessing_ms']} ms ({r['preprocessing_overhead']:+.1%}), "
+              f"GA {r['ga_ms']} ms ({r['ga_overhead']:+.1%}), {r['log_lines']} righe di log")
+
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, "logging_overhead.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"products": n_products, "profiles": n_profiles, "baseline": config.BENCHMARK_LOG_PROFILE,
+                   "results": results}, f, indent=2)
+    print(f"[INFO] Risultati salvati in {path}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Costo del logging per profilo (config.LOG_PROFILES).")
+    parser.add_argument("--products", type=int, default=3000, help="Numero di prodotti del catalogo")
+    parser.add_argument("--profiles", type=int, default=3, help="Profili utente sintetici")
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    run_logging_overhead(args.products, args.profiles, args.repetitions, args.seed)
@@ -0,0 +1,148 @@
+import contextlib
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+# Fasi misurate dal benchmark, nell'ordine in cui vengono eseguite
+PHASES = ["Preprocessing", "Engine Construction", "Price Filtering", "GA Run", "Evaluation"]
+
+# Metriche per fase riportate con deviazione standard e intervallo di confidenza nel benchmark
+MEMORY_METRICS = ["Peak RSS (MB)", "Tracemalloc Peak (MB)"]
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss_mb():
+    """
+    RSS corrente del processo in MB (da /proc su Linux). Dove /proc non esiste
+    restituisce il picco di RSS del processo finora (ru_maxrss).
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+    except (OSError, IndexError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class _RssSampler(threading.Thread):
+    """
+    Campiona l'RSS a intervalli regolari durante una fase e ne conserva il massimo.
+    """
+
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = current_rss_mb()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, current_rss_mb())
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.peak = max(self.peak, current_rss_mb())
+
+
+class PhaseProfiler:
+    """
+    Misura tempo e memoria di ciascuna fase di un run:
+    - picco di RSS (campionato durante la fase);
+    - picco di memoria allocata da Python (tracemalloc) oltre a quella già in uso all'inizio della fase;
+    - blocchi e MB allocati durante la fase e ancora vivi alla fine (differenza tra snapshot tracemalloc);
+    - opzionalmente, i top-N siti di allocazione della fase.
+    """
+
+    def __init__(self, top_n=0, sample_interval=0.005):
+        """
+        :param top_n: Numero di siti di allocazione da riportare per fase (0 = nessun report).
+        :param sample_interval: Intervallo in secondi di campionamento dell'RSS.
+        """
+        self.top_n = top_n
+        self.sample_interval = sample_interval
+        self.results = {}
+        self.top_allocations = {}
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stop(self):
+        tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        Context manager che misura il blocco di codice come fase `name`.
+        """
+        before = tracemalloc.take_snapshot()
+        current_before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        sampler = _RssSampler(self.sample_interval)
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            sampler.stop()
+            after = tracemalloc.take_snapshot()
+
+            diff = after.compare_to(before, "lineno")
+            self.results[name] = {
+                "time_s": duration,
+                "peak_rss_mb": sampler.peak,
+                "tracemalloc_peak_mb": (peak - current_before) / (1024 * 1024),
+                "alloc_blocks": sum(max(stat.count_diff, 0) for stat in diff),
+                "alloc_mb": sum(max(stat.size_diff, 0) for stat in diff) / (1024 * 1024),
+            }
+            if self.top_n:
+                self.top_allocations[name] = [
+                    (str(stat.traceback[0]), stat.size_diff / 1024, stat.count_diff)
+                    for stat in diff[:self.top_n] if stat.size_diff > 0
+                ]
+
+    def as_columns(self):
+        """
+        Risultati in forma di colonne per il CSV del benchmark, ad es. "GA Run Peak RSS (MB)".
+        """
+        columns = {}
+        for name, result in self.results.items():
+            columns[f"{name} Time (s)"] = result["time_s"]
+            columns[f"{name} Peak RSS (MB)"] = result["peak_rss_mb"]
+            columns[f"{name} Tracemalloc Peak (MB)"] = result["tracemalloc_peak_mb"]
+            columns[f"{name} Alloc Blocks"] = result["alloc_blocks"]
+            columns[f"{name} Alloc (MB)"] = result["alloc_mb"]
+        return columns
+
+
+def write_allocation_report(top_allocations, path, top_n):
+    """
+    Scrive il report dei siti di allocazione, aggregati su tutti i run, per fase.
+
+    :param top_allocations: Lista di dizionari {fase: [(sito, KB, blocchi), ...]}, uno per run.
+    """
+    totals = {}
+    for run in top_allocations:
+        for phase, stats in run.items():
+            for location, size_kb, count in stats:
+                entry = totals.setdefault(phase, {}).setdefault(location, [0.0, 0, 0])
+                entry[0] += size_kb
+                entry[1] += count
+                entry[2] += 1
+
+    with open(path, "w", encoding="utf-8") as f:
+        for phase in PHASES:
+            if phase not in totals:
+                continue
+            f.write(f"== {phase} ==\n")
+            ranked = sorted(totals[phase].items(), key=lambda item: item[1][0], reverse=True)[:top_n]
+            for location, (size_kb, count, runs) in ranked:
+                f.write(f"{size_kb / runs:>12.1f} KB {count / runs:>10.0f} blocchi  {location}  (media su {runs} run)\n")
+            f.write("\n")
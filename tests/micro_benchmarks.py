@@ -0,0 +1,305 @@
+import argparse
+import copy
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from importlib import metadata
+
+import numpy as np
+import pandas as pd
+
+import config
+from src.api import spotify
+from src.api.artist_cache import ArtistCache
+from src.preprocessing.product_preprocessor import (
+    load_dictionary, dictionary_lookup, clean_and_lookup, matching_text, preprocess_products
+)
+from src.recommendation.evaluate_ga import calculate_coverage
+from src.recommendation.recommendation_engine_ga import RecommendationEngineGA
+from tests.stub_spotify import StubSpotifyClient
+from tests.synthetic_data import load_terms, generate_catalog, generate_profile, write_dictionaries
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT_DIR, "tests", "results")
+HISTORY_FILE = os.path.join(RESULTS_DIR, "micro_benchmarks_history.jsonl")
+BASELINE_FILE = os.path.join(RESULTS_DIR, "micro_benchmarks_baseline.json")
+
+# Dimensioni del banco di prova: catalogo sintetico e dizionario ridotto (il preprocessing resta rapido)
+CATALOG_SIZE = 5000
+CATALOG_ARTISTS = 500
+SEED = 42
+
+
+########################################
+# BANCO DI PROVA
+########################################
+def _build_fixtures(tmp_dir):
+    """
+    Prepara gli input dei micro-benchmark, deterministici a parità di seed e dizionari.
+    """
+    artists_full = load_dictionary(config.LASTFM_ARTISTS_FILE)
+    genres_full = load_dictionary(config.LASTFM_GENRES_FILE)
+    artists, genres = load_terms(max_artists=CATALOG_ARTISTS)
+
+    df_raw = generate_catalog(CATALOG_SIZE, artists, genres, seed=SEED)
+    csv_path = os.path.join(tmp_dir, "products.csv")
+    df_raw.to_csv(csv_path, index=False)
+    artists_file, genres_file = write_dictionaries(tmp_dir, artists, genres)
+    df_products = preprocess_products(csv_path, artists_file=artists_file, genres_file=genres_file)
+
+    profile = generate_profile(artists, genres, breadth="medium", seed=SEED)
+    engine = RecommendationEngineGA(df_products=df_products).for_request(
+        user_data=profile, preference_mode="balanced", seed=SEED
+    )
+    engine.positions = np.arange(len(engine.catalog))
+    engine.product_scores, engine.relevant_mask = engine._compute_product_scores()
+    # Un gene per prodotto dell'intero catalogo: misura gli operatori del GA su un genoma grande
+    engine._build_genome(collapse=False)
+    population = engine._generate_initial_population()
+    parents = population[:engine.num_parents_mating]
+    offspring_size = (engine.sol_per_pop - engine.num_parents_mating, population.shape[1])
+
+    # Le voci _fitness_func, _crossover_func e _mutation_func misurano il calcolo completo, confrontabile
+    # con lo storico; la fitness incrementale ha una voce propria su una copia del motore
+    incremental = copy.copy(engine)
+    incremental._incremental = True
+    engine._incremental = False
+    engine._components = {}
+
+    # Figlio "nuovo" per la fitness incrementale: il genitore con i geni di una mutazione invertiti
+    parent = population[0]
+    n_flips = max(1, round(len(parent) * engine.mutation_percent_genes / 100))
+    flipped = np.sort(np.random.default_rng(SEED).choice(len(parent), size=n_flips, replace=False))
+    child = parent.copy()
+    child[flipped] = 1 - child[flipped]
+
+    # Prodotti raccomandati per la copertura: metà dei prodotti rilevanti
+    recommended = df_products.iloc[np.flatnonzero(engine.relevant_mask)[::2]]
+
+    # get_spotify_data con client finto e cache degli artisti temporanea (a regime, quindi calda)
+    stub = StubSpotifyClient(sorted(artists_full), sorted(genres_full), seed=SEED)
+    spotify.artist_cache = ArtistCache(
+        db_path=os.path.join(tmp_dir, "artist_cache.sqlite3"),
+        ttl=config.ARTIST_CACHE_TTL,
+        negative_ttl=config.ARTIST_CACHE_NEGATIVE_TTL,
+        lru_size=config.ARTIST_CACHE_LRU_SIZE
+    )
+
+    sample = df_raw.iloc[0]
+    text = matching_text(sample["name"], sample["description"])
+    return {
+        "artists_full": artists_full,
+        "genres_full": genres_full,
+        "sample": sample,
+        "text": text,
+        "engine": engine,
+        "incremental": incremental,
+        "parent": parent,
+        "parent_components": engine._fitness_components(parent),
+        "child": child,
+        "flipped": flipped,
+        "population": population,
+        "parents": parents,
+        "offspring_size": offspring_size,
+        "df_products": df_products,
+        "recommended": recommended,
+        "profile": profile,
+        "stub": stub,
+    }
+
+
+def _benchmarks(f):
+    """
+    Funzioni da misurare, ognuna senza argomenti.
+    """
+    def get_spotify_data():
+        spotify.get_spotify_data("stub-token", sp=f["stub"])
+
+    def fitness_func_incremental():
+        # Componenti del figlio dalle sole differenze con il genitore, poi la fitness (come dopo una mutazione)
+        engine = f["incremental"]
+        engine._components = {f["parent"].tobytes(): f["parent_components"]}
+        engine._components[f["child"].tobytes()] = engine._apply_delta(f["parent_components"], f["child"], f["flipped"])
+        engine._fitness_func(None, f["child"], 0)
+
+    return {
+        "dictionary_lookup": lambda: dictionary_lookup(f["text"], f["artists_full"]),
+        "clean_and_lookup": lambda: clean_and_lookup(f["sample"]["name"], f["sample"]["description"], f["artists_full"], f["genres_full"]),
+        "_fitness_func": lambda: f["engine"]._fitness_func(None, f["population"][0], 0),
+        "_fitness_func_incremental": fitness_func_incremental,
+        "_fitness_components": lambda: f["engine"]._fitness_components(f["population"][0]),
+        "_crossover_func": lambda: f["engine"]._crossover_func(f["parents"], f["offspring_size"], None),
+        "_mutation_func": lambda: f["engine"]._mutation_func(f["population"].copy(), None),
+        "calculate_coverage": lambda: calculate_coverage(f["recommended"], f["df_products"], f["profile"], 20, 40, "balanced"),
+        "get_spotify_data": get_spotify_data,
+    }
+
+
+########################################
+# MISURA
+########################################
+def _environment():
+    def version(package):
+        try:
+            return metadata.version(package)
+        except metadata.PackageNotFoundError:
+            return None
+
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=ROOT_DIR, capture_output=True, text=True, timeout=10).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "packages": {package: version(package) for package in ("numpy", "pandas", "pygad", "spotipy")},
+    }
+
+
+def run_micro_benchmarks(samples=None, names=None):
+    """
+    Esegue i micro-benchmark. Ogni benchmark è ripetuto in `samples` campioni, ognuno lungo circa 50 ms,
+    e per ogni campione si registra il tempo medio di una chiamata in microsecondi.
+
+    :param samples: Numero di campioni per benchmark (default: config.MICRO_BENCHMARK_SAMPLES).
+    :param names: Benchmark da eseguire (default: tutti).
+    :return: Dizionario {"environment": {...}, "benchmarks": {nome: {"samples_us": [...], "median_us": ..., ...}}}.
+    """
+    # Log silenziosi (config.BENCHMARK_LOG_PROFILE), anche nei processi figli
+    config.set_log_profile(config.BENCHMARK_LOG_PROFILE)
+    samples = samples or config.MICRO_BENCHMARK_SAMPLES
+    with tempfile.TemporaryDirectory(prefix="brandify-micro-") as tmp_dir:
+        fixtures = _build_fixtures(tmp_dir)
+        benchmarks = _benchmarks(fixtures)
+        results = {}
+        for name, func in benchmarks.items():
+            if names and name not in names:
+                continue
+            timer = timeit.Timer(func)
+            number, total = timer.autorange()  # Numero di chiamate per almeno 0,2 s
+            number = max(1, number // 4)
+            times = [t / number * 1e6 for t in timer.repeat(repeat=samples, number=number)]
+            results[name] = {
+                "samples_us": [round(t, 3) for t in times],
+                "number": number,
+                "median_us": round(statistics.median(times), 3),
+                "mean_us": round(statistics.fmean(times), 3),
+                "stdev_us": round(statistics.stdev(times), 3) if len(times) > 1 else 0.0,
+                "min_us": round(min(times), 3),
+            }
+            print(f"[INFO] {name:<26} mediana {results[name]['median_us']:>12.2f} µs "
+                  f"(± {results[name]['stdev_us']:.2f}, {samples} campioni x {number} chiamate)")
+    return {"environment": _environment(), "benchmarks": results}
+
+
+def append_history(run, history_file=HISTORY_FILE):
+    """
+    Aggiunge un run allo storico (una riga JSON per run, con i metadati dell'ambiente).
+    """
+    os.makedirs(os.path.dirname(history_file), exist_ok=True)
+    with open(history_file, "a", encoding="utf-8") as f:
+        f.write(json.dumps(run) + "\n")
+
+
+########################################
+# CONFRONTO CON LA BASELINE
+########################################
+def _mann_whitney_greater(current, baseline):
+    """
+    p-value unilaterale del test di Mann-Whitney (approssimazione normale) per l'ipotesi
+    "i tempi correnti sono maggiori di quelli della baseline". Non richiede scipy.
+    """
+    n1, n2 = len(current), len(baseline)
+    ranks = pd.Series(list(current) + list(baseline)).rank(method="average").to_numpy()
+    u = ranks[:n1].sum() - n1 * (n1 + 1) / 2
+    sigma = np.sqrt(n1 * n2 * (n1 + n2 + 1) / 12)
+    if sigma == 0:
+        return 1.0
+    z = (u - n1 * n2 / 2) / sigma
+    return 1 - statistics.NormalDist().cdf(z)
+
+
+def compare(current, baseline, threshold=None, alpha=None):
+    """
+    Confronta un run con la baseline. Un benchmark è un rallentamento significativo se la mediana
+    cresce più della soglia relativa e il test di Mann-Whitney sui campioni ha p-value < alpha.
+
+    :param threshold: Aumento relativo minimo della mediana (default: config.MICRO_BENCHMARK_THRESHOLD).
+    :param alpha: Livello di significatività (default: config.MICRO_BENCHMARK_ALPHA).
+    :return: Lista dei nomi dei benchmark rallentati.
+    """
+    threshold = config.MICRO_BENCHMARK_THRESHOLD if threshold is None else threshold
+    alpha = config.MICRO_BENCHMARK_ALPHA if alpha is None else alpha
+
+    base_env = baseline["environment"]
+    print(f"[INFO] Baseline: commit {str(base_env.get('commit'))[:10]} del {base_env.get('timestamp')} "
+          f"(Python {base_env.get('python')}, {base_env.get('machine')})")
+    if (base_env.get("python"), base_env.get("machine")) != (current["environment"]["python"], current["environment"]["machine"]):
+        print("[WARNING] La baseline è stata misurata su un ambiente diverso: il confronto può non essere attendibile.")
+
+    slowdowns = []
+    for name, result in current["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        if base is None:
+            print(f"  {name:<26} nuovo benchmark, nessun confronto")
+            continue
+        ratio = result["median_us"] / base["median_us"]
+        p_value = _mann_whitney_greater(result["samples_us"], base["samples_us"])
+        slower = ratio > 1 + threshold and p_value < alpha
+        status = "RALLENTATO" if slower else "ok"
+        print(f"  {name:<26} {base['median_us']:>12.2f} -> {result['median_us']:>12.2f} µs "
+              f"({(ratio - 1) * 100:+.1f}%, p={p_value:.4f}) {status}")
+        if slower:
+            slowdowns.append(name)
+    return slowdowns
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmark delle funzioni critiche, con storico e baseline.")
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "baseline", "compare"],
+                        help="run: misura e salva nello storico; baseline: misura e salva come baseline; "
+                             "compare: misura e confronta con la baseline (exit code 1 se ci sono rallentamenti)")
+    parser.add_argument("--samples", type=int, default=None)
+    parser.add_argument("--only", nargs="+", default=None, help="Esegue solo i benchmark indicati")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="File della baseline")
+    parser.add_argument("--threshold", type=float, default=None, help="Aumento relativo minimo della mediana (es. 0.1)")
+    args = parser.parse_args(argv)
+
+    run = run_micro_benchmarks(samples=args.samples, names=args.only)
+    append_history(run)
+    print(f"[INFO] Run aggiunto allo storico {HISTORY_FILE}")
+
+    if args.command == "baseline":
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2)
+        print(f"[INFO] Baseline salvata in {args.baseline}")
+    elif args.command == "compare":
+        if not os.path.exists(args.baseline):
+            print(f"[ERRORE] Baseline non trovata in {args.baseline}: crearla con il comando 'baseline'.")
+            return 2
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        slowdowns = compare(run, baseline, threshold=args.threshold)
+        if slowdowns:
+            print(f"[ERRORE] Rallentamenti significativi: {', '.join(slowdowns)}")
+            return 1
+        print("[INFO] Nessun rallentamento significativo rispetto alla baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
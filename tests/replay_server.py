@@ -0,0 +1,168 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from src.api.http_recording import fixture_key, load_fixtures
+from src.preprocessing.rate_limiter import TokenBucket
+
+# Directory di default delle fixture registrate con config.HTTP_RECORD_DIR
+DEFAULT_FIXTURES_DIR = "../tests/fixtures/http"
+
+
+class ReplayServer:
+    """
+    Server HTTP locale che riproduce le risposte registrate da FixtureRecorder al posto delle API
+    di Spotify e Last.fm. Gli URL hanno la forma http://<host>:<porta>/<host originale>/<path>,
+    ad es. http://127.0.0.1:8765/api.spotify.com/v1/ (config.SPOTIFY_API_PREFIX) e
+    http://127.0.0.1:8765/ws.audioscrobbler.com/2.0/ (config.LASTFM_API_URL).
+
+    Per simulare le condizioni della rete il server può aggiungere:
+    - una latenza fissa con jitter uniforme, oppure la latenza registrata di ogni risposta;
+    - un rate limit a token bucket (429 con Retry-After oltre il limite);
+    - errori casuali (503) con la probabilità indicata.
+    Le richieste senza fixture ricevono un 404.
+    """
+
+    def __init__(self, fixtures, latency_ms=0.0, jitter_ms=0.0, recorded_latency=False,
+                 rate_limit=None, burst=None, error_rate=0.0, seed=0, host="127.0.0.1", port=0):
+        """
+        :param fixtures: Dizionario {chiave: voce} (vedi load_fixtures).
+        :param latency_ms: Latenza aggiunta a ogni risposta in ms.
+        :param jitter_ms: Ampiezza del jitter uniforme (+/-) sulla latenza in ms.
+        :param recorded_latency: Se True usa come latenza il tempo di risposta registrato (più il jitter).
+        :param rate_limit: Richieste al secondo consentite (None = nessun limite).
+        :param burst: Richieste consentite in rapida successione (default: rate_limit).
+        :param error_rate: Probabilità di rispondere con un errore 503.
+        :param seed: Seed del generatore di latenze ed errori.
+        :param port: Porta del server (0 = porta libera scelta dal sistema).
+        """
+        self.fixtures = fixtures
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.recorded_latency = recorded_latency
+        self.error_rate = error_rate
+        self.bucket = TokenBucket(rate=rate_limit, burst=burst or max(rate_limit, 1)) if rate_limit else None
+        self.stats = {"served": 0, "missing": 0, "rate_limited": 0, "errors": 0}
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """
+        Avvia il server in un thread in background.
+
+        :return: URL base del server.
+        """
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _draw(self):
+        """
+        Estrae (jitter in ms, True se la risposta è un errore iniettato) con il generatore condiviso.
+        """
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+            error = bool(self.error_rate) and self._rng.random() < self.error_rate
+        return jitter, error
+
+    def _count(self, outcome):
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def _respond(self, path):
+        """
+        Risposta (status, header, corpo) alla richiesta GET di `path`, con la relativa latenza in s.
+        """
+        if self.bucket is not None and not self.bucket.try_acquire():
+            self._count("rate_limited")
+            return 429, {"Retry-After": "1"}, {"error": 29, "message": "Rate limit exceeded"}, 0.0
+
+        entry = self.fixtures.get(fixture_key("GET", "http://" + path.lstrip("/")))
+        jitter, error = self._draw()
+        base_ms = entry["elapsed_ms"] if self.recorded_latency and entry is not None else self.latency_ms
+        delay = max(base_ms + jitter, 0.0) / 1000
+        if error:
+            self._count("errors")
+            return 503, {}, {"error": 503, "message": "Injected error"}, delay
+        if entry is None:
+            self._count("missing")
+            return 404, {}, {"error": 404, "message": "No fixture recorded for this request"}, delay
+
+        self._count("served")
+        headers = {"Content-Type": entry.get("content_type") or "application/json"}
+        if entry.get("retry_after"):
+            headers["Retry-After"] = entry["retry_after"]
+        return entry["status"], headers, entry["body"], delay
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Connessioni keep-alive, come per le API reali
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, headers, body, delay = server._respond(self.path)
+                if delay:
+                    time.sleep(delay)
+                if not isinstance(body, str):
+                    body = json.dumps(body)
+                    headers.setdefault("Content-Type", "application/json")
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Server di replay delle risposte di Spotify e Last.fm registrate.")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES_DIR, help="Cartella delle fixture (config.HTTP_RECORD_DIR)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latenza aggiunta a ogni risposta")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Jitter uniforme (+/-) sulla latenza")
+    parser.add_argument("--recorded-latency", action="store_true", help="Usa la latenza registrata di ogni risposta")
+    parser.add_argument("--rate-limit", type=float, help="Richieste al secondo consentite (oltre: 429)")
+    parser.add_argument("--burst", type=float, help="Richieste consentite in rapida successione")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probabilità di un errore 503")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    replay = ReplayServer(fixtures, args.latency_ms, args.jitter_ms, args.recorded_latency,
+                          args.rate_limit, args.burst, args.error_rate, args.seed, port=args.port)
+    print(f"[INFO] {len(fixtures)} risposte caricate da {args.fixtures}.")
+    print(f"[INFO] SPOTIFY_API_PREFIX={replay.url}/api.spotify.com/v1/")
+    print(f"[INFO] LASTFM_API_URL={replay.url}/ws.audioscrobbler.com/2.0/")
+    try:
+        replay.serve_forever()
+    except KeyboardInterrupt:
+        print(f"[INFO] Server fermato: {replay.stats}")
@@ -0,0 +1,189 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+from src.preprocessing.product_preprocessor import preprocess_products
+from src.recommendation.recommendation_engine_ga import RecommendationEngineGA, shutdown_shard_executor
+from tests.synthetic_data import load_terms, generate_catalog, generate_profile, write_dictionaries, PROFILE_BREADTHS
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Dimensioni di default: l'intero benchmark resta nell'ordine di qualche minuto.
+# Cataloghi più grandi (fino a 1.000.000 di prodotti) si misurano con --sizes.
+DEFAULT_SIZES = [1000, 3000, 10000]
+DEFAULT_DICTIONARY_SIZES = [1000, 0]  # Numero di artisti nel dizionario (0 = dizionario completo)
+
+
+def _peak_rss_mb():
+    # ru_maxrss è in KB su Linux e in byte su macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_case(n_products, n_artists, breadths, seed, time_budget_ms, sharded=False):
+    """
+    Esegue un caso del benchmark (eseguito in un processo separato, così il picco di RSS è del solo caso).
+    Con sharded=True il motore usa la modalità a shard (config.GA_SHARDED) in questo processo.
+
+    :return: Lista di risultati, uno per ampiezza di profilo.
+    """
+    artists, genres = load_terms(max_artists=n_artists or None)
+    with tempfile.TemporaryDirectory(prefix="brandify-scaling-") as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "products.csv")
+        generate_catalog(n_products, artists, genres, seed=seed).to_csv(csv_path, index=False)
+        artists_file, genres_file = write_dictionaries(tmp_dir, artists, genres)
+        rss_start = _peak_rss_mb()
+
+        # Preprocessing (con il profilo di log silenzioso i tag per prodotto non sono registrati)
+        start = time.perf_counter()
+        df_products = preprocess_products(csv_path, artists_file=artists_file, genres_file=genres_file)
+        preprocessing_s = time.perf_counter() - start
+        rss_preprocessing = _peak_rss_mb()
+
+    config.GA_SHARDED = sharded
+    start = time.perf_counter()
+    engine = RecommendationEngineGA(df_products=df_products)
+    construction_s = time.perf_counter() - start
+
+    results = []
+    for i, breadth in enumerate(breadths):
+        profile = generate_profile(artists, genres, breadth=breadth, seed=seed + i)
+        run = engine.for_request(user_data=profile, preference_mode="balanced", seed=seed + i)
+        start = time.perf_counter()
+        product_ids, _ = run.recommend_ids(time_budget_ms=time_budget_ms)
+        ga_s = time.perf_counter() - start
+
+        results.append({
+            "products": n_products,
+            "dictionary_artists": len(artists),
+            "dictionary_genres": len(genres),
+            "profile_breadth": breadth,
+            "sharded": sharded,
+            "relevant_products": len(run.relevant_indices),
+            "ga_genes": len(run.gene_affinity),
+            "recommended_products": len(product_ids),
+            "preprocessing_s": round(preprocessing_s, 4),
+            "preprocessing_rows_per_s": round(n_products / preprocessing_s, 1),
+            "engine_construction_s": round(construction_s, 4),
+            "ga_latency_s": round(ga_s, 4),
+            "ga_generations": run.generations_completed,
+            "ga_truncated": run.truncated,
+            "ga_ms_per_generation": round(1000 * ga_s / max(run.generations_completed, 1), 3),
+            "rss_start_mb": round(rss_start, 1),
+            "peak_rss_preprocessing_mb": round(rss_preprocessing, 1),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+        })
+    shutdown_shard_executor()
+    return results
+
+
+def _plot(results, output_dir):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    dictionary_sizes = sorted({r["dictionary_artists"] for r in results})
+    fig, axes = plt.subplots(1, 3, figsize=(18, 5))
+
+    for dict_size in dictionary_sizes:
+        rows = [r for r in results if r["dictionary_artists"] == dict_size and r["profile_breadth"] == results[0]["profile_breadth"]]
+        axes[0].plot([r["products"] for r in rows], [r["preprocessing_rows_per_s"] for r in rows], marker="o", label=f"{dict_size} artisti")
+        axes[2].plot([r["products"] for r in rows], [r["peak_rss_mb"] for r in rows], marker="o", label=f"{dict_size} artisti")
+
+    largest = dictionary_sizes[-1]
+    for breadth in dict.fromkeys(r["profile_breadth"] for r in results):
+        rows = [r for r in results if r["dictionary_artists"] == largest and r["profile_breadth"] == breadth]
+        axes[1].plot([r["products"] for r in rows], [r["ga_latency_s"] for r in rows], marker="o", label=f"profilo {breadth}")
+
+    titles = ["Preprocessing (righe/s)", f"Latenza GA (s), dizionario {largest} artisti", "Picco RSS (MB)"]
+    for ax, title in zip(axes, titles):
+        ax.set_xscale("log")
+        ax.set_xlabel("Numero di prodotti")
+        ax.set_title(title)
+        ax.grid(True, which="both", alpha=0.3)
+        ax.legend()
+    plt.tight_layout()
+    path = os.path.join(output_dir, "scaling_curves.png")
+    plt.savefig(path)
+    plt.close(fig)
+    return path
+
+
+def run_scaling_benchmark(sizes=None, dictionary_sizes=None, breadths=None, seed=42, time_budget_ms=0, output_dir=RESULTS_DIR,
+                          sharded=False):
+    """
+    Misura come preprocessing e GA scalano con la dimensione del catalogo e dei dizionari, su cataloghi
+    e profili sintetici deterministici (tests/synthetic_data.py). Ogni combinazione gira in un processo
+    nuovo. Scrive scaling_results.json e scaling_results.csv e le curve in scaling_curves.png.
+
+    :param sizes: Numero di prodotti dei cataloghi.
+    :param dictionary_sizes: Numero di artisti nei dizionari (0 = dizionario completo).
+    :param breadths: Ampiezze dei profili (chiavi di PROFILE_BREADTHS).
+    :param time_budget_ms: Budget del GA (0 = nessun limite, per misurare la convergenza completa).
+    :param sharded: Misura la modalità a shard (GA_SHARDED) invece del genoma unico.
+    :return: Lista dei risultati.
+    """
+    # Log silenziosi (config.BENCHMARK_LOG_PROFILE), anche nei processi figli
+    config.set_log_profile(config.BENCHMARK_LOG_PROFILE)
+    sizes = sizes or DEFAULT_SIZES
+    dictionary_sizes = dictionary_sizes or DEFAULT_DICTIONARY_SIZES
+    breadths = breadths or list(PROFILE_BREADTHS)
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for n_artists in dictionary_sizes:
+        for n_products in sizes:
+            print(f"[INFO] Scaling: {n_products} prodotti, dizionario {n_artists or 'completo'}...")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                case = executor.submit(_run_case, n_products, n_artists, breadths, seed, time_budget_ms, sharded).result()
+            for r in case:
+                print(f"  - profilo {r['profile_breadth']}: preprocessing {r['preprocessing_rows_per_s']} righe/s, "
+                      f"GA {r['ga_latency_s']} s ({r['ga_generations']} generazioni), picco RSS {r['peak_rss_mb']} MB")
+            results.extend(case)
+
+    os.makedirs(output_dir, exist_ok=True)
+    metadata = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": seed,
+        "time_budget_ms": time_budget_ms,
+        "sharded": sharded,
+        "ga": {
+            "num_generations": config.GA_NUM_GENERATIONS,
+            "sol_per_pop": config.GA_SOL_PER_POP,
+            "stagnation_limit": config.GA_STAGNATION_LIMIT,
+            "auto_tune": config.GA_AUTO_TUNE,
+        },
+    }
+    with open(os.path.join(output_dir, "scaling_results.json"), "w", encoding="utf-8") as f:
+        json.dump({"metadata": metadata, "results": results}, f, indent=2)
+    with open(os.path.join(output_dir, "scaling_results.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0]))
+        writer.writeheader()
+        writer.writerows(results)
+    print(f"[INFO] Curve di scaling salvate in {_plot(results, output_dir)}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark di scaling su cataloghi sintetici.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Numero di prodotti dei cataloghi")
+    parser.add_argument("--dictionary-sizes", type=int, nargs="+", default=DEFAULT_DICTIONARY_SIZES,
+                        help="Numero di artisti nei dizionari (0 = completo)")
+    parser.add_argument("--breadths", nargs="+", default=list(PROFILE_BREADTHS), choices=list(PROFILE_BREADTHS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--time-budget-ms", type=int, default=0, help="Budget del GA in ms (0 = nessun limite)")
+    parser.add_argument("--sharded", action="store_true", help="Usa la modalità a shard del motore")
+    args = parser.parse_args()
+    run_scaling_benchmark(args.sizes, args.dictionary_sizes, args.breadths, args.seed, args.time_budget_ms,
+                          sharded=args.sharded)
@@ -0,0 +1,109 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import config
+
+# Cartelle del progetto: gli entry point vengono eseguiti da src/ (i percorsi di config sono relativi a src/)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+RESULTS_FILE = os.path.join(ROOT_DIR, "tests", "results", "startup_benchmark.json")
+
+# Entry point: codice importato e moduli pesanti che NON devono essere caricati all'avvio
+ENTRY_POINTS = {
+    "server": {
+        "code": "import src.main",
+        "forbidden": ["matplotlib", "pygad", "spotipy", "src.preprocessing.lastfm_extraction", "tests.benchmark_tests"],
+    },
+    "dictionary": {
+        "code": "from src.preprocessing.lastfm_extraction import save_lastfm_data",
+        "forbidden": ["matplotlib", "pygad", "spotipy", "flask", "pandas"],
+    },
+    "benchmark": {
+        "code": "from tests.benchmark_tests import run_benchmark_tests",
+        "forbidden": ["matplotlib", "pygad", "spotipy", "src.preprocessing.lastfm_extraction"],
+    },
+}
+
+
+def _measure_import(code):
+    """
+    Esegue l'import in un processo Python pulito con -X importtime.
+
+    :return: Tupla (tempo di import in ms, tempo totale del processo in ms, insieme dei moduli importati).
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=SRC_DIR, env=env, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"Import fallito ({code}):\n{result.stderr[-2000:]}")
+
+    import_us = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        # Formato: "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.add(name.strip())
+        # I moduli di primo livello (non indentati) sommano il tempo di tutto l'albero
+        if not name[1:].startswith(" "):
+            import_us += int(cumulative)
+    return import_us / 1000, wall_ms, modules
+
+
+def run_startup_benchmark(repetitions=5):
+    """
+    Misura il tempo di avvio di ogni entry point (mediana su più processi), verifica che nessun
+    modulo pesante non necessario venga importato e confronta il tempo di import con
+    config.STARTUP_IMPORT_BUDGET_MS. I risultati sono salvati in tests/results/startup_benchmark.json.
+
+    :return: True se tutti gli entry point rispettano budget e vincoli sugli import.
+    """
+    results = {}
+    ok = True
+    for name, entry in ENTRY_POINTS.items():
+        import_times, wall_times = [], []
+        modules = set()
+        for _ in range(repetitions):
+            import_ms, wall_ms, modules = _measure_import(entry["code"])
+            import_times.append(import_ms)
+            wall_times.append(wall_ms)
+
+        budget = config.STARTUP_IMPORT_BUDGET_MS.get(name)
+        import_ms = statistics.median(import_times)
+        loaded = sorted(m for m in entry["forbidden"] if m in modules)
+        over_budget = budget is not None and import_ms > budget
+        ok = ok and not loaded and not over_budget
+
+        results[name] = {
+            "import_ms": round(import_ms, 1),
+            "wall_ms": round(statistics.median(wall_times), 1),
+            "budget_ms": budget,
+            "modules": len(modules),
+            "forbidden_loaded": loaded,
+            "passed": not loaded and not over_budget,
+        }
+        status = "OK" if results[name]["passed"] else "FALLITO"
+        print(f"[INFO] {name}: import {import_ms:.1f} ms (budget {budget} ms), "
+              f"avvio {results[name]['wall_ms']:.1f} ms, {len(modules)} moduli - {status}")
+        if loaded:
+            print(f"[ERRORE] {name}: moduli caricati all'avvio senza necessità: {', '.join(loaded)}")
+
+    os.makedirs(os.path.dirname(RESULTS_FILE), exist_ok=True)
+    with open(RESULTS_FILE, "w", encoding="utf-8") as f:
+        json.dump({"python": sys.version.split()[0], "repetitions": repetitions, "entry_points": results}, f, indent=2)
+    print(f"[INFO] Risultati salvati in {RESULTS_FILE}")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_startup_benchmark() else 1)
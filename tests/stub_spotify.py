@@ -0,0 +1,47 @@
+import numpy as np
+
+
+class StubSpotifyClient:
+    """
+    Client Spotify finto e deterministico, con la stessa interfaccia dei metodi di spotipy.Spotify
+    usati da get_spotify_data (top artists, recently played, artists in batch).
+    Non effettua chiamate di rete: serve per benchmark e test locali.
+    """
+
+    def __init__(self, artists, genres, seed=0, n_artists=200, limit=50):
+        """
+        :param artists: Nomi di artisti da cui costruire il catalogo finto.
+        :param genres: Generi assegnati casualmente agli artisti (da 0 a 4 ciascuno).
+        :param seed: Seed del generatore casuale.
+        :param n_artists: Numero di artisti conosciuti dal client.
+        :param limit: Numero di elementi restituiti da top artists e recently played.
+        """
+        rng = np.random.default_rng(seed)
+        names = [artists[i] for i in rng.choice(len(artists), size=min(n_artists, len(artists)), replace=False)]
+        self.artists_by_id = {}
+        for i, name in enumerate(names):
+            artist_genres = [genres[g] for g in rng.choice(len(genres), size=rng.integers(0, 5), replace=False)]
+            self.artists_by_id[f"artist{i}"] = {"id": f"artist{i}", "name": name.title(), "genres": artist_genres}
+        ids = list(self.artists_by_id)
+        self._top = [self.artists_by_id[ids[i]] for i in rng.choice(len(ids), size=min(limit, len(ids)), replace=False)]
+        self._recent = [
+            {"track": {"artists": [{"id": ids[i], "name": self.artists_by_id[ids[i]]["name"]}]}}
+            for i in rng.choice(len(ids), size=limit)
+        ]
+        self.calls = 0
+
+    def current_user_top_artists(self, limit=20, time_range="medium_term"):
+        self.calls += 1
+        return {"items": self._top[:limit]}
+
+    def current_user_recently_played(self, limit=50):
+        self.calls += 1
+        return {"items": self._recent[:limit]}
+
+    def current_user(self):
+        self.calls += 1
+        return {"id": "stub-user"}
+
+    def artists(self, artist_ids):
+        self.calls += 1
+        return {"artists": [self.artists_by_id.get(artist_id) for artist_id in artist_ids]}
@@ -0,0 +1,182 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import config
+from src.preprocessing.product_preprocessor import load_dictionary, clean_special_characters
+
+# Tipi di prodotto: (nome, prezzo mediano in €, dispersione log-normale del prezzo, immagine, slug dell'URL)
+PRODUCT_TYPES = [
+    ("T-shirt", 27.0, 0.20, "t_shirt.jpg", "t-shirt"),
+    ("Hoodie", 55.0, 0.15, "hoodie.jpg", "hoodie"),
+    ("Beanie", 21.0, 0.15, "beanie.jpg", "beanie"),
+    ("Vinyl", 32.0, 0.30, "vinyl.jpg", "vinyl"),
+    ("Tote bag", 24.0, 0.15, "tote_bag.jpg", "tote_bag"),
+    ("Keychain", 9.5, 0.25, "keychain.jpg", "keychain"),
+    ("Patches", 14.0, 0.25, "patches.jpg", "patches"),
+    ("Cap", 24.0, 0.15, "cap.jpg", "cap"),
+    ("Mug", 16.0, 0.15, "mug.jpg", "mug"),
+    ("Poster", 18.0, 0.30, "poster.jpg", "poster"),
+]
+# Frequenza relativa dei tipi di prodotto (come nel catalogo reale: soprattutto abbigliamento e vinili)
+PRODUCT_TYPE_WEIGHTS = np.array([0.22, 0.16, 0.14, 0.16, 0.08, 0.07, 0.05, 0.05, 0.04, 0.03])
+
+# Parole per i titoli degli album (senza artisti né generi, per non creare match spuri)
+ALBUM_WORDS = [
+    "Midnight", "Echoes", "Paper", "Summer", "Silver", "Glass", "Northern", "Lights", "Ghost", "Stories",
+    "Dreams", "Machine", "Heart", "Garden", "Ocean", "Fire", "Static", "Motion", "Shadows", "Horizon",
+    "Gold", "Velvet", "Rain", "City", "Lines", "Waves", "Signals", "Mirror", "Wild", "Youth",
+]
+
+# Modelli di descrizione: {subject} è l'artista (con album) o il genere, {item} il tipo di prodotto
+ARTIST_TEMPLATES = [
+    "Official {subject} {item}.",
+    "Exclusive {subject} {item} for fans.",
+    "High-quality {item} inspired by {subject}.",
+    "Wear {subject} with pride on this {item}.",
+]
+GENRE_TEMPLATES = [
+    "Premium {item} featuring {subject} design.",
+    "Perfect for {subject} lovers - a {item}.",
+    "Curated {subject} {item}. Premium quality with custom artwork.",
+]
+GENERIC_DESCRIPTIONS = [
+    "Classic {item} with minimal logo.",
+    "Everyday {item}, unisex fit.",
+    "Limited edition {item} with embroidered details.",
+]
+
+# Ampiezza dei profili sintetici: (artisti top, generi top, artisti recenti, generi recenti)
+PROFILE_BREADTHS = {
+    "narrow": (3, 2, 3, 2),
+    "medium": (15, 10, 15, 10),
+    "wide": (60, 30, 60, 30),
+}
+
+
+def _zipf_weights(n, exponent=1.0):
+    """
+    Pesi di popolarità decrescenti (legge di Zipf): pochi termini compaiono in molti prodotti.
+    """
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def load_terms(artists_file=None, genres_file=None, max_artists=None, max_genres=None):
+    """
+    Carica i termini dei dizionari in un ordine deterministico ma non alfabetico (permutazione fissa),
+    che fa da classifica di popolarità per i pesi di Zipf, eventualmente limitandone il numero.
+
+    :return: Tupla (lista artisti, lista generi).
+    """
+    rng = np.random.default_rng(0)
+    artists = sorted(load_dictionary(artists_file or config.LASTFM_ARTISTS_FILE))
+    genres = sorted(load_dictionary(genres_file or config.LASTFM_GENRES_FILE))
+    artists = [artists[i] for i in rng.permutation(len(artists))]
+    genres = [genres[i] for i in rng.permutation(len(genres))]
+    return artists[:max_artists], genres[:max_genres]
+
+
+def generate_catalog(n_products, artists, genres, seed=0, artist_share=0.55, genre_share=0.35):
+    """
+    Genera un catalogo sintetico deterministico (stesso seed = stesso catalogo).
+    I prodotti sono per artista ("Korn 'Midnight Echoes' T-shirt"), per genere ("Black Metal Hoodie")
+    o generici senza match; artisti e generi seguono una distribuzione di popolarità di Zipf e i prezzi
+    una log-normale per tipo di prodotto.
+
+    :param n_products: Numero di prodotti (ad es. da 1.000 a 1.000.000).
+    :param artists: Lista di artisti (minuscoli, come nei dizionari) da cui estrarre i prodotti per artista.
+    :param genres: Lista di generi da cui estrarre i prodotti per genere.
+    :param seed: Seed del generatore casuale.
+    :param artist_share: Quota di prodotti per artista.
+    :param genre_share: Quota di prodotti per genere (il resto sono prodotti generici).
+    :return: DataFrame con le colonne del CSV dei prodotti (name, price, description, image_url, product_url).
+    """
+    rng = np.random.default_rng(seed)
+
+    kinds = rng.choice(3, size=n_products, p=[artist_share, genre_share, 1 - artist_share - genre_share])
+    types = rng.choice(len(PRODUCT_TYPES), size=n_products, p=PRODUCT_TYPE_WEIGHTS)
+    artist_idx = rng.choice(len(artists), size=n_products, p=_zipf_weights(len(artists)))
+    genre_idx = rng.choice(len(genres), size=n_products, p=_zipf_weights(len(genres), exponent=0.8))
+    album_words = rng.integers(0, len(ALBUM_WORDS), size=(n_products, 2))
+    templates = rng.integers(0, 12, size=n_products)
+    codes = rng.integers(1000, 10000, size=n_products)
+
+    medians = np.array([t[1] for t in PRODUCT_TYPES])[types]
+    sigmas = np.array([t[2] for t in PRODUCT_TYPES])[types]
+    prices = np.round(medians * np.exp(rng.normal(0.0, sigmas)), 2)
+
+    names, descriptions, image_urls, product_urls = [], [], [], []
+    for i in range(n_products):
+        item, _, _, image, slug = PRODUCT_TYPES[types[i]]
+        if kinds[i] == 0:
+            artist = artists[artist_idx[i]].title()
+            album = f"{ALBUM_WORDS[album_words[i, 0]]} {ALBUM_WORDS[album_words[i, 1]]}"
+            names.append(f"{artist} '{album}' {item}")
+            subject = f"{artist}'s '{album}'"
+            description = ARTIST_TEMPLATES[templates[i] % len(ARTIST_TEMPLATES)]
+        elif kinds[i] == 1:
+            genre = genres[genre_idx[i]].title()
+            names.append(f"{genre} {item}")
+            subject = genre
+            description = GENRE_TEMPLATES[templates[i] % len(GENRE_TEMPLATES)]
+        else:
+            names.append(f"Logo {item}")
+            subject = ""
+            description = GENERIC_DESCRIPTIONS[templates[i] % len(GENERIC_DESCRIPTIONS)]
+        descriptions.append(description.format(subject=subject, item=item.lower()))
+        image_urls.append(f"/static/products/{image}")
+        product_urls.append(f"https://example.com/{slug}/{codes[i]}")
+
+    return pd.DataFrame({
+        "name": names,
+        "price": prices,
+        "description": descriptions,
+        "image_url": image_urls,
+        "product_url": product_urls,
+    })
+
+
+def generate_profile(artists, genres, breadth="medium", seed=0):
+    """
+    Genera un profilo utente sintetico nel formato di get_spotify_data (tag minuscole con underscore).
+    Gli artisti e i generi sono estratti con la stessa popolarità di Zipf del catalogo, così che il
+    profilo abbia match realistici; gli elementi recenti si sovrappongono in parte a quelli top.
+
+    :param breadth: Ampiezza del profilo, chiave di PROFILE_BREADTHS ("narrow", "medium", "wide").
+    """
+    rng = np.random.default_rng(seed)
+    n_artists, n_genres, n_recent_artists, n_recent_genres = PROFILE_BREADTHS[breadth]
+
+    def sample(terms, size, exponent):
+        size = min(size, len(terms))
+        picked = rng.choice(len(terms), size=size, replace=False, p=_zipf_weights(len(terms), exponent))
+        # Stessa normalizzazione delle tag estratte dal preprocessing
+        return clean_special_characters(terms[i].replace(" ", "_") for i in picked)
+
+    top_artists = sample(artists, n_artists, 0.6)
+    top_genres = sample(genres, n_genres, 0.5)
+    # Metà degli elementi recenti proviene dai top, il resto è nuovo
+    recent_artists = top_artists[: n_recent_artists // 2] + sample(artists, n_recent_artists - n_recent_artists // 2, 0.6)
+    recent_genres = top_genres[: n_recent_genres // 2] + sample(genres, n_recent_genres - n_recent_genres // 2, 0.5)
+    return {
+        "artists": top_artists,
+        "genres": top_genres,
+        "recent_artists": list(dict.fromkeys(recent_artists)),
+        "recent_genres": list(dict.fromkeys(recent_genres)),
+    }
+
+
+def write_dictionaries(out_dir, artists, genres):
+    """
+    Scrive i dizionari ridotti (un termine per riga) usati per misurare l'effetto della loro dimensione.
+
+    :return: Tupla (percorso artists, percorso genres).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = (os.path.join(out_dir, "artists.txt"), os.path.join(out_dir, "genres.txt"))
+    for path, terms in zip(paths, (artists, genres)):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(terms) + "\n")
+    return paths
@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import config
+from src.preprocessing.product_preprocessor import preprocess_products
+from src.recommendation.recommendation_engine_ga import RecommendationEngineGA
+from tests.synthetic_data import load_terms, generate_catalog, generate_profile, write_dictionaries, PROFILE_BREADTHS
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Ricerca iniziale dell'utente e ricerche successive con piccole modifiche (range di prezzo, modalità)
+INITIAL_REQUEST = {"min_price": None, "max_price": None, "preference_mode": "balanced"}
+FOLLOW_UPS = {
+    "narrower_price": {"min_price": 15, "max_price": 60, "preference_mode": "balanced"},
+    "genre_mode": {"min_price": None, "max_price": None, "preference_mode": "genre"},
+    "artist_mode_narrower_price": {"min_price": 15, "max_price": 60, "preference_mode": "artist"},
+}
+
+
+def _run(engine, profile, request, seed, warm_start=None):
+    """
+    Esegue una ricerca senza limite di tempo.
+
+    :return: Copia del motore dopo il run (generazioni, fitness e popolazione finale).
+    """
+    run = engine.for_request(user_data=profile, seed=seed, warm_start=warm_start, **request)
+    start = time.perf_counter()
+    run.recommend_ids(time_budget_ms=0)
+    run.ga_s = time.perf_counter() - start
+    return run
+
+
+def run_warm_start_benchmark(n_products=10000, breadths=None, repetitions=5, seed=42, output_dir=RESULTS_DIR):
+    """
+    Confronta, per ogni ricerca successiva, un run a freddo (popolazione casuale) e un run che parte
+    dalla popolazione finale della ricerca iniziale dello stesso utente (warm start), su un catalogo
+    sintetico: generazioni fino alla stagnazione, tempo del GA e miglior fitness.
+    I risultati sono salvati in warm_start_benchmark.json.
+
+    :return: Lista di risultati, uno per (ampiezza del profilo, ricerca successiva).
+    """
+    # Log silenziosi (config.BENCHMARK_LOG_PROFILE)
+    config.set_log_profile(config.BENCHMARK_LOG_PROFILE)
+    breadths = breadths or list(PROFILE_BREADTHS)
+    artists, genres = load_terms()
+    with tempfile.TemporaryDirectory(prefix="brandify-warm-") as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "products.csv")
+        generate_catalog(n_products, artists, genres, seed=seed).to_csv(csv_path, index=False)
+        artists_file, genres_file = write_dictionaries(tmp_dir, artists, genres)
+        df_products = preprocess_products(csv_path, artists_file=artists_file, genres_file=genres_file)
+    engine = RecommendationEngineGA(df_products=df_products)
+
+    results = []
+    for breadth in breadths:
+        runs = {name: {"cold": [], "warm": []} for name in FOLLOW_UPS}
+        for rep in range(repetitions):
+            profile = generate_profile(artists, genres, breadth=breadth, seed=seed + rep)
+            initial = _run(engine, profile, INITIAL_REQUEST, seed + rep)
+            for name, request in FOLLOW_UPS.items():
+                runs[name]["cold"].append(_run(engine, profile, request, seed + 1000 + rep))
+                runs[name]["warm"].append(_run(engine, profile, request, seed + 1000 + rep, initial.final_population))
+
+        for name, modes in runs.items():
+            result = {"products": n_products, "profile_breadth": breadth, "follow_up": name,
+                      "genes": int(np.median([len(run.gene_affinity) for run in modes["cold"]]))}
+            for mode, mode_runs in modes.items():
+                result[f"{mode}_generations"] = float(np.median([run.generations_completed for run in mode_runs]))
+                result[f"{mode}_ga_ms"] = round(float(np.median([run.ga_s for run in mode_runs])) * 1000, 2)
+                result[f"{mode}_best_fitness"] = float(np.mean([run.last_best_fitness or 0 for run in mode_runs]))
+            result["generations_ratio"] = round(result["warm_generations"] / max(result["cold_generations"], 1), 3)
+            results.append(result)
+            print(f"[INFO] {breadth} / {name}: generazioni {result['cold_generations']:.0f} -> {result['warm_generations']:.0f} "
+                  f"({result['generations_ratio']:.0%}), GA {result['cold_ga_ms']} -> {result['warm_ga_ms']} ms, "
+                  f"fitness {result['cold_best_fitness']:.0f} -> {result['warm_best_fitness']:.0f}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "warm_start_benchmark.json"), "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"[INFO] Risultati salvati in {os.path.join(output_dir, 'warm_start_benchmark.json')}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del warm start del GA (cold vs warm) su un catalogo sintetico.")
+    parser.add_argument("--products", type=int, default=10000, help="Numero di prodotti del catalogo")
+    parser.add_argument("--breadths", nargs="+", default=list(PROFILE_BREADTHS), choices=list(PROFILE_BREADTHS))
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    run_warm_start_benchmark(args.products, args.breadths, args.repetitions, args.seed)